@@ -1,8 +1,15 @@
+import functools
+import hashlib
+import importlib.metadata
+import json
 import os
 import re
+import sys
 import itertools
+import time
 
 from .CorrectionsCore import *
+from .aot import aotCompiled
 from FLAF.RunKit.run_tools import ps_call
 
 
@@ -20,12 +27,130 @@ def findLibLocation(lib_name, first_guess=None):
     raise RuntimeError(f"Library {lib_name} not found.")
 
 
+def correctionLibConfigCachePath():
+    """Cache file of the correctionlib location for the current python environment."""
+    environment = f"{sys.executable}\n{sys.prefix}"
+    env_key = hashlib.sha256(environment.encode()).hexdigest()[:16]
+    cache_dir = os.environ.get(
+        "CORRECTIONS_CONFIG_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache", "Corrections"),
+    )
+    return os.path.join(cache_dir, f"correctionlib_{env_key}.json")
+
+
+def findCorrectionLib():
+    """Returns the include paths and the library path of correctionlib.
+
+    They are given by `correction config`, whose result is cached per python environment: the cache is used as long
+    as the installed correctionlib version is the same and the paths still exist.
+    """
+    try:
+        version = importlib.metadata.version("correctionlib")
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    cache_path = correctionLibConfigCachePath()
+    if version is not None and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if (
+                cached["version"] == version
+                and all(os.path.isdir(path) for path in cached["include_paths"])
+                and os.path.exists(cached["library"])
+            ):
+                return cached["include_paths"], cached["library"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    returncode, output, err = ps_call(
+        ["correction", "config", "--cflags", "--ldflags"],
+        catch_stdout=True,
+        decode=True,
+        verbose=0,
+    )
+    params = output.split(" ")
+    include_paths = []
+    lib_path = None
+    for param in params:
+        if param.startswith("-I"):
+            include_paths.append(param[2:].strip())
+        elif param.startswith("-L"):
+            lib_path = param[2:].strip()
+        elif param.startswith("-l"):
+            lib_name = param[2:].strip()
+    corr_lib = findLibLocation(lib_name, lib_path)
+
+    if version is not None:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.tmp{os.getpid()}"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {
+                        "version": version,
+                        "include_paths": include_paths,
+                        "library": corr_lib,
+                    },
+                    f,
+                )
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass  # the cache is optional
+    return include_paths, corr_lib
+
+
+# producers listed by Corrections.neededProducers, i.e. the ones that initializeAll prepares
+_needed_producer_names = [
+    "tau",
+    "ele",
+    "jet",
+    "muScaRe",
+    "met",
+    "pu",
+    "dy_hhbbtautau",
+    "dy_hhbbww",
+    "Vpt",
+    "btag",
+    "mu",
+    "puJetID",
+    "trg",
+    "fatjet",
+    "bosonicRecoil",
+]
+
+
+def checkNeededProducers(method):
+    """Decorator of the Corrections methods that apply corrections: asserts that every producer initialized by the
+    method is listed by neededProducers, so that the conditions of the two do not drift apart.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        not_initialized = [
+            name for name in _needed_producer_names if getattr(self, f"{name}_") is None
+        ]
+        result = method(self, *args, **kwargs)
+        needed = self.neededProducers()
+        for name in not_initialized:
+            assert (
+                getattr(self, f"{name}_") is None or name in needed
+            ), f"Corrections.{method.__name__} uses the producer {name}, which is missing from neededProducers()."
+        return result
+
+    return wrapper
+
+
 class Corrections:
     _global_instance = None
     _corr_lib_loaded = False
 
     @staticmethod
-    def initializeGlobal(load_corr_lib=False, **kwargs):
+    def initializeGlobal(
+        load_corr_lib=False, corr_lib_include=None, corr_lib_path=None, **kwargs
+    ):
+        """Creates the global instance. With load_corr_lib, the correctionlib headers and library are made available
+        to ROOT: their location can be given with corr_lib_include (path or list of paths) and corr_lib_path (path of
+        the library), otherwise it is found with findCorrectionLib."""
         if Corrections._global_instance is not None:
             print(
                 f"WARNING: Global instance of Corrections was already initialized. Overwriting it.",
@@ -33,24 +158,16 @@ class Corrections:
             )
 
         if load_corr_lib and not Corrections._corr_lib_loaded:
-            returncode, output, err = ps_call(
-                ["correction", "config", "--cflags", "--ldflags"],
-                catch_stdout=True,
-                decode=True,
-                verbose=0,
-            )
-            params = output.split(" ")
-            lib_path = None
-            for param in params:
-                if param.startswith("-I"):
-                    ROOT.gInterpreter.AddIncludePath(param[2:].strip())
-                elif param.startswith("-L"):
-                    lib_path = param[2:].strip()
-                elif param.startswith("-l"):
-                    lib_name = param[2:].strip()
-
+            if corr_lib_path is None:
+                include_paths, corr_lib = findCorrectionLib()
+            else:
+                include_paths = corr_lib_include or []
+                if isinstance(include_paths, str):
+                    include_paths = [include_paths]
+                corr_lib = corr_lib_path
+            for include_path in include_paths:
+                ROOT.gInterpreter.AddIncludePath(include_path)
             # ROOT.gInterpreter.AddIncludePath(os.environ['FLAF_ENVIRONMENT_PATH']+"/include")
-            corr_lib = findLibLocation(lib_name, lib_path)
             ROOT.gSystem.Load(corr_lib)
             Corrections._corr_lib_loaded = True
 
@@ -91,6 +208,9 @@ class Corrections:
         self.period = self.global_params["era"]
         self.stage = stage
         self.law_run_version = setup.law_run_version
+        self.used_subset = self.global_params.get("corrections_used_subset", False)
+        if self.used_subset:
+            setUsedSubsetMode()
 
         self.to_apply = {}
         correction_origins = {}
@@ -177,6 +297,7 @@ class Corrections:
         self.Vpt_ = None
         self.JetVetoMap_ = None
         self.btag_shape_norm_ = None
+        self.btag_norm_cache_ = None
         self.bosonicRecoil_ = None
 
     @property
@@ -269,8 +390,15 @@ class Corrections:
         if self.jet_ is None:
             from .jet import JetCorrProducer
 
+            use_tabulated = any(
+                self.to_apply.get(corr_name, {}).get("tabulated", False)
+                for corr_name in ["JEC", "JER"]
+            )
             self.jet_ = JetCorrProducer(
-                period_names[self.period], self.isData, self.dataset_name
+                period_names[self.period],
+                self.isData,
+                self.dataset_name,
+                use_tabulated=use_tabulated,
             )
         return self.jet_
 
@@ -301,6 +429,7 @@ class Corrections:
                 loadEfficiency=params.get("loadEfficiency", False),
                 useSplitJes=params.get("useSplitJes", False),
                 wantShape=params.get("wantShape", True),
+                use_tabulated=params.get("tabulated", False),
             )
         return self.btag_
 
@@ -318,7 +447,9 @@ class Corrections:
             from .mu import MuCorrProducer
 
             self.mu_ = MuCorrProducer(
-                era=self.period, columns=self.to_apply["mu"].get("columns", {})
+                era=self.period,
+                columns=self.to_apply["mu"].get("columns", {}),
+                used_subset=self.used_subset,
             )
         return self.mu_
 
@@ -416,12 +547,160 @@ class Corrections:
                 raise RuntimeError("btag_shape_norm not applicable to data.")
         return self.btag_shape_norm_
 
+    @property
+    def btag_norm_cache(self):
+        """Producer of the btag shape normalization sums in the same event loop, if normCacheInStream is set."""
+        params = self.to_apply.get("btag", {})
+        if (
+            self.btag_norm_cache_ is None
+            and not self.isData
+            and params.get("normCacheInStream", False)
+        ):
+            from .btag import btagShapeNormCacheProducer
+
+            producer_cfg = self.global_params["payload_producers"][
+                params["normCacheProducer"]
+            ]
+            self.btag_norm_cache_ = btagShapeNormCacheProducer(
+                bins=producer_cfg["bins"], weight=producer_cfg.get("weight", "1.")
+            )
+        return self.btag_norm_cache_
+
+    def dumpBtagNormCache(self, output_file):
+        """Writes the btag shape normalization sums booked in the event loop (normCacheInStream) to output_file,
+        as a partial result for btagShapeNormCacheProducer.aggregate, and returns them; runs the event loop if it
+        did not run yet. Returns None if no sums were booked.
+        """
+        if self.btag_norm_cache_ is None:
+            return None
+        partial_result = self.btag_norm_cache_.partialResult()
+        with open(output_file, "w") as f:
+            json.dump(partial_result, f, indent=2)
+        return partial_result
+
+    def neededProducers(self):
+        """Names of the producer properties used by the corrections to apply at this stage; the apply methods check
+        with checkNeededProducers that they do not use other ones."""
+        needed = []
+
+        def add(name):
+            if name not in needed:
+                needed.append(name)
+
+        if "tauES" in self.to_apply and not self.isData:
+            add("tau")
+        if "eleES" in self.to_apply:
+            add("ele")
+        if "JEC" in self.to_apply or "JER" in self.to_apply:
+            add("jet")
+        if "muScaRe" in self.to_apply:
+            add("muScaRe")
+        if any(
+            corr_name in self.to_apply
+            for corr_name in ["tauES", "JEC", "JER", "eleES", "muScaRe"]
+        ):
+            add("met")
+        for corr_name in ["pu", "dy_hhbbtautau", "dy_hhbbww", "Vpt"]:
+            if corr_name in self.to_apply:
+                add(corr_name)
+        if "tauID" in self.to_apply:
+            add("tau")
+        if "btag" in self.to_apply:
+            btag_sf_mode = self.to_apply["btag"]["modes"].get(self.stage, "none")
+            if btag_sf_mode in ["shape", "shape_and_norm", "wp"]:
+                add("btag")
+        for corr_name in ["mu", "ele", "puJetID"]:
+            if corr_name in self.to_apply:
+                add(corr_name)
+        if "trigger" in self.to_apply:
+            add("trg")
+        if "fatjet" in self.to_apply:
+            add("fatjet")
+        if (
+            "bosonicRecoil" in self.to_apply
+            and self.stage == "HistTuple"
+            and not self.isData
+        ):
+            add("bosonicRecoil")
+        return needed
+
+    def payloadFiles(self, producers):
+        """correctionlib payloads of the producers whose files are known before they are initialized."""
+        period = period_names[self.period]
+        files = []
+        if "pu" in producers:
+            from .pu import puWeightProducer
+
+            files.extend(puWeightProducer.payloadFiles(period))
+        if "tau" in producers:
+            from .tau import TauCorrProducer
+
+            files.extend(TauCorrProducer.payloadFiles(self.period))
+        if "jet" in producers:
+            from .jet import JetCorrProducer
+
+            files.extend(JetCorrProducer.payloadFiles(period))
+        if "btag" in producers:
+            from .btag import bTagCorrProducer
+
+            files.extend(bTagCorrProducer.payloadFiles(period))
+        if "mu" in producers:
+            from .mu import MuCorrProducer
+
+            files.extend(MuCorrProducer.payloadFiles(self.period))
+        if "ele" in producers:
+            from .electron import EleCorrProducer
+
+            files.extend(EleCorrProducer.payloadFiles(period))
+        if "puJetID" in producers:
+            from .puJetID import puJetIDCorrProducer
+
+            files.extend(puJetIDCorrProducer.payloadFiles(period))
+        return files
+
+    def initializeAll(self, n_threads=0):
+        """Initializes all the producers needed by the corrections to apply.
+
+        The payloads of the providers are first loaded concurrently (see CorrectionSetRegistry::prefetch), so that
+        the startup time is close to the loading time of the largest payload; the providers are then initialized
+        one by one, as when they are created on first use. In the used-subset mode, the unused corrections are
+        released at the end. In the memory report, the payloads are attributed to the prefetch, and the entry of
+        each provider holds only what it builds on top of them.
+        """
+        producers = self.neededProducers()
+        files = [
+            file_name
+            for file_name in self.payloadFiles(producers)
+            if os.path.exists(file_name)
+        ]
+        start = time.time()
+        n_failed = prefetchCorrectionSets(files, n_threads)
+        print(
+            f"Corrections: {len(files) - n_failed}/{len(files)} payloads loaded in {time.time() - start:.1f} s",
+            file=sys.stderr,
+        )
+        for producer in producers:
+            getattr(self, producer)
+        self.releaseUnusedCorrections()
+
+    def releaseUnusedCorrections(self):
+        """To be called once all the producers are initialized: in the used-subset mode (corrections_used_subset),
+        frees the corrections that the providers did not bind. Prints the memory report of the providers.
+        """
+        if self.used_subset:
+            releaseCorrectionSets()
+        printProviderMemoryReport()
+
+    @aotCompiled
+    @checkNeededProducers
     def applyScaleUncertainties(self, df, ana_reco_objects):
         source_dict = {central: []}
+        lazy_variations = False
+        columns = DefinedColumns(df)
         if "tauES" in self.to_apply and not self.isData:
-            df, source_dict = self.tau.getES(df, source_dict)
+            df, source_dict = self.tau.getES(df, source_dict, columns=columns)
         if "eleES" in self.to_apply:
-            df, source_dict = self.ele.getES(df, source_dict)
+            df, source_dict = self.ele.getES(df, source_dict, columns=columns)
         if "JEC" in self.to_apply or "JER" in self.to_apply:
             apply_jes = "JEC" in self.to_apply and not self.isData
             apply_jer = "JER" in self.to_apply and not self.isData
@@ -430,12 +709,41 @@ class Corrections:
                 and self.to_apply["JER"].get("apply_jet_horns_fix", False)
                 and not self.isData
             )
+            jet_params = [
+                self.to_apply[corr_name]
+                for corr_name in ["JEC", "JER"]
+                if corr_name in self.to_apply
+            ]
+            lazy_variations = any(
+                params.get("lazy_variations", False) for params in jet_params
+            )
+            compact_variations = any(
+                params.get("compact_variations", False) for params in jet_params
+            )
+            # consumed_systematics: list of sources, or {stage: list of sources}
+            consumed_systematics = None
+            for params in jet_params:
+                consumed = params.get("consumed_systematics")
+                if isinstance(consumed, dict):
+                    consumed = consumed.get(self.stage)
+                if consumed is not None:
+                    consumed_systematics = (consumed_systematics or []) + list(consumed)
             df, source_dict = self.jet.getP4Variations(
-                df, source_dict, apply_jer, apply_jes, apply_jet_horns_fix_
+                df,
+                source_dict,
+                apply_jer,
+                apply_jes,
+                apply_jet_horns_fix_,
+                lazy_variations=lazy_variations,
+                consumed_systematics=consumed_systematics,
+                compact_variations=compact_variations,
+                columns=columns,
             )
         if "muScaRe" in self.to_apply:
             if self.stage == "AnaTuple":
-                df, source_dict = self.muScaRe.getP4Variations(df, source_dict)
+                df, source_dict = self.muScaRe.getP4Variations(
+                    df, source_dict, columns=columns
+                )
             elif self.stage == "HistTuple" or self.stage == "AnalysisCache":
                 df = self.muScaRe.getP4VariationsForLegs(df)
             else:
@@ -447,8 +755,13 @@ class Corrections:
             or "eleES" in self.to_apply
             or "muScaRe" in self.to_apply
         ):
+            # the fused MET kernel reads all the object variations, which would defeat the lazy jet variations
             df, source_dict = self.met.getMET(
-                df, source_dict, self.global_params["met_type"]
+                df,
+                source_dict,
+                self.global_params["met_type"],
+                fused=not lazy_variations,
+                columns=columns,
             )
 
         syst_dict = {}
@@ -458,22 +771,16 @@ class Corrections:
                 syst_dict[syst_name] = (source, scale)
                 for obj in ana_reco_objects:
                     if obj not in source_objs:
-                        suffix = (
-                            "Central"
-                            if f"{obj}_p4_Central" in df.GetColumnNames()
-                            else "nano"
-                        )
-                        if (
-                            obj == "boostedTau"
-                            and "{obj}_p4_{suffix}" not in df.GetColumnNames()
-                        ):
+                        suffix = "Central" if f"{obj}_p4_Central" in columns else "nano"
+                        if obj == "boostedTau" and f"{obj}_p4_{suffix}" not in columns:
                             continue
-                        if f"{obj}_p4_{syst_name}" not in df.GetColumnNames():
+                        if f"{obj}_p4_{syst_name}" not in columns:
                             # print(
                             #     f"Defining nominal {obj}_p4_{syst_name} as {obj}_p4_{suffix}"
                             # )
-                            df = df.Define(
-                                f"{obj}_p4_{syst_name}", f"{obj}_p4_{suffix}"
+                            # alias instead of a copy: Snapshot writes it under the alias name
+                            df = columns.Alias(
+                                df, f"{obj}_p4_{syst_name}", f"{obj}_p4_{suffix}"
                             )
         return df, syst_dict
 
@@ -522,6 +829,8 @@ class Corrections:
             branches.append((suffix, branch))
         return df, branches
 
+    @aotCompiled
+    @checkNeededProducers
     def getNormalisationCorrections(
         self,
         df,
@@ -629,7 +938,11 @@ class Corrections:
             all_weights.extend(Vpt_DYw_branches)
         if "tauID" in self.to_apply:
             df, tau_SF_branches = self.tau.getSF(
-                df, lepton_legs, isCentral, return_variations
+                df,
+                lepton_legs,
+                isCentral,
+                return_variations,
+                typed_define=self.to_apply["tauID"].get("typed_define", False),
             )
             all_weights.extend(tau_SF_branches)
         if "btag" in self.to_apply:
@@ -639,6 +952,10 @@ class Corrections:
                     df, bTagSF_branches = self.btag.getBTagShapeSF(
                         df, unc_source, unc_scale, isCentral, return_variations
                     )
+                    if self.btag_norm_cache is not None:
+                        df = self.btag_norm_cache.book(
+                            df, unc_source, unc_scale, bTagSF_branches
+                        )
                 elif btag_sf_mode == "shape_and_norm":
                     assert (
                         self.btag_norm is not None
@@ -686,7 +1003,11 @@ class Corrections:
 
         if "ele" in self.to_apply:
             df, eleID_SF_branches = self.ele.getIDSF(
-                df, lepton_legs, isCentral, return_variations
+                df,
+                lepton_legs,
+                isCentral,
+                return_variations,
+                typed_define=self.to_apply["ele"].get("typed_define", False),
             )
             all_weights.extend(eleID_SF_branches)
 
@@ -725,6 +1046,7 @@ class Corrections:
 
         return df, all_weights
 
+    @checkNeededProducers
     def applyBosonicRecoil(self, df):
         if self.stage != "HistTuple":
             return df
@@ -1,4 +1,27 @@
-from FLAF.Common.Utilities import *
+import importlib
+import os
+from .prebuilt import loadPrebuiltLibrary
+
+
+class _LazyROOT:
+    """Stands for the ROOT module and imports it on first use.
+
+    Importing the correction modules does not start ROOT or the interpreter: they are only needed once a provider
+    is initialized or a column is defined. For the same reason, the FLAF utilities, which import ROOT, are imported
+    where they are used.
+    """
+
+    _module = None
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        if _LazyROOT._module is None:
+            _LazyROOT._module = importlib.import_module("ROOT")
+        return getattr(_LazyROOT._module, attr)
+
+
+ROOT = _LazyROOT()
 
 central = "Central"
 up = "Up"
@@ -167,11 +190,13 @@ def updateSourceDict(source_dict, source, obj):
 
 
 def createWPChannelMap(map_wp_python):
+    from FLAF.Common import Utilities
+
     ch_list = []
     for ch, ch_data in map_wp_python.items():
         wp_list = []
         for k in ["e", "mu", "jet"]:
-            wp_class = globals()[f"WorkingPointsTauVS{k}"]
+            wp_class = getattr(Utilities, f"WorkingPointsTauVS{k}")
             wp_name = ch_data[f"VS{k}"]
             wp_value = getattr(wp_class, wp_name).value
             wp_entry = f'{{ "{wp_name}", {wp_value} }} '
@@ -213,3 +238,93 @@ def getChannelIdString(df, channel_id_column):
         raise RuntimeError(
             f"getChannelIdString: unsupported column type {column_type} for {channel_id_column}"
         )
+
+
+class DefinedColumns:
+    """Names of the columns of an RDataFrame graph under construction.
+
+    df.GetColumnNames() builds the list of all the columns through PyROOT at every call. The tracker calls it
+    once and is then kept up to date by its Define/Redefine/Alias wrappers, which return the new node, so that
+    membership tests are O(1) while the graph grows. All the columns added to the graph after the tracker is
+    created must go through it.
+    """
+
+    def __init__(self, df):
+        self.names = set(str(c) for c in df.GetColumnNames())
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def Define(self, df, name, expression):
+        df = df.Define(name, expression)
+        self.names.add(name)
+        return df
+
+    def Redefine(self, df, name, expression):
+        return df.Redefine(name, expression)
+
+    def DefineOrRedefine(self, df, name, expression):
+        if name in self.names:
+            return self.Redefine(df, name, expression)
+        return self.Define(df, name, expression)
+
+    def Alias(self, df, alias, name):
+        df = df.Alias(alias, name)
+        self.names.add(alias)
+        return df
+
+
+def loadHeader(header_name):
+    """Makes the declarations of one of the provider headers available to the interpreter.
+
+    If the prebuilt library (see prebuilt.py) is available, it already provides all the headers and nothing is
+    parsed; otherwise the header is declared to cling as usual.
+    """
+    if loadPrebuiltLibrary():
+        return
+    headers_dir = os.path.dirname(os.path.abspath(__file__))
+    header_path = os.path.join(headers_dir, header_name)
+    ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+
+
+def printCorrectionSetStats():
+    """Prints how many correction payloads were parsed, and how long it took (see CorrectionSetRegistry)."""
+    ROOT.gInterpreter.ProcessLine(
+        "::correction::CorrectionSetRegistry::getGlobal().printStats(std::cerr);"
+    )
+
+
+def setUsedSubsetMode(enabled=True):
+    """Enables the used-subset mode of the providers initialized afterwards (see CorrectionSetRegistry).
+
+    The providers then keep only the corrections that they bind at initialization, and releaseCorrectionSets frees the
+    rest of the payloads once all the providers are initialized.
+    """
+    loadHeader("corrections.h")
+    ROOT.gInterpreter.ProcessLine(
+        f"::correction::CorrectionSetRegistry::getGlobal().setUsedSubset({'true' if enabled else 'false'});"
+    )
+
+
+def releaseCorrectionSets():
+    """Drops the references of the registry to the loaded payloads: in the used-subset mode, only the corrections
+    bound by the providers remain in memory."""
+    ROOT.gInterpreter.ProcessLine(
+        "::correction::CorrectionSetRegistry::getGlobal().release();"
+    )
+
+
+def printProviderMemoryReport():
+    """Prints the resident memory taken by the initialization of each provider and the corrections it bound."""
+    ROOT.gInterpreter.ProcessLine(
+        "::correction::ProviderMemoryReport::getGlobal().print(std::cerr);"
+    )
+
+
+def prefetchCorrectionSets(file_names, n_threads=0):
+    """Loads the payloads concurrently into the registry, so that the providers initialized afterwards do not wait
+    for them one after the other. Returns the number of payloads that could not be loaded.
+    The memory report attributes the payloads to the prefetch instead of the providers that use them.
+    """
+    loadHeader("corrections.h")
+    return int(ROOT.correction.prefetchCorrectionSets(list(file_names), n_threads))
@@ -11,7 +11,7 @@ namespace correction {
     class DYbbtautauCorrProvider : public CorrectionsBase<DYbbtautauCorrProvider> {
       public:
         explicit DYbbtautauCorrProvider(const std::string& fileName)
-            : corrections_(CorrectionSet::from_file(fileName)), dyWeight_(corrections_->at("dy_weight")) {}
+            : corrections_(loadCorrectionSet(fileName)), dyWeight_(corrections_->at("dy_weight")) {}
 
         // template <typename LV1, typename LV2>
         double getWeight(const std::string& era,
@@ -38,7 +38,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        std::shared_ptr<const CorrectionSet> corrections_;
         Correction::Ref dyWeight_;
     };
 
@@ -1,5 +1,4 @@
 import os
-import ROOT
 from .CorrectionsCore import *
 
 
@@ -77,9 +76,7 @@ class DYbbtautauCorrProducer:
         )
 
         if not DYbbtautauCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "DY_hhbbtautau.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("DY_hhbbtautau.h")
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::DYbbtautauCorrProvider::Initialize("{self.json_path}")'
             )
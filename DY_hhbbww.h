@@ -11,7 +11,7 @@ namespace correction {
     class DYbbwwCorrProvider : public CorrectionsBase<DYbbwwCorrProvider> {
       public:
         explicit DYbbwwCorrProvider(const std::string& fileName)
-            : corrections_(CorrectionSet::from_file(fileName)), dy_hhbbww_Weight_(corrections_->at("dy_correction_weight")) {}
+            : corrections_(loadCorrectionSet(fileName)), dy_hhbbww_Weight_(corrections_->at("dy_correction_weight")) {}
 
         // template <typename LV1, typename LV2>
         double getWeight(const std::string& era,
@@ -32,7 +32,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        std::shared_ptr<const CorrectionSet> corrections_;
         Correction::Ref dy_hhbbww_Weight_;
     };
 
@@ -1,5 +1,4 @@
 import os
-import ROOT
 from .CorrectionsCore import *
 
 
@@ -57,9 +56,7 @@ class DYbbwwCorrProducer:
         )
 
         if not DYbbwwCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "DY_hhbbww.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("DY_hhbbww.h")
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::DYbbwwCorrProvider::Initialize("{self.json_path}")'
             )
@@ -7,7 +7,7 @@ namespace correction {
     class JetVetoMapProvider : public CorrectionsBase<JetVetoMapProvider> {
       public:
         JetVetoMapProvider(std::string const& fileName, std::string const& entry_name)
-            : corrections_(CorrectionSet::from_file(fileName)) {
+            : corrections_(loadCorrectionSet(fileName)) {
             std::cout << "JetVetoMapProvider: init" << std::endl;
             JetVetoMap_value = corrections_->at(entry_name);
         }
@@ -23,7 +23,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        std::shared_ptr<const CorrectionSet> corrections_;
         Correction::Ref JetVetoMap_value;
     };
 
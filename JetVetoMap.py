@@ -1,5 +1,4 @@
 import os
-import ROOT
 from .CorrectionsCore import *
 
 # https://twiki.cern.ch/twiki/bin/viewauth/CMS/SWGuideMuonSelection
@@ -36,9 +35,7 @@ class JetVetoMapProvider:
             ),
         )
         if not JetVetoMapProvider.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "JetVetoMap.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("JetVetoMap.h")
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::JetVetoMapProvider::Initialize("{JME_vetoMap_JsonFile}", "{entry_name}")'
             )
@@ -1,8 +1,5 @@
 import os
-import urllib.request
-import ROOT
 from .CorrectionsCore import *
-from FLAF.Common.Utilities import DeclareHeader
 
 
 class MuonEnergyScaleProducer:
@@ -42,18 +39,19 @@ class MuonEnergyScaleProducer:
         jsonFile = os.path.join(os.environ["ANALYSIS_PATH"], jsonFile_path)
         jsonFile_VXBS = os.path.join(os.environ["ANALYSIS_PATH"], jsonFile_path_VXBS)
         if not MuonEnergyScaleProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
+            from FLAF.Common.Utilities import DeclareHeader
+
             DeclareHeader(os.environ["ANALYSIS_PATH"] + "/FLAF/include/Utilities.h")
-            header_path = os.path.join(headers_dir, "MuonScaReProvider.h")
-            ROOT.gROOT.ProcessLine(f'#include "{header_path}"')
+            loadHeader("MuonScaReProvider.h")
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::MuonScaReCorrProvider::Initialize("{jsonFile}","{jsonFile_VXBS}")'
             )
-            header_path = os.path.join(headers_dir, "MuonFsrRecoveryProvider.h")
-            ROOT.gROOT.ProcessLine(f'#include "{header_path}"')
+            loadHeader("MuonFsrRecoveryProvider.h")
             MuonEnergyScaleProducer.initialized = True
 
-    def getP4Variations(self, df, source_dict):
+    def getP4Variations(self, df, source_dict, columns=None):
+        if columns is None:
+            columns = DefinedColumns(df)
         sources = [central]
         if not self.isData:
             sources += MuonEnergyScaleProducer.uncSources
@@ -73,21 +71,25 @@ class MuonEnergyScaleProducer:
                         if suffix == self.pt_for_ScaRe:
                             scare_branch = f"Muon_p4_{syst_name}"
                             scare_FSR_branch = f"Muon_p4_FSR_{syst_name}"
-                        df = df.Define(
+                        df = columns.Define(
+                            df,
                             scare_branch,
                             f"""::correction::MuonScaReCorrProvider::getGlobal().getES({self.id_selection}, v_ops::pt({p4}), v_ops::eta({p4}), v_ops::phi({p4}), v_ops::mass({p4}), Muon_charge, Muon_nTrackerLayers, isData, event, luminosityBlock, ::correction::MuonScaReCorrProvider::UncSource::{source}, ::correction::UncScale::{scale}, {use_VXBS})""",
                         )
                         p4 = scare_branch
-                        df = df.Define(
+                        df = columns.Define(
+                            df,
                             f"{scare_branch}_delta",
                             f"{scare_branch} - Muon_p4_{nano}",
                         )
                     if self.apply_fsr_recovery:
-                        df = df.Define(
+                        df = columns.Define(
+                            df,
                             scare_FSR_branch,
                             f"""::correction::MuonFsrRecoveryProvider::fsr_corrected_p4(v_ops::pt({p4}), v_ops::eta({p4}), v_ops::phi({p4}), v_ops::mass({p4}), Muon_fsrPhotonIdx, FsrPhoton_pt, FsrPhoton_eta, FsrPhoton_phi, FsrPhoton_dROverEt2, FsrPhoton_relIso03, FsrPhoton_electronIdx)""",
                         )
-                        df = df.Define(
+                        df = columns.Define(
+                            df,
                             f"{scare_FSR_branch}_delta",
                             f"{scare_FSR_branch} - Muon_p4_{nano}",
                         )
@@ -32,8 +32,8 @@ namespace correction {
         const std::string& jsonFile,
         const std::string& jsonFileVXBS
         ) :
-            cset(CorrectionSet::from_file(jsonFile)),
-            cset_vxbs(CorrectionSet::from_file(jsonFileVXBS))
+            cset(loadCorrectionSet(jsonFile)),
+            cset_vxbs(loadCorrectionSet(jsonFileVXBS))
         {}
 
         const CorrectionSet& getCSet(bool useVXBS) const {
@@ -111,8 +111,8 @@ namespace correction {
             }
 
       private:
-        std::unique_ptr<CorrectionSet> cset;
-        std::unique_ptr<CorrectionSet> cset_vxbs;
+        std::shared_ptr<const CorrectionSet> cset;
+        std::shared_ptr<const CorrectionSet> cset_vxbs;
 
       private:
         double get_rndm(double eta, double phi, float nL, int evtNumber, int lumiNumber, bool useVXBS = false) const {
@@ -109,7 +109,7 @@ namespace correction {
                         const std::string& VptCorrLibRecoilFileName,
                         const std::string& hist_name,
                         const std::string& hist_ewcorr_weight)
-            : vpt_weights_corrections_(CorrectionSet::from_file(VptCorrLibWeightsFileName)),
+            : vpt_weights_corrections_(loadCorrectionSet(VptCorrLibWeightsFileName)),
               vpt_weights_(vpt_weights_corrections_->at("DY_pTll_reweighting")) {
             // VptCorrProvider(const std::string& VptCorrRootFileName, const std::string& hist_name, const std::string& hist_ewcorr_weight)
             // {
@@ -173,7 +173,7 @@ namespace correction {
       private:
         std::unique_ptr<TH1> histo_Vpt_SF;
         std::unique_ptr<TH1> histo_ewcorr_SF;
-        std::unique_ptr<CorrectionSet> vpt_weights_corrections_;
+        std::shared_ptr<const CorrectionSet> vpt_weights_corrections_;
         Correction::Ref vpt_weights_;
     };
 
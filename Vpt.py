@@ -1,5 +1,4 @@
 import os
-import ROOT
 from .CorrectionsCore import *
 
 period_names_Vpt = {
@@ -64,9 +63,7 @@ class VptCorrProducer:
         hist_nominal_weight = "ewcorr"
         self.sampleType = sampleType
         if not VptCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "Vpt.h")
-            ROOT.gInterpreter.Declare(f"""#include "{header_path}" """)
+            loadHeader("Vpt.h")
             ROOT.gInterpreter.ProcessLine(
                 f"""::correction::VptCorrProvider::Initialize("{rootFile_EWKcorr}", "{jsonFile_EWKcorr_weight}","{jsonFile_EWKcorr_recoil}", "{hist_name}", "{hist_nominal_weight}")"""
             )
@@ -0,0 +1,364 @@
+import functools
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from .CorrectionsCore import ROOT, DefinedColumns
+from . import prebuilt
+
+# Ahead-of-time compilation of the columns defined by the correction producers.
+# The Define expressions produced for a configuration are the same in every job of a production, but cling
+# compiles them again in every job. With the AOT mode, the first job that runs a configuration records the
+# expressions together with the types of their inputs and outputs, and compiles them into a shared library
+# (lib<key>.so in the cache directory) with one typed Define per expression. The following jobs with the same key
+# load the library and replace each recorded expression with its compiled Define; expressions that are not found in
+# the library, or whose input types differ, are jitted as usual.
+#
+# The key is a hash of what selects the generated expressions: the method, its arguments, the corrections
+# configuration and the prebuilt library, which provides the provider headers and the singletons shared with the
+# compiled code (see prebuilt.py). The dataset and the process are not part of it, so that all the datasets of a
+# production share one library: the values that they embed in the expressions (e.g. cross sections, or the
+# denominators from ana_caches) only make the corresponding steps fall back to the JIT.
+# The cache directory is $CORRECTIONS_AOT_CACHE, or the aot directory in the prebuilt build directory.
+
+_string_literal = re.compile(r'"(?:\\.|[^"\\])*"')
+_identifier = re.compile(r"(?<![\w.])(?<!::)(?<!->)([A-Za-z_]\w*)")
+_return_statement = re.compile(r"\breturn\b")
+_lock_timeout = 3600
+# arguments that only carry values embedded in the expressions, left out of the key
+_key_excluded_arguments = {"ana_caches"}
+
+_disabled_reason_printed = False
+
+
+def cacheDir():
+    return os.environ.get(
+        "CORRECTIONS_AOT_CACHE", os.path.join(prebuilt.defaultOutputDir(), "aot")
+    )
+
+
+def usedColumns(expression, columns):
+    """Returns the columns referenced by a Define expression, in order of first use."""
+    used = []
+    for name in _identifier.findall(_string_literal.sub('""', expression)):
+        if name in columns and name not in used:
+            used.append(name)
+    return used
+
+
+def _canonical(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(
+        f"Corrections AOT: {type(value).__name__} can not be part of the configuration key"
+    )
+
+
+def configurationKey(*items):
+    """Hash of JSON-serializable items; sets are sorted, other types raise TypeError."""
+    content = json.dumps(items, sort_keys=True, default=_canonical)
+    return hashlib.sha256(content.encode()).hexdigest()[:20]
+
+
+class _Node:
+    """RDataFrame node handed to the producers while a session records or replays their definitions."""
+
+    # booked results read the columns without adding any, so that they do not escape the session
+    _actions = {
+        "Histo1D",
+        "Histo2D",
+        "Histo3D",
+        "HistoND",
+        "Profile1D",
+        "Profile2D",
+        "Sum",
+        "Count",
+        "Mean",
+        "Min",
+        "Max",
+    }
+
+    def __init__(self, df, session):
+        self.df = df
+        self.session = session
+
+    def Define(self, name, expression, *columns):
+        return self._define("Define", name, expression, columns)
+
+    def Redefine(self, name, expression, *columns):
+        return self._define("Redefine", name, expression, columns)
+
+    def _define(self, kind, name, expression, columns):
+        if len(columns) > 0 or not isinstance(expression, str):
+            # a functor or an explicit column list can not be recorded as an expression
+            self.session.invalidate(f"{kind} of {name} with a callable")
+            return _Node(
+                getattr(self.df, kind)(name, expression, *columns), self.session
+            )
+        return _Node(self.session.define(self.df, kind, name, expression), self.session)
+
+    def Alias(self, alias, name):
+        return _Node(self.session.alias(self.df, alias, name), self.session)
+
+    def GetColumnType(self, column):
+        return self.df.GetColumnType(column)
+
+    def GetColumnNames(self):
+        return self.df.GetColumnNames()
+
+    def HasColumn(self, column):
+        return self.df.HasColumn(column)
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        if attr in _Node._actions:
+            return getattr(self.df, attr)
+        # anything else escapes the session: the definitions are no longer recorded reliably
+        self.session.invalidate(attr)
+        return getattr(self.df, attr)
+
+
+def callOnRNode(df, fn, what):
+    """Returns fn(ROOT.RDF.AsRNode(df)), e.g. for the typed definitions of the providers.
+
+    A session node is unwrapped first: the definitions added by fn are not recorded, so the session is invalidated
+    and the result is wrapped again for the following definitions.
+    """
+    if isinstance(df, _Node):
+        df.session.invalidate(what)
+        return _Node(fn(ROOT.RDF.AsRNode(df.df)), df.session)
+    return fn(ROOT.RDF.AsRNode(df))
+
+
+def _unwrap(value):
+    if isinstance(value, _Node):
+        return value.df
+    if isinstance(value, tuple):
+        return tuple(_unwrap(v) for v in value)
+    return value
+
+
+class AOTSession:
+    """Records the definitions of one call (cache miss) or replays them from the compiled library (cache hit)."""
+
+    def __init__(self, key):
+        self.key = key
+        self.namespace = f"corrections_aot_{key}"
+        self.dir = cacheDir()
+        self.manifest_path = os.path.join(self.dir, f"{key}.json")
+        self.source_path = os.path.join(self.dir, f"{key}.cxx")
+        self.library_path = os.path.join(self.dir, f"lib{key}.so")
+        self.steps = []
+        self.valid = True
+        self.n_compiled = 0
+        self.n_jitted = 0
+        self.index = None
+        if os.path.exists(self.manifest_path) and os.path.exists(self.library_path):
+            self._loadLibrary()
+
+    def _loadLibrary(self):
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if ROOT.gSystem.Load(self.library_path) < 0:
+            print(
+                f"Corrections AOT: failed to load {self.library_path}", file=sys.stderr
+            )
+            return
+        ROOT.gInterpreter.Declare(
+            f"namespace {self.namespace} {{ ROOT::RDF::RNode define(ROOT::RDF::RNode df, int step); }}"
+        )
+        self.steps = manifest["steps"]
+        self.index = {
+            (step["kind"], step["name"], step["expression"]): step_idx
+            for step_idx, step in enumerate(self.steps)
+        }
+
+    @property
+    def replaying(self):
+        return self.index is not None
+
+    def wrap(self, df):
+        if not self.replaying:
+            self.columns = DefinedColumns(df)
+        return _Node(df, self)
+
+    def invalidate(self, reason):
+        if self.valid and not self.replaying:
+            print(
+                f"Corrections AOT: {reason} is not supported, {self.key} will not be cached",
+                file=sys.stderr,
+            )
+        self.valid = False
+
+    def define(self, df, kind, name, expression):
+        if self.replaying:
+            step_idx = self.index.get((kind, name, expression))
+            if step_idx is not None and self._inputsMatch(df, self.steps[step_idx]):
+                self.n_compiled += 1
+                define_fn = getattr(ROOT, self.namespace).define
+                return define_fn(ROOT.RDF.AsRNode(df), step_idx)
+            self.n_jitted += 1
+            return getattr(df, kind)(name, expression)
+
+        inputs = usedColumns(expression, self.columns)
+        input_types = [str(df.GetColumnType(column)) for column in inputs]
+        df = getattr(df, kind)(name, expression)
+        self.columns.names.add(name)
+        self.steps.append(
+            {
+                "kind": kind,
+                "name": name,
+                "expression": expression,
+                "inputs": inputs,
+                "input_types": input_types,
+                "type": str(df.GetColumnType(name)),
+            }
+        )
+        return df
+
+    def alias(self, df, alias, name):
+        if not self.replaying:
+            self.columns.names.add(alias)
+        return df.Alias(alias, name)
+
+    @staticmethod
+    def _inputsMatch(df, step):
+        return all(
+            str(df.GetColumnType(column)) == column_type
+            for column, column_type in zip(step["inputs"], step["input_types"])
+        )
+
+    def finish(self, result):
+        result = _unwrap(result)
+        if self.replaying:
+            print(
+                f"Corrections AOT: {self.key}: {self.n_compiled} compiled definitions, {self.n_jitted} jitted",
+                file=sys.stderr,
+            )
+        elif self.valid and len(self.steps) > 0:
+            self._compile()
+        return result
+
+    def _generateSource(self):
+        umbrella = os.path.join(
+            prebuilt.defaultOutputDir(), f"{prebuilt.library_name}.h"
+        )
+        lines = [
+            f"// Generated by Corrections/aot.py for configuration {self.key}.",
+            f'#include "{umbrella}"',
+            "",
+            f"namespace {self.namespace} {{",
+            "    using namespace ROOT::VecOps;",
+            "",
+            "    ROOT::RDF::RNode define(ROOT::RDF::RNode df, int step) {",
+            "        switch (step) {",
+        ]
+        for step_idx, step in enumerate(self.steps):
+            args = ", ".join(
+                f"const {column_type}& {column}"
+                for column, column_type in zip(step["inputs"], step["input_types"])
+            )
+            body = step["expression"]
+            if not _return_statement.search(body):
+                body = f"return {body};"
+            columns = ", ".join(f'"{column}"' for column in step["inputs"])
+            lines += [
+                f"            case {step_idx}:",
+                f'                return df.{step["kind"]}("{step["name"]}",',
+                f'                    []({args}) -> {step["type"]} {{ {body} }},',
+                f"                    {{{columns}}});",
+            ]
+        lines += [
+            "        }",
+            f'        throw std::runtime_error("{self.namespace}: unknown step " + std::to_string(step));',
+            "    }",
+            "}",
+            "",
+        ]
+        return "\n".join(lines)
+
+    def _compile(self):
+        os.makedirs(self.dir, exist_ok=True)
+        lock_path = os.path.join(self.dir, f"{self.key}.lock")
+        if os.path.exists(lock_path):
+            if time.time() - os.path.getmtime(lock_path) < _lock_timeout:
+                return  # another job is compiling the same configuration
+            os.remove(lock_path)
+        try:
+            lock = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return
+        os.close(lock)
+        try:
+            tmp_suffix = f".tmp{os.getpid()}"
+            with open(self.source_path, "w") as f:
+                f.write(self._generateSource())
+            output_dir = prebuilt.defaultOutputDir()
+            command = prebuilt.compileCommand(
+                [self.source_path],
+                self.library_path + tmp_suffix,
+                prebuilt.includeFlags(output_dir),
+                libs=[f"-L{output_dir}", f"-l{prebuilt.library_name}"],
+            )
+            start = time.time()
+            result = subprocess.run(command, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(
+                    f"Corrections AOT: compilation of {self.source_path} failed:\n{result.stderr}",
+                    file=sys.stderr,
+                )
+                return
+            os.replace(self.library_path + tmp_suffix, self.library_path)
+            with open(self.manifest_path + tmp_suffix, "w") as f:
+                json.dump({"key": self.key, "steps": self.steps}, f, indent=1)
+            os.replace(self.manifest_path + tmp_suffix, self.manifest_path)
+            print(
+                f"Corrections AOT: compiled {len(self.steps)} definitions into {self.library_path} in {time.time() - start:.0f} s",
+                file=sys.stderr,
+            )
+        finally:
+            os.remove(lock_path)
+
+
+def aotCompiled(method):
+    """Decorator of the Corrections methods that define columns: enables the AOT mode if corrections_aot is set.
+
+    The AOT mode needs the prebuilt library; without it, the method is called as usual.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, df, *args, **kwargs):
+        global _disabled_reason_printed
+        if not self.global_params.get("corrections_aot", False):
+            return method(self, df, *args, **kwargs)
+        if not prebuilt.loadPrebuiltLibrary():
+            if not _disabled_reason_printed:
+                print(
+                    "Corrections AOT: the prebuilt library is not available, using jitted definitions",
+                    file=sys.stderr,
+                )
+                _disabled_reason_printed = True
+            return method(self, df, *args, **kwargs)
+        key = configurationKey(
+            method.__name__,
+            args,
+            {
+                name: value
+                for name, value in kwargs.items()
+                if name not in _key_excluded_arguments
+            },
+            self.period,
+            self.stage,
+            self.isData,
+            self.to_apply,
+            self.global_params,
+            os.path.getmtime(prebuilt.libraryPath()),
+        )
+        session = AOTSession(key)
+        return session.finish(method(self, session.wrap(df), *args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,103 @@
+# Import time of the Corrections modules, measured with `python -X importtime` in a fresh interpreter.
+# Importing the modules must not start ROOT: ROOT and the interpreter are loaded when a provider is initialized
+# (see _LazyROOT in CorrectionsCore.py), and the FLAF utilities, which import ROOT, are imported where they are used.
+# The benchmark fails if ROOT or cppyy is imported, by a Corrections module or by one of its dependencies, and
+# reports which module imported it.
+#
+#   python benchmarks/import_time.py [--modules Corrections btag ...] [--top 15]
+
+import argparse
+import os
+import subprocess
+import sys
+
+headers_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+package = os.path.basename(headers_dir)
+
+_child = r"""
+import sys
+
+sys.path.insert(0, sys.argv[1])
+package = sys.argv[2]
+for module in sys.argv[3:]:
+    try:
+        __import__(f"{package}.{module}")
+    except Exception as e:
+        print(f"skipped {module}: {type(e).__name__}: {e}")
+"""
+
+_root_modules = ["ROOT", "cppyy"]
+
+
+def allModules():
+    return sorted(
+        name[: -len(".py")]
+        for name in os.listdir(headers_dir)
+        if name.endswith(".py") and name != "__init__.py"
+    )
+
+
+def importTimes(modules):
+    """Returns [(depth, module, self time [us], cumulative time [us])] in the order of the importtime report."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            _child,
+            os.path.dirname(headers_dir),
+            package,
+            *modules,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    for line in result.stdout.splitlines():
+        print(line)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def importer(entries, idx):
+    """Returns the module whose import triggered the import of entries[idx]."""
+    depth = entries[idx][0]
+    for parent_depth, parent, _, _ in entries[idx + 1 :]:
+        if parent_depth < depth:
+            return parent
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import time of the Corrections modules."
+    )
+    parser.add_argument("--modules", nargs="*", default=allModules())
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    entries = importTimes(args.modules)
+    own = [e for e in entries if e[1].startswith(f"{package}.")]
+    total = sum(e[2] for e in own)
+    print(f"{'module':<40} {'self':>10} {'cumulative':>12}  [ms]")
+    for _, name, self_us, cumulative_us in sorted(own, key=lambda e: -e[3])[: args.top]:
+        print(f"{name:<40} {self_us / 1e3:10.1f} {cumulative_us / 1e3:12.1f}")
+    print(f"{'total (self)':<40} {total / 1e3:10.1f}")
+
+    failed = False
+    for idx, (_, name, _, cumulative_us) in enumerate(entries):
+        if name not in _root_modules:
+            continue
+        parent = importer(entries, idx)
+        print(f"{name} imported by {parent} ({cumulative_us / 1e3:.0f} ms)")
+        failed = True
+    if failed:
+        sys.exit("ROOT is imported when the Corrections modules are imported")
@@ -0,0 +1,99 @@
+// Micro-benchmark of the per-jet cost of the JES uncertainty lookup in JetCorrectionProvider.
+//
+// "string lookup": what getShiftedP4_Base used to do for every jet and variation, i.e. copy the
+//                  std::map<UncSource, std::string>, look up the name and fetch the Correction::Ref with
+//                  corrset->at(name) before evaluating it.
+// "array index":   the Correction::Ref handles are resolved once and the hot loop only indexes an array.
+//
+// Build and run:
+//   g++ -O2 jes_unc_lookup.cc -o jes_unc_lookup $(correction config --cflags --ldflags --rpath)
+//   ./jes_unc_lookup jet_jerc.json.gz Summer22_22Sep2023_V2_MC_Regrouped_Absolute_AK4PFPuppi ...
+
+#include <array>
+#include <chrono>
+#include <iostream>
+#include <map>
+#include <random>
+#include <string>
+#include <vector>
+
+#include "correction.h"
+
+using correction::Correction;
+using correction::CorrectionSet;
+
+namespace {
+    constexpr size_t n_jets = 1000000;
+
+    struct Jet {
+        double eta;
+        double pt;
+    };
+
+    template <typename Fn>
+    double timePerJet(Fn&& fn, double& checksum) {
+        const auto start = std::chrono::steady_clock::now();
+        checksum += fn();
+        const auto stop = std::chrono::steady_clock::now();
+        return std::chrono::duration<double, std::nano>(stop - start).count() / n_jets;
+    }
+}  // namespace
+
+int main(int argc, char** argv) {
+    if (argc < 3) {
+        std::cerr << "usage: " << argv[0] << " <jet_jerc.json.gz> <uncertainty correction name>..." << std::endl;
+        return 1;
+    }
+    const auto corrset = CorrectionSet::from_file(argv[1]);
+    std::map<int, std::string> unc_map;
+    for (int n = 2; n < argc; ++n)
+        unc_map[n - 2] = argv[n];
+    const size_t n_sources = unc_map.size();
+
+    std::vector<Correction::Ref> unc_corr;
+    for (const auto& [source, name] : unc_map)
+        unc_corr.push_back(corrset->at(name));
+
+    std::mt19937 gen(42);
+    std::uniform_real_distribution<double> eta_dist(-4.7, 4.7);
+    std::uniform_real_distribution<double> pt_dist(15., 500.);
+    std::vector<Jet> jets(n_jets);
+    for (auto& jet : jets)
+        jet = {eta_dist(gen), pt_dist(gen)};
+
+    auto stringLookup = [&](std::map<int, std::string> map_copy) {
+        double sum = 0;
+        for (size_t i = 0; i < n_jets; ++i) {
+            const int source = static_cast<int>(i % n_sources);
+            sum += corrset->at(map_copy.at(source))->evaluate({jets[i].eta, jets[i].pt});
+        }
+        return sum;
+    };
+    auto arrayIndex = [&]() {
+        double sum = 0;
+        for (size_t i = 0; i < n_jets; ++i) {
+            const size_t source = i % n_sources;
+            sum += unc_corr[source]->evaluate({jets[i].eta, jets[i].pt});
+        }
+        return sum;
+    };
+    auto evaluateOnly = [&]() {
+        double sum = 0;
+        const auto& corr = unc_corr.front();
+        for (size_t i = 0; i < n_jets; ++i)
+            sum += corr->evaluate({jets[i].eta, jets[i].pt});
+        return sum;
+    };
+
+    double checksum = 0;
+    const double t_eval = timePerJet(evaluateOnly, checksum);
+    const double t_string = timePerJet([&]() { return stringLookup(unc_map); }, checksum);
+    const double t_array = timePerJet(arrayIndex, checksum);
+
+    std::cout << "jets: " << n_jets << ", uncertainty sources: " << n_sources << "\n"
+              << "evaluate only:  " << t_eval << " ns/jet\n"
+              << "string lookup:  " << t_string << " ns/jet (lookup overhead " << t_string - t_eval << " ns)\n"
+              << "array index:    " << t_array << " ns/jet (lookup overhead " << t_array - t_eval << " ns)\n"
+              << "checksum: " << checksum << std::endl;
+    return 0;
+}
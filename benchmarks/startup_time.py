@@ -0,0 +1,73 @@
+# Startup time of the correction providers: declaring all the headers to cling (what the producers do by default)
+# versus loading the prebuilt library (see prebuilt.py). Each measurement runs in a fresh interpreter and includes
+# `import ROOT`, the declarations and a first use of a provider, which forces the JIT compilation.
+#
+# Build the library first, then run:
+#   python prebuilt.py --prelude $ANALYSIS_PATH/FLAF/include/Utilities.h
+#   python benchmarks/startup_time.py --prelude $ANALYSIS_PATH/FLAF/include/Utilities.h [--repeat 5]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+headers_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_child = r"""
+import importlib.util
+import os
+import sys
+import time
+
+start = time.perf_counter()
+import ROOT
+
+mode, headers_dir, prelude = sys.argv[1], sys.argv[2], sys.argv[3:]
+spec = importlib.util.spec_from_file_location("prebuilt", os.path.join(headers_dir, "prebuilt.py"))
+prebuilt = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(prebuilt)
+t_import = time.perf_counter()
+
+if mode == "declare":
+    for path in prelude:
+        ROOT.gInterpreter.Declare(f'#include "{path}"')
+    for header in prebuilt.headers:
+        ROOT.gInterpreter.Declare(f'#include "{os.path.join(headers_dir, header)}"')
+elif not prebuilt.loadPrebuiltLibrary():
+    sys.exit(f"cannot load {prebuilt.libraryPath()}")
+t_declare = time.perf_counter()
+
+ROOT.gInterpreter.Declare(
+    "auto startup_time_probe = ::correction::MetVariations::Compute("
+    "LorentzVectorM(10., 0., 0., 0.), 1, {});"
+)
+t_use = time.perf_counter()
+print(t_import - start, t_declare - t_import, t_use - t_declare)
+"""
+
+
+def measure(mode, prelude):
+    env = dict(os.environ)
+    env["CORRECTIONS_PREBUILT"] = "0" if mode == "declare" else "1"
+    output = subprocess.check_output(
+        [sys.executable, "-c", _child, mode, headers_dir, *prelude], env=env, text=True
+    )
+    return [float(x) for x in output.split()[-3:]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Startup time: declared headers vs prebuilt library."
+    )
+    parser.add_argument("--prelude", nargs="*", default=[])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    prelude = [os.path.abspath(path) for path in args.prelude]
+
+    print(f"{'mode':<10} {'import':>8} {'declare':>8} {'1st use':>8} {'total':>8}  [s]")
+    for mode in ["declare", "prebuilt"]:
+        timings = [measure(mode, prelude) for _ in range(args.repeat)]
+        medians = [statistics.median(t[i] for t in timings) for i in range(3)]
+        total = statistics.median(sum(t) for t in timings)
+        print(f"{mode:<10} " + " ".join(f"{x:8.3f}" for x in medians + [total]))
@@ -41,7 +41,7 @@ namespace correction {
         };
 
         BosonicRecoilProvider(const std::string& jsonFile)
-            : cset_(CorrectionSet::from_file(jsonFile)),
+            : cset_(loadCorrectionSet(jsonFile)),
               corr_rescaling_(cset_->at("Recoil_correction_Rescaling")),
               corr_qmphist_(cset_->at("Recoil_correction_QuantileMapHist")),
               corr_qmpfit_(cset_->at("Recoil_correction_QuantileMapFit")),
@@ -290,7 +290,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> cset_;
+        std::shared_ptr<const CorrectionSet> cset_;
         Correction::Ref corr_rescaling_, corr_qmphist_, corr_qmpfit_, corr_unc_;
     };
 
@@ -1,5 +1,4 @@
 import os
-import ROOT
 from .CorrectionsCore import *
 
 # Bosonic recoil corrections following recommendations from https://cms-higgs-leprare.docs.cern.ch/htt-common/V_recoil/
@@ -31,9 +30,7 @@ class BosonicRecoilCorrection:
         )
 
         if not BosonicRecoilCorrection.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "bosonicRecoil.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("bosonicRecoil.h")
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::BosonicRecoilProvider::Initialize("{json_file}")'
             )
@@ -60,9 +57,9 @@ class BosonicRecoilCorrection:
         recoil_method = to_apply["bosonicRecoil"].get("method", "QuantileMapHist")
         apply_systematics = to_apply["bosonicRecoil"].get("apply_systematics", True)
 
-        column_names = [str(c) for c in df.GetColumnNames()]
+        columns = DefinedColumns(df)
         has_gen_recoil_inputs = all(
-            c in column_names
+            c in columns
             for c in [
                 "recoil_GenBoson_pt",
                 "recoil_GenBoson_phi",
@@ -1,6 +1,10 @@
 #ifndef CORRECTION_BTAG_H
 #define CORRECTION_BTAG_H
 
+#include <algorithm>
+#include <array>
+#include <optional>
+
 #include "correction.h"
 #include "corrections.h"
 
@@ -52,31 +56,89 @@ namespace correction {
             return false;
         }
 
-        using histEffmap = std::map<std::pair<WorkingPointsbTag, int>, std::shared_ptr<TH2>>;
+        // Efficiency map of one (WP, flavour) converted from its TH2: bin edges and contents in flat arrays, looked
+        // up with the same bin finding as TAxis::FindFixBin, clamped to the first/last bin.
+        class EfficiencyMap {
+          public:
+            struct Axis {
+                explicit Axis(const TAxis& axis)
+                    : n_bins(axis.GetNbins()), x_min(axis.GetXmin()), x_max(axis.GetXmax()) {
+                    if (axis.GetXbins()->GetSize() > 0)
+                        edges.assign(axis.GetXbins()->GetArray(), axis.GetXbins()->GetArray() + n_bins + 1);
+                }
+
+                // 0-based bin index, clamped
+                int bin(double x) const {
+                    if (x < x_min)
+                        return 0;
+                    if (!(x < x_max))
+                        return n_bins - 1;
+                    const int root_bin = edges.empty()
+                                             ? 1 + int(n_bins * (x - x_min) / (x_max - x_min))
+                                             : int(std::upper_bound(edges.begin(), edges.end(), x) - edges.begin());
+                    return std::clamp(root_bin, 1, n_bins) - 1;
+                }
+
+                int n_bins;
+                double x_min, x_max;
+                std::vector<double> edges;  // empty for fixed-width bins
+            };
+
+            EfficiencyMap() = default;
+            explicit EfficiencyMap(const TH2& hist) : x_axis_(*hist.GetXaxis()), y_axis_(*hist.GetYaxis()) {
+                content_.resize(x_axis_->n_bins * y_axis_->n_bins);
+                for (int x_bin = 0; x_bin < x_axis_->n_bins; ++x_bin) {
+                    for (int y_bin = 0; y_bin < y_axis_->n_bins; ++y_bin)
+                        content_[x_bin * y_axis_->n_bins + y_bin] = hist.GetBinContent(x_bin + 1, y_bin + 1);
+                }
+            }
+
+            explicit operator bool() const { return x_axis_.has_value(); }
+
+            float operator()(double x, double y) const {
+                return content_[x_axis_->bin(x) * y_axis_->n_bins + y_axis_->bin(y)];
+            }
+
+          private:
+            std::optional<Axis> x_axis_, y_axis_;
+            std::vector<float> content_;
+        };
+
+        static constexpr size_t n_wps = 3;
+        static constexpr size_t n_flavours = 3;
+
+        static size_t wpIndex(WorkingPointsbTag wp) {
+            return wp == WorkingPointsbTag::Loose ? 0 : (wp == WorkingPointsbTag::Medium ? 1 : 2);
+        }
+
+        // hadronFlavour 0, 4, 5 -> 0, 1, 2; n_flavours for the other values
+        static size_t flavourIndex(int flavour) {
+            return flavour == 0 ? 0 : (flavour == 4 ? 1 : (flavour == 5 ? 2 : n_flavours));
+        }
 
         bTagCorrProvider(const std::string& fileName,
                          const std::string& efficiencyFileName,
                          std::string const& tagger_name)
-            : corrections_(CorrectionSet::from_file(fileName))
-              // ,   tagger_incl_(corrections_->at(tagger_name + "_incl")) // keys *_incl are not available in 2022 json file
-              // ,   tagger_comb_(corrections_->at(tagger_name + "_comb"))  // keys *_comb are not available in 2023 json file
+            : corrections_(fileName)
+              // ,   tagger_incl_(corrections_.at(tagger_name + "_incl")) // keys *_incl are not available in 2022 json file
+              // ,   tagger_comb_(corrections_.at(tagger_name + "_comb"))  // keys *_comb are not available in 2023 json file
               ,
-              tagger_wp_values_(corrections_->at(tagger_name + "_wp_values")) {
+              tagger_wp_values_(corrections_.at(tagger_name + "_wp_values")) {
             if (efficiencyFileName.size() > 0) {
                 auto efficiencyFile = root_ext::OpenRootFile(efficiencyFileName);
                 static const std::vector<std::string> WpNames = {"Loose", "Medium", "Tight"};
                 static const std::vector<int> Flavours = {0, 4, 5};
                 for (const auto& flav : Flavours) {
-                    auto denum =
-                        root_ext::ReadCloneObject<TH2>(*efficiencyFile, "jet_pt_eta_" + std::to_string(flav), "", true);
+                    std::unique_ptr<TH2> denum(root_ext::ReadCloneObject<TH2>(
+                        *efficiencyFile, "jet_pt_eta_" + std::to_string(flav), "", true));
                     for (const auto& wp_entry : getWPNames()) {
-                        auto num = root_ext::ReadCloneObject<TH2>(
+                        std::unique_ptr<TH2> num(root_ext::ReadCloneObject<TH2>(
                             *efficiencyFile,
                             "jet_pt_eta_" + std::to_string(flav) + "_" + wp_entry.second.second,
                             "",
-                            true);
-                        num->Divide(denum);
-                        histMapEfficiency[std::make_pair(wp_entry.first, flav)] = std::shared_ptr<TH2>(num);
+                            true));
+                        num->Divide(denum.get());
+                        efficiency_maps_[wpIndex(wp_entry.first)][flavourIndex(flav)] = EfficiencyMap(*num);
                     }
                 }
             }
@@ -84,6 +146,7 @@ namespace correction {
             for (auto const& wp_entry : getWPNames()) {
                 wp_thrs[wp_entry.first] = tagger_wp_values_->evaluate({wp_entry.second.first});
             }
+            corrections_.release();
         }
 
         float getWPvalue(WorkingPointsbTag wp) const { return wp_thrs.at(wp); }
@@ -133,27 +196,11 @@ namespace correction {
 
       private:
         float GetBtagEfficiency(float pt, float eta, int flavour, WorkingPointsbTag wp) const {
-            const auto key = std::make_pair(wp, flavour);
-            auto iter = histMapEfficiency.find(key);
-            if (iter == histMapEfficiency.end())
+            const size_t flavour_idx = flavourIndex(flavour);
+            if (flavour_idx >= n_flavours || !efficiency_maps_[wpIndex(wp)][flavour_idx])
                 throw analysis::exception("ERROR: bTagEfficiency not found in the map! Flavour= %1% VS WP = %2%") %
                     flavour % getWPNames().at(wp).second;
-            const auto& hist = iter->second;
-            const auto x_axis = hist->GetXaxis();
-            int x_bin = x_axis->FindFixBin(pt);
-            if (x_bin < 1)
-                x_bin = 1;
-            if (x_bin > x_axis->GetNbins())
-                x_bin = x_axis->GetNbins();
-            const auto y_axis = hist->GetYaxis();
-
-            int y_bin = y_axis->FindFixBin(eta);
-            if (y_bin < 1)
-                y_bin = 1;
-            if (y_bin > y_axis->GetNbins())
-                y_bin = y_axis->GetNbins();
-
-            return hist->GetBinContent(x_bin, y_bin);
+            return efficiency_maps_[wpIndex(wp)][flavour_idx](pt, eta);
         }
 
         static float GetNormalisedEfficiency(float eff) {
@@ -165,9 +212,9 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        BoundCorrections corrections_;
         Correction::Ref tagger_incl_, tagger_comb_, tagger_wp_values_;
-        histEffmap histMapEfficiency;
+        std::array<std::array<EfficiencyMap, n_flavours>, n_wps> efficiency_maps_;
         std::map<WorkingPointsbTag, float> wp_thrs;
     };
 
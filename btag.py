@@ -1,7 +1,5 @@
 import os
-import ROOT
 from .CorrectionsCore import *
-from FLAF.Common.Utilities import WorkingPointsbTag
 import yaml
 import json
 
@@ -73,6 +71,17 @@ class bTagCorrProducer:
         "UParTAK4": "UParTAK4B",
     }
 
+    @staticmethod
+    def payloadFiles(period):
+        jsonFile = bTagCorrProducer.jsonPath.format(
+            pog_folder_names["BTV"][period]
+        )  # for 2025 latest is not available, but files are in this folder available: add_2025_b_and_c_WPs (?) bah
+        if not os.path.exists(jsonFile):
+            jsonFile = bTagCorrProducer.alternative_jsonPath.format(
+                pog_folder_names["BTV"][period]
+            )
+        return [jsonFile]
+
     # important note: From the 2024 campaign onwards, only the UParTAK4 tagger is supported, and only json files are provided.
     def __init__(
         self,
@@ -83,19 +92,14 @@ class bTagCorrProducer:
         tagger="particleNet",
         useSplitJes=False,
         wantShape=False,
+        use_tabulated=False,
     ):
         print(f"tagger={tagger}")
         self.tagger = tagger
         self.btag_branch = bTagCorrProducer.tagger_to_brag_branch[tagger]
         self.jetCollection = jetCollection
         self.useSplitJes = useSplitJes
-        jsonFile = bTagCorrProducer.jsonPath.format(
-            pog_folder_names["BTV"][period]
-        )  # for 2025 latest is not available, but files are in this folder available: add_2025_b_and_c_WPs (?) bah
-        if not os.path.exists(jsonFile):
-            jsonFile = bTagCorrProducer.alternative_jsonPath.format(
-                pog_folder_names["BTV"][period]
-            )
+        (jsonFile,) = bTagCorrProducer.payloadFiles(period)
         jsonFile_eff = os.path.join(
             os.environ["ANALYSIS_PATH"],
             bTagCorrProducer.bTagEff_JsonPath.format(period),
@@ -103,11 +107,8 @@ class bTagCorrProducer:
         if not loadEfficiency:
             jsonFile_eff = ""
         if not bTagCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "btag.h")
-            headershape_path = os.path.join(headers_dir, "btagShape.h")
-            ROOT.gInterpreter.Declare(f'#include "{headershape_path}"')
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("btagShape.h")
+            loadHeader("btag.h")
 
             ROOT.gInterpreter.ProcessLineSynch(
                 f'::correction::bTagCorrProvider::Initialize("{jsonFile}", "{jsonFile_eff}", "{self.tagger}")'
@@ -119,8 +120,12 @@ class bTagCorrProducer:
             wantShape_str = "false"
             if wantShape:
                 wantShape_str = "true"
+            tabulated = "false"
+            if wantShape and use_tabulated:
+                self.registerTabulatedShapes(jsonFile)
+                tabulated = "true"
             ROOT.gInterpreter.ProcessLineSynch(
-                f"""::correction::bTagShapeCorrProvider::Initialize("{jsonFile}", "{periods[period]}", "{self.tagger}", {wantShape_str})"""
+                f"""::correction::bTagShapeCorrProvider::Initialize("{jsonFile}", "{periods[period]}", "{self.tagger}", {wantShape_str}, {tabulated})"""
             )
             # ROOT.correction.bTagShapeCorrProvider.Initialize(
             #     jsonFile, periods[period], self.tagger
@@ -129,7 +134,32 @@ class bTagCorrProducer:
 
             bTagCorrProducer.initialized = True
 
+    def registerTabulatedShapes(self, json_file):
+        from .tabulated import loadPayload, registerTabulatedCorrection
+
+        shape_name = f"{self.tagger}_shape"
+        shape_corr = next(
+            c for c in loadPayload(json_file)["corrections"] if c["name"] == shape_name
+        )
+        # the systematic and the flavour are fixed for each grid: (|eta|, pt, discriminant) become the grid axes
+        syst_input, flavour_input = [v["name"] for v in shape_corr["inputs"][:2]]
+        provider = ROOT.correction.bTagShapeCorrProvider
+        for variation in provider.tabulatedVariations():
+            unc_name, flavour = str(variation.first), int(variation.second)
+            try:
+                registerTabulatedCorrection(
+                    json_file,
+                    shape_name,
+                    key=str(provider.tabulatedGridName(self.tagger, unc_name, flavour)),
+                    fixed_inputs={syst_input: unc_name, flavour_input: flavour},
+                )
+            except RuntimeError as e:
+                # the provider refuses the tabulated mode if any grid is missing
+                print(f"bTagCorrProducer: {e}")
+
     def getWPValues(self):
+        from FLAF.Common.Utilities import WorkingPointsbTag
+
         wp_values = {}
         for wp in WorkingPointsbTag:
             root_wp = getattr(ROOT.WorkingPointsbTag, wp.name)
@@ -147,6 +177,8 @@ class bTagCorrProducer:
         return df
 
     def getBTagWPSF(self, df, return_variations=True, isCentral=True):
+        from FLAF.Common.Utilities import WorkingPointsbTag
+
         sf_sources = bTagCorrProducer.uncSource_bTagWP
         SF_branches = []
         sf_scales = [up, down] if return_variations else []
@@ -220,6 +252,18 @@ class bTagCorrProducer:
         print(f"\tsrc_list={src_list}")
         print(f"\tscale_list={scale_list}")
 
+        p4 = f"{self.jetCollection}_p4"
+        hadronFlavour = f"{self.jetCollection}_hadronFlavour"
+        btagScore = f"{self.jetCollection}_btag{self.btag_branch}"
+        # the central SF and the norm-source variations are computed together in a single pass over the jets
+        fused = len(src_list) > 1
+        sfs_column = f"{self.jetCollection}_bTagShapeSFs"
+        if fused:
+            df = df.Define(
+                sfs_column,
+                f"::correction::bTagShapeCorrProvider::getGlobal().getBTagShapeSFs({p4}, {hadronFlavour}, {btagScore})",
+            )
+
         for source in src_list:
             for scale in scale_list:
                 if (source == central and scale != central) or (
@@ -232,18 +276,22 @@ class bTagCorrProducer:
                 branch_name = f"weight_bTagShape_{syst_name}"
                 branch_central = f"weight_bTagShape_{central}"
 
-                p4 = f"{self.jetCollection}_p4"
-                hadronFlavour = f"{self.jetCollection}_hadronFlavour"
-                btagScore = f"{self.jetCollection}_btag{self.btag_branch}"
-
-                df = df.Define(
-                    f"{branch_name}_double",
-                    f"""::correction::bTagShapeCorrProvider::getGlobal().getBTagShapeSF(
-                    {p4}, {hadronFlavour}, {btagScore},
-                    ::correction::bTagShapeCorrProvider::UncSource::{source},
-                    ::correction::UncScale::{scale}
-                    ) """,
-                )
+                if fused:
+                    df = df.Define(
+                        f"{branch_name}_double",
+                        f"""{sfs_column}[::correction::bTagShapeCorrProvider::normVariationIndex(
+                        ::correction::bTagShapeCorrProvider::UncSource::{source},
+                        ::correction::UncScale::{scale})]""",
+                    )
+                else:
+                    df = df.Define(
+                        f"{branch_name}_double",
+                        f"""::correction::bTagShapeCorrProvider::getGlobal().getBTagShapeSF(
+                        {p4}, {hadronFlavour}, {btagScore},
+                        ::correction::bTagShapeCorrProvider::UncSource::{source},
+                        ::correction::UncScale::{scale}
+                        ) """,
+                    )
 
                 if (
                     scale != central and not force_name_as_central
@@ -267,20 +315,45 @@ class bTagCorrProducer:
         return df, SF_branches
 
 
-ROOT.gInterpreter.Declare(r"""
-#include <map>
-#include <string>
+_btag_norm_table_declared = False
+
+
+def declareBTagNormTable():
+    global _btag_norm_table_declared
+    if _btag_norm_table_declared:
+        return
+    ROOT.gInterpreter.Declare(r"""
+#include <vector>
+
+// Normalization factors of the btag shape weights, [row][bin] with n_bins + 1 bins: the last one is for the
+// events outside of all the bins, which are not corrected.
+struct BTagNormTable {
+  size_t n_bins = 0;
+  std::vector<float> content;
 
-struct BTagMapApplier {
-  std::map<std::string,float> corr;
+  const float* row(size_t row_idx) const { return content.data() + row_idx * (n_bins + 1); }
+};
+
+// w * numerator[bin] / denominator[bin] for two rows of a BTagNormTable, which must outlive the applier
+struct BTagNormApplier {
+  const float* numerator;
+  const float* denominator;
 
-  float operator()(float w, const std::string &key) const {
-    auto it = corr.find(key);
-    const float r = (it != corr.end()) ? it->second : 1.0;
-    return w * r;
-  }
+  BTagNormApplier(const BTagNormTable& table, size_t numerator_row, size_t denominator_row)
+      : numerator(table.row(numerator_row)), denominator(table.row(denominator_row)) {}
+
+  float operator()(float w, int bin) const { return w * numerator[bin] / denominator[bin]; }
 };
 """)
+    _btag_norm_table_declared = True
+
+
+def defineBTagNormBinColumn(df, bincol, bins, columns):
+    # index of the first bin whose cut is passed, len(bins) if none
+    expr = str(len(bins))
+    for bin_idx, cut in reversed(list(enumerate(bins.values()))):
+        expr = f"({cut}) ? {bin_idx} : {expr}"
+    return columns.DefineOrRedefine(df, bincol, f"static_cast<int>({expr})")
 
 
 class btagShapeWeightCorrector:
@@ -289,21 +362,25 @@ class btagShapeWeightCorrector:
         with open(norm_file_path, "r") as norm_file:
             self.shape_weight_corr_dict = json.load(norm_file)
         self.bins = bins
-        self._appliers = []
-
-    def _define_key_column(self, df, keycol, syst):
-        # key = norm_<syst>_<bin_name>
-        pieces = []
-        for bin_name, cut in self.bins.items():
-            pieces.append(f'({cut}) ? std::string("norm_{syst}_{bin_name}") : ')
-        key_expr = "".join(pieces) + 'std::string("__default__")'
-
-        cols = set(df.GetColumnNames())
-        return (
-            df.Redefine(keycol, key_expr)
-            if keycol in cols
-            else df.Define(keycol, key_expr)
-        )
+        self._tables = []
+
+    def _makeTable(self, norm_factors, systs):
+        """BTagNormTable with the rows [no correction, Central, *systs], filled from the norm_<syst>_<bin> keys."""
+        declareBTagNormTable()
+        table = ROOT.BTagNormTable()
+        table.n_bins = len(self.bins)
+        content = []
+        for syst in ["", "Central"] + systs:
+            for bin_name in self.bins:
+                content.append(
+                    float(norm_factors.get(f"norm_{syst}_{bin_name}", 1.0))
+                    if syst
+                    else 1.0
+                )
+            content.append(1.0)
+        table.content = ROOT.std.vector["float"](content)
+        self._tables.append(table)
+        return table
 
     def UpdateBtagWeight(self, *, df, unc_src, unc_scale, sf_branches):
         unc_src_scale = f"{unc_src}_{unc_scale}" if unc_src != unc_scale else unc_src
@@ -315,45 +392,158 @@ class btagShapeWeightCorrector:
         # btag branches have format weight_bTagShape_{syst}_rel
         # need to extract syst => need token #2
         systs = [b.split("_")[2] for b in sf_branches]
+        systs = [syst for syst in systs if syst != "Central"]
 
-        applier = ROOT.BTagMapApplier()
-        applier.corr["__default__"] = 1.0
-        for k, v in self.shape_weight_corr_dict[unc_src_scale].items():
-            applier.corr[k] = float(v)
-        self._appliers.append(applier)
-
-        # only correct weights for uncertainty variations
-        # branches are defined as relative, i.e. branch/central
-        # to correct, need to first multiply by central
-        # after this loop _rel branches will have the full value
-        # => will have to divide them by central after it is corrected
-        for syst in systs:
-            if syst == "Central":
-                continue
-            keycol = f"btag_shape_norm_key_{syst}"
-            df = self._define_key_column(df, keycol, syst)
+        table = self._makeTable(self.shape_weight_corr_dict[unc_src_scale], systs)
+        columns = DefinedColumns(df)
+        bincol = "btag_shape_norm_bin"
+        df = defineBTagNormBinColumn(df, bincol, self.bins, columns)
 
+        # the _rel branches are relative to central, which is corrected as well:
+        # rel := rel * central * corr(norm_<syst>_<bin>) / (central * corr(norm_Central_<bin>))
+        for syst_idx, syst in enumerate(systs):
+            applier = ROOT.BTagNormApplier(table, 2 + syst_idx, 1)
             branch_name = f"weight_bTagShape_{syst}_rel"
-            # rel := rel * central * corr(norm_<syst>_<bin>)
-            df = df.Redefine(
-                branch_name, f"(float){branch_name} * weight_bTagShape_Central"
-            ).Redefine(branch_name, applier, [branch_name, keycol])
+            df = df.Redefine(branch_name, applier, [branch_name, bincol])
 
-        # correct central separately after everything else was corrected and central is not needed
-        df = self._define_key_column(df, "btag_shape_norm_key_Central", "Central")
+        applier = ROOT.BTagNormApplier(table, 1, 0)
         df = df.Redefine(
-            "weight_bTagShape_Central",
-            applier,
-            ["weight_bTagShape_Central", "btag_shape_norm_key_Central"],
+            "weight_bTagShape_Central", applier, ["weight_bTagShape_Central", bincol]
         )
+        return df
 
-        # redefine all _rel branches by dividing them by updated Central to make them contain relative value
-        for syst in systs:
-            if syst == "Central":
-                continue
-            branch_name = f"weight_bTagShape_{syst}_rel"
-            df = df.Redefine(
-                branch_name, f"(float){branch_name} / weight_bTagShape_Central"
-            )
 
+class btagShapeNormCacheProducer:
+    """Sums of weights per bin for the btag shape normalization, filled in the event loop that defines the
+    weight_bTagShape_* columns.
+
+    For each bin, the partial result holds the sum of the weights without the btag shape weight and, for every
+    systematic, with it; all of them are filled by a single Histo2D (systematic x bin). The partial results of
+    several files are merged with mergePartialResults and turned into the normalization factors read by
+    btagShapeWeightCorrector.UpdateBtagWeight with normFactors.
+    """
+
+    def __init__(self, *, bins, weight="1."):
+        self.bins = bins
+        self.weight = weight
+        self.histograms = {}
+
+    def book(self, df, unc_src, unc_scale, sf_branches):
+        """Books the sums for the weight_bTagShape_* columns in sf_branches, as returned by getBTagShapeSF."""
+        unc_src_scale = f"{unc_src}_{unc_scale}" if unc_src != unc_scale else unc_src
+        central_branch = f"weight_bTagShape_{central}"
+        systs = [b.split("_")[2] for b in sf_branches]
+        # the _rel branches are relative to central
+        weights = ["w"] + [
+            f"w * {b} * {central_branch}" if b.endswith("_rel") else f"w * {b}"
+            for b in sf_branches
+        ]
+        n_rows = len(weights)
+        n_bins = len(self.bins)
+
+        columns = DefinedColumns(df)
+        bincol = "btag_shape_norm_bin"
+        df = defineBTagNormBinColumn(df, bincol, self.bins, columns)
+        df = columns.DefineOrRedefine(
+            df,
+            "btag_shape_norm_cache_rows",
+            f"ROOT::VecOps::RVec<int>{{{', '.join(str(n) for n in range(n_rows))}}}",
+        )
+        df = columns.DefineOrRedefine(
+            df,
+            "btag_shape_norm_cache_bins",
+            f"ROOT::VecOps::RVec<int>({n_rows}, {bincol})",
+        )
+        df = columns.DefineOrRedefine(
+            df,
+            "btag_shape_norm_cache_weights",
+            f"const double w = {self.weight}; return ROOT::VecOps::RVec<double>{{{', '.join(weights)}}};",
+        )
+        model = ROOT.RDF.TH2DModel(
+            f"btag_shape_norm_cache_{unc_src_scale}",
+            "",
+            n_rows,
+            -0.5,
+            n_rows - 0.5,
+            n_bins + 1,
+            -0.5,
+            n_bins + 0.5,
+        )
+        histogram = df.Histo2D(
+            model,
+            "btag_shape_norm_cache_rows",
+            "btag_shape_norm_cache_bins",
+            "btag_shape_norm_cache_weights",
+        )
+        self.histograms[unc_src_scale] = (systs, histogram)
         return df
+
+    def partialResult(self):
+        """{unc_src_scale: {"sum_w": {bin: sum}, "sum_w_btag": {syst: {bin: sum}}}}; runs the event loop if needed."""
+        result = {}
+        for unc_src_scale, (systs, histogram) in self.histograms.items():
+            hist = histogram.GetValue()
+            sums = {"sum_w": {}, "sum_w_btag": {syst: {} for syst in systs}}
+            for bin_idx, bin_name in enumerate(self.bins):
+                sums["sum_w"][bin_name] = hist.GetBinContent(1, bin_idx + 1)
+                for syst_idx, syst in enumerate(systs):
+                    sums["sum_w_btag"][syst][bin_name] = hist.GetBinContent(
+                        syst_idx + 2, bin_idx + 1
+                    )
+            result[unc_src_scale] = sums
+        return result
+
+    @staticmethod
+    def _add(a, b):
+        if isinstance(a, dict):
+            return {
+                key: (
+                    btagShapeNormCacheProducer._add(a[key], b[key])
+                    if key in a and key in b
+                    else a.get(key, b.get(key))
+                )
+                for key in list(a) + [key for key in b if key not in a]
+            }
+        return a + b
+
+    @staticmethod
+    def mergePartialResults(partial_results):
+        """Sums the partial results pairwise (tree reduction)."""
+        results = list(partial_results)
+        if not results:
+            return {}
+        while len(results) > 1:
+            merged = [
+                btagShapeNormCacheProducer._add(results[idx], results[idx + 1])
+                for idx in range(0, len(results) - 1, 2)
+            ]
+            if len(results) % 2 == 1:
+                merged.append(results[-1])
+            results = merged
+        return results[0]
+
+    @staticmethod
+    def normFactors(sums):
+        """{unc_src_scale: {"norm_<syst>_<bin>": sum_w / sum_w_btag}}, as read by UpdateBtagWeight."""
+        norm = {}
+        for unc_src_scale, entry in sums.items():
+            factors = {}
+            for syst, syst_sums in entry["sum_w_btag"].items():
+                for bin_name, sum_w_btag in syst_sums.items():
+                    sum_w = entry["sum_w"][bin_name]
+                    factors[f"norm_{syst}_{bin_name}"] = (
+                        sum_w / sum_w_btag if sum_w_btag != 0 else 1.0
+                    )
+            norm[unc_src_scale] = factors
+        return norm
+
+    @staticmethod
+    def aggregate(partial_files, output_file):
+        """Merges the partial results stored in partial_files (JSON) and writes the normalization factors."""
+        partial_results = []
+        for path in partial_files:
+            with open(path, "r") as f:
+                partial_results.append(json.load(f))
+        sums = btagShapeNormCacheProducer.mergePartialResults(partial_results)
+        with open(output_file, "w") as f:
+            json.dump(btagShapeNormCacheProducer.normFactors(sums), f, indent=2)
@@ -3,8 +3,9 @@
 
 #include "corrections.h"
 #include "jet.h"
+#include "tabulated.h"
 
-#include <set>
+#include <array>
 
 namespace correction {
     class bTagShapeCorrProvider : public CorrectionsBase<bTagShapeCorrProvider> {
@@ -40,7 +41,7 @@ namespace correction {
             }
             return false;
         }
-        static const std::map<UncSource, std::string> getUncName() {
+        static const std::map<UncSource, std::string>& getUncName() {
             static const std::map<UncSource, std::string> UncMapNames = {
                 {UncSource::Central, "Central"},
                 {UncSource::lf, "lf"},
@@ -138,73 +139,218 @@ namespace correction {
             return false;
         }
 
+        // number of the norm sources (lf ... cferr2), which are evaluated together by getBTagShapeSFs
+        static constexpr size_t n_norm_sources = static_cast<size_t>(UncSource::cferr2) + 1;
+        // central followed by the up and down variations of each norm source
+        static constexpr size_t n_norm_variations = 1 + 2 * n_norm_sources;
+        using NormVariationSFs = std::array<double, n_norm_variations>;
+
+        // Index of a (source, scale) pair in NormVariationSFs.
+        static constexpr size_t normVariationIndex(UncSource source, UncScale scale) {
+            if (source == UncSource::Central || scale == UncScale::Central)
+                return 0;
+            return 1 + 2 * static_cast<size_t>(source) + (scale == UncScale::Down ? 1 : 0);
+        }
+
+        static bool isShapeJet(const LorentzVectorM& p4, int flavour, float score) {
+            return !(score > 1.0 || score < 0.0) && std::abs(p4.eta()) < 2.5 && p4.pt() >= 20.0 &&
+                   (flavour == 0 || flavour == 4 || flavour == 5);
+        }
+
+        // correctionlib systematic names of the entries of NormVariationSFs
+        static const std::array<std::string, n_norm_variations>& normUncNames() {
+            static const std::array<std::string, n_norm_variations> names = [] {
+                std::array<std::string, n_norm_variations> result;
+                result[0] = "central";
+                for (size_t source_idx = 0; source_idx < n_norm_sources; ++source_idx) {
+                    const std::string& source_str = getUncName().at(static_cast<UncSource>(source_idx));
+                    result[1 + 2 * source_idx] = getScaleStr(UncScale::Up) + source_str;
+                    result[2 + 2 * source_idx] = getScaleStr(UncScale::Down) + source_str;
+                }
+                return result;
+            }();
+            return names;
+        }
+
+        // Shape jet flavours (hadronFlavour 0, 4, 5) -> index in the per-flavour tables.
+        static constexpr size_t n_flavours = 3;
+        static size_t flavourIndex(int flavour) { return flavour == 5 ? 2 : (flavour == 4 ? 1 : 0); }
+        static int flavourFromIndex(size_t flavour_idx) { return flavour_idx == 2 ? 5 : (flavour_idx == 1 ? 4 : 0); }
+
+        // Key in TabulatedGridRegistry of the (|eta|, pt, discriminant) grid of one systematic and flavour.
+        static std::string tabulatedGridName(const std::string& tagger_name, const std::string& unc_name, int flavour) {
+            return tagger_name + "_shape_" + unc_name + "_" + std::to_string(flavour);
+        }
+
+        // (systematic, flavour) pairs evaluated by getBTagShapeSFs, which are evaluated through tabulated grids
+        // when use_tabulated = true. The grids must be registered before initialization.
+        static std::vector<std::pair<std::string, int>> tabulatedVariations() {
+            std::vector<std::pair<std::string, int>> variations;
+            for (size_t variation_idx = 0; variation_idx < n_norm_variations; ++variation_idx) {
+                for (size_t flavour_idx = 0; flavour_idx < n_flavours; ++flavour_idx) {
+                    const int flavour = flavourFromIndex(flavour_idx);
+                    if (variation_idx == 0 || sourceApplies(normSource(variation_idx), flavour))
+                        variations.emplace_back(normUncNames()[variation_idx], flavour);
+                }
+            }
+            return variations;
+        }
+
         bTagShapeCorrProvider(const std::string& fileName,
                               const std::string& year,
                               std::string const& tagger_name,
-                              const bool wantShape = true)
-            : corrections_(CorrectionSet::from_file(fileName)), _year(year) {
+                              const bool wantShape = true,
+                              const bool use_tabulated = false)
+            : corrections_(fileName), _year(year) {
             if (wantShape) {
-                shape_corr_ = corrections_->at(tagger_name + "_shape");
+                shape_corr_ = corrections_.at(tagger_name + "_shape");
+                if (use_tabulated)
+                    activateTabulated(tagger_name);
             }
+            corrections_.release();
             std::cerr << "Initialized bTagShapeCorrProvider::bTagShapeCorrProvider()" << std::endl;
         }
 
+        bool tabulated() const { return tabulated_; }
+
         float getBTagShapeSF(const RVecLV& Jet_p4,
                              const RVecI& Jet_Flavour,
                              const RVecF& Jet_bTag_score,
                              UncSource source,
                              UncScale scale) const {
             double sf_product = 1.;
-            static const std::set<int> allowed_flavors = {0, 4, 5};
-            std::string source_str = getUncName().at(source);
+            const std::string& source_str = getUncName().at(source);
+            const bool need_year = needYear(source);
             for (size_t jet_idx = 0; jet_idx < Jet_p4.size(); ++jet_idx) {
-                if ((Jet_bTag_score[jet_idx] > 1.0 || Jet_bTag_score[jet_idx] < 0.0) ||
-                    std::abs(Jet_p4[jet_idx].eta()) >= 2.5 || Jet_p4[jet_idx].pt() < 20.0 ||
-                    !allowed_flavors.contains(Jet_Flavour[jet_idx]))
-                {
+                if (!isShapeJet(Jet_p4[jet_idx], Jet_Flavour[jet_idx], Jet_bTag_score[jet_idx]))
                     continue;
-                }
                 const UncScale jet_tag_scale = sourceApplies(source, Jet_Flavour[jet_idx]) ? scale : UncScale::Central;
                 const std::string& scale_str = getScaleStr(jet_tag_scale);
                 bool isCentral = jet_tag_scale == UncScale::Central;
-                bool need_year = needYear(source);
                 const std::string& unc_name = getFullNameUnc(scale_str, source_str, _year, need_year, isCentral);
-                try {
-                    const auto sf = shape_corr_->evaluate({unc_name,
-                                                           Jet_Flavour[jet_idx],
-                                                           std::abs(Jet_p4[jet_idx].eta()),
-                                                           Jet_p4[jet_idx].pt(),
-                                                           Jet_bTag_score[jet_idx]});
-                    sf_product *= sf;
-                } catch (std::runtime_error& e) {
-                    std::cerr << "bTagShapeCorrProvider::getBTagShapeSF : Error in shape_corr_->evaluate() called with "
-                                 "following arguments:\n";
-                    std::cerr << "\tunc_name=" << unc_name << "\n"
-                              << "\tjet_idx=" << jet_idx << "\n"
-                              << "\tJet_Flavour=" << Jet_Flavour[jet_idx] << "\n"
-                              << "\tabs(Jet_eta)=" << std::abs(Jet_p4[jet_idx].eta()) << "\n"
-                              << "\tJet_pt=" << Jet_p4[jet_idx].pt() << "\n"
-                              << "\tJetbtag_score=" << Jet_bTag_score[jet_idx] << "\n";
-                    throw;
-                } catch (...) {
-                    std::cerr << "bTagShapeCorrProvider::getBTagShapeSF : Unknown error occurred when evaluating "
-                                 "correction\n";
-                    std::cerr << "\tunc_name=" << unc_name << "\n"
-                              << "\tjet_idx=" << jet_idx << "\n"
-                              << "\tJet_Flavour=" << Jet_Flavour[jet_idx] << "\n"
-                              << "\tabs(Jet_eta)=" << std::abs(Jet_p4[jet_idx].eta()) << "\n"
-                              << "\tJet_pt=" << Jet_p4[jet_idx].pt() << "\n"
-                              << "\tJetbtag_score=" << Jet_bTag_score[jet_idx] << "\n";
-                    throw;
-                }
+                sf_product *= evaluateShapeSF(unc_name, jet_idx, Jet_p4, Jet_Flavour, Jet_bTag_score);
             }
             return sf_product;
         }
 
+        // Central and norm-source variations of the event SF in a single loop over the jets, indexed by
+        // normVariationIndex. For a jet to which a source does not apply, its central SF enters the variation.
+        NormVariationSFs getBTagShapeSFs(const RVecLV& Jet_p4,
+                                         const RVecI& Jet_Flavour,
+                                         const RVecF& Jet_bTag_score) const {
+            NormVariationSFs sf_products;
+            sf_products.fill(1.);
+            for (size_t jet_idx = 0; jet_idx < Jet_p4.size(); ++jet_idx) {
+                if (!isShapeJet(Jet_p4[jet_idx], Jet_Flavour[jet_idx], Jet_bTag_score[jet_idx]))
+                    continue;
+                const size_t flavour_idx = flavourIndex(Jet_Flavour[jet_idx]);
+                const double central_sf =
+                    evaluateNormVariation(0, flavour_idx, jet_idx, Jet_p4, Jet_Flavour, Jet_bTag_score);
+                sf_products[0] *= central_sf;
+                for (size_t source_idx = 0; source_idx < n_norm_sources; ++source_idx) {
+                    const size_t up_idx = 1 + 2 * source_idx;
+                    if (sourceApplies(static_cast<UncSource>(source_idx), Jet_Flavour[jet_idx])) {
+                        sf_products[up_idx] *=
+                            evaluateNormVariation(up_idx, flavour_idx, jet_idx, Jet_p4, Jet_Flavour, Jet_bTag_score);
+                        sf_products[up_idx + 1] *= evaluateNormVariation(
+                            up_idx + 1, flavour_idx, jet_idx, Jet_p4, Jet_Flavour, Jet_bTag_score);
+                    } else {
+                        sf_products[up_idx] *= central_sf;
+                        sf_products[up_idx + 1] *= central_sf;
+                    }
+                }
+            }
+            return sf_products;
+        }
+
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        static UncSource normSource(size_t variation_idx) { return static_cast<UncSource>((variation_idx - 1) / 2); }
+
+        // Switches to the tabulated grids only if all of them are registered and reproduce correctionlib exactly.
+        void activateTabulated(const std::string& tagger_name) {
+            const auto variations = tabulatedVariations();
+            for (const auto& [unc_name, flavour] : variations) {
+                const std::string key = tabulatedGridName(tagger_name, unc_name, flavour);
+                auto grid = TabulatedGridRegistry::Get(key);
+                std::string message = "no tabulated grid registered for " + key;
+                std::vector<std::optional<Variable::Type>> fixed_inputs = {
+                    unc_name, flavour, std::nullopt, std::nullopt, std::nullopt};
+                if (!grid || !grid->validate(*shape_corr_, fixed_inputs, message)) {
+                    std::cerr << "bTagShapeCorrProvider: tabulated mode not activated, " << message << std::endl;
+                    for (auto& flavour_grids : shape_grids_)
+                        flavour_grids.fill(nullptr);
+                    return;
+                }
+                const size_t variation_idx =
+                    std::find(normUncNames().begin(), normUncNames().end(), unc_name) - normUncNames().begin();
+                shape_grids_[variation_idx][flavourIndex(flavour)] = std::move(grid);
+            }
+            tabulated_ = true;
+            std::cout << "bTagShapeCorrProvider: tabulated mode activated for " << variations.size() << " grids"
+                      << std::endl;
+        }
+
+        double evaluateNormVariation(size_t variation_idx,
+                                     size_t flavour_idx,
+                                     size_t jet_idx,
+                                     const RVecLV& Jet_p4,
+                                     const RVecI& Jet_Flavour,
+                                     const RVecF& Jet_bTag_score) const {
+            return evaluateShapeSF(normUncNames()[variation_idx],
+                                   jet_idx,
+                                   Jet_p4,
+                                   Jet_Flavour,
+                                   Jet_bTag_score,
+                                   shape_grids_[variation_idx][flavour_idx].get());
+        }
+
+        double evaluateShapeSF(const std::string& unc_name,
+                               size_t jet_idx,
+                               const RVecLV& Jet_p4,
+                               const RVecI& Jet_Flavour,
+                               const RVecF& Jet_bTag_score,
+                               const TabulatedGrid* grid = nullptr) const {
+            try {
+                if (grid)
+                    return grid->evaluate(
+                        std::abs(Jet_p4[jet_idx].eta()), Jet_p4[jet_idx].pt(), Jet_bTag_score[jet_idx]);
+                return shape_corr_->evaluate({unc_name,
+                                              Jet_Flavour[jet_idx],
+                                              std::abs(Jet_p4[jet_idx].eta()),
+                                              Jet_p4[jet_idx].pt(),
+                                              Jet_bTag_score[jet_idx]});
+            } catch (std::runtime_error& e) {
+                std::cerr << "bTagShapeCorrProvider::getBTagShapeSF : Error in shape_corr_->evaluate() called with "
+                             "following arguments:\n";
+                printShapeArguments(unc_name, jet_idx, Jet_p4, Jet_Flavour, Jet_bTag_score);
+                throw;
+            } catch (...) {
+                std::cerr << "bTagShapeCorrProvider::getBTagShapeSF : Unknown error occurred when evaluating "
+                             "correction\n";
+                printShapeArguments(unc_name, jet_idx, Jet_p4, Jet_Flavour, Jet_bTag_score);
+                throw;
+            }
+        }
+
+        static void printShapeArguments(const std::string& unc_name,
+                                        size_t jet_idx,
+                                        const RVecLV& Jet_p4,
+                                        const RVecI& Jet_Flavour,
+                                        const RVecF& Jet_bTag_score) {
+            std::cerr << "\tunc_name=" << unc_name << "\n"
+                      << "\tjet_idx=" << jet_idx << "\n"
+                      << "\tJet_Flavour=" << Jet_Flavour[jet_idx] << "\n"
+                      << "\tabs(Jet_eta)=" << std::abs(Jet_p4[jet_idx].eta()) << "\n"
+                      << "\tJet_pt=" << Jet_p4[jet_idx].pt() << "\n"
+                      << "\tJetbtag_score=" << Jet_bTag_score[jet_idx] << "\n";
+        }
+
+        BoundCorrections corrections_;
         Correction::Ref shape_corr_;
         std::string _year;
+        // grids of the norm variations per flavour, set in the tabulated mode
+        std::array<std::array<std::shared_ptr<const TabulatedGrid>, n_flavours>, n_norm_variations> shape_grids_;
+        bool tabulated_{false};
     };
 
 }  //namespace correction
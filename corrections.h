@@ -1,5 +1,20 @@
 #pragma once
 
+#include <atomic>
+#include <chrono>
+#include <cxxabi.h>
+#include <filesystem>
+#include <fstream>
+#include <future>
+#include <iomanip>
+#include <mutex>
+#include <sstream>
+#include <thread>
+#include <type_traits>
+
+#include <sys/stat.h>
+#include <unistd.h>
+
 #include "correction.h"
 
 namespace correction {
@@ -44,6 +59,396 @@ namespace correction {
         }
     }
 
+    // Process-wide registry of the correction payloads. Each file is decompressed and parsed once, and all the
+    // providers that use it share the same CorrectionSet. Files are identified by their canonical path and
+    // modification time, so that a file that is replaced on disk is loaded again.
+    // Different files can be loaded concurrently: the registry lock is not held while a file is parsed.
+    // If $CORRECTIONS_PAYLOAD_CACHE is set, payloads are read from the local copies made by payload_cache.py
+    // (uncompressed and possibly trimmed) as long as the original file is unchanged.
+    // In the used-subset mode, the providers keep only the corrections that they bind at initialization (see
+    // BoundCorrections), and release() drops the references held by the registry once all the providers are
+    // initialized, so that the payloads and the corrections that nobody bound are freed.
+    class CorrectionSetRegistry {
+      public:
+        struct Stats {
+            size_t n_requests{0};
+            size_t n_loaded{0};
+            size_t n_from_cache{0};
+            size_t bytes_parsed{0};  // uncompressed size of the loaded payloads
+            double seconds_parsing{0.};
+        };
+
+        static CorrectionSetRegistry& getGlobal() {
+            static CorrectionSetRegistry registry;
+            return registry;
+        }
+
+        // With use_cache=false, the original file is loaded even if the payload cache has a copy of it.
+        std::shared_ptr<const CorrectionSet> get(const std::string& file_name, bool use_cache = true) {
+            std::error_code ec;
+            const auto path = std::filesystem::canonical(file_name, ec);
+            if (ec)
+                return CorrectionSet::from_file(file_name);  // let correctionlib report the error
+            const Key key{path.string(), std::filesystem::last_write_time(path).time_since_epoch().count(), use_cache};
+
+            std::promise<std::shared_ptr<const CorrectionSet>> promise;
+            std::shared_future<std::shared_ptr<const CorrectionSet>> future;
+            bool load = false;
+            {
+                std::lock_guard<std::mutex> lock(mutex_);
+                ++stats_.n_requests;
+                auto iter = sets_.find(key);
+                if (iter == sets_.end()) {
+                    future = promise.get_future().share();
+                    sets_.emplace(key, future);
+                    load = true;
+                } else {
+                    future = iter->second;
+                }
+            }
+            if (load) {
+                try {
+                    const auto start = std::chrono::steady_clock::now();
+                    const std::string cached_path = key.use_cache ? cachedPayload(key.path).path : "";
+                    const std::string& load_path = cached_path.empty() ? key.path : cached_path;
+                    std::shared_ptr<const CorrectionSet> corrset = CorrectionSet::from_file(load_path);
+                    const std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+                    {
+                        std::lock_guard<std::mutex> lock(mutex_);
+                        ++stats_.n_loaded;
+                        if (!cached_path.empty())
+                            ++stats_.n_from_cache;
+                        stats_.bytes_parsed += payloadSize(load_path);
+                        stats_.seconds_parsing += elapsed.count();
+                    }
+                    promise.set_value(corrset);
+                } catch (...) {
+                    {
+                        std::lock_guard<std::mutex> lock(mutex_);
+                        sets_.erase(key);
+                    }
+                    promise.set_exception(std::current_exception());
+                }
+            }
+            return future.get();
+        }
+
+        // Loads payloads concurrently, with at most n_threads threads (0: one per hardware thread), so that the
+        // providers initialized afterwards find them in the registry. Errors are not reported here: a provider that
+        // needs a payload that failed to load gets the error when it requests it. Returns the number of failures.
+        size_t prefetch(const std::vector<std::string>& file_names, size_t n_threads = 0) {
+            if (n_threads == 0)
+                n_threads = std::max(1u, std::thread::hardware_concurrency());
+            n_threads = std::min(n_threads, file_names.size());
+            std::atomic<size_t> next{0}, n_failed{0};
+            const auto load = [&]() {
+                for (size_t index = next++; index < file_names.size(); index = next++) {
+                    try {
+                        get(file_names[index]);
+                    } catch (...) {
+                        ++n_failed;
+                    }
+                }
+            };
+            std::vector<std::thread> threads;
+            for (size_t n = 0; n < n_threads; ++n)
+                threads.emplace_back(load);
+            for (auto& thread : threads)
+                thread.join();
+            return n_failed;
+        }
+
+        Stats stats() const {
+            std::lock_guard<std::mutex> lock(mutex_);
+            return stats_;
+        }
+
+        void setUsedSubset(bool used_subset) {
+            std::lock_guard<std::mutex> lock(mutex_);
+            used_subset_ = used_subset;
+        }
+
+        bool usedSubset() const {
+            std::lock_guard<std::mutex> lock(mutex_);
+            return used_subset_;
+        }
+
+        // Drops the references to the loaded payloads; returns how many were held. A payload requested again
+        // afterwards is loaded again.
+        size_t release() {
+            std::lock_guard<std::mutex> lock(mutex_);
+            const size_t n_released = sets_.size();
+            sets_.clear();
+            return n_released;
+        }
+
+        void printStats(std::ostream& os) const {
+            const Stats s = stats();
+            os << "CorrectionSetRegistry: " << s.n_loaded << " payloads parsed (" << s.n_from_cache
+               << " from the payload cache) for " << s.n_requests << " requests, " << s.bytes_parsed / (1024. * 1024.)
+               << " MB in " << s.seconds_parsing << " s" << std::endl;
+        }
+
+        // Uncompressed size of a payload: the file size, or for gzip files the size stored in the gzip trailer.
+        static size_t payloadSize(const std::string& path) {
+            const size_t file_size = std::filesystem::file_size(path);
+            if (!path.ends_with(".gz") || file_size < 4)
+                return file_size;
+            std::ifstream file(path, std::ios::binary);
+            file.seekg(-4, std::ios::end);
+            unsigned char trailer[4];
+            file.read(reinterpret_cast<char*>(trailer), 4);
+            return static_cast<size_t>(trailer[0]) | static_cast<size_t>(trailer[1]) << 8 |
+                   static_cast<size_t>(trailer[2]) << 16 | static_cast<size_t>(trailer[3]) << 24;
+        }
+
+        // FNV-1a hash of the canonical path of a payload, which names its entry in the payload cache.
+        static uint64_t pathHash(const std::string& path) {
+            uint64_t hash = 14695981039346656037ULL;
+            for (const unsigned char c : path) {
+                hash ^= c;
+                hash *= 1099511628211ULL;
+            }
+            return hash;
+        }
+
+        struct CachedPayload {
+            std::string path;  // empty if there is no valid copy
+            std::string keep;  // patterns that the copy was trimmed to, empty if it is complete
+        };
+
+        // Cached copy of a payload. The entry <hash>.ref lists the original path, its size and modification time
+        // (ns), the cached file and the keep patterns (absent in the entries written before they were recorded).
+        static CachedPayload cachedPayload(const std::string& path) {
+            const char* cache_dir = std::getenv("CORRECTIONS_PAYLOAD_CACHE");
+            if (!cache_dir || !*cache_dir)
+                return {};
+            std::ostringstream ref_name;
+            ref_name << std::hex << std::setw(16) << std::setfill('0') << pathHash(path) << ".ref";
+            const std::filesystem::path ref_path = std::filesystem::path(cache_dir) / ref_name.str();
+            std::ifstream ref(ref_path);
+            std::string ref_source, ref_payload, ref_keep;
+            long long ref_size = -1, ref_mtime = -1;
+            if (!(std::getline(ref, ref_source) && ref >> ref_size >> ref_mtime >> std::ws &&
+                  std::getline(ref, ref_payload)))
+                return {};
+            std::getline(ref, ref_keep);
+            struct stat source_stat;
+            if (ref_source != path || ::stat(path.c_str(), &source_stat) != 0)
+                return {};
+            const long long mtime_ns =
+                static_cast<long long>(source_stat.st_mtim.tv_sec) * 1000000000LL + source_stat.st_mtim.tv_nsec;
+            if (ref_size != static_cast<long long>(source_stat.st_size) || ref_mtime != mtime_ns)
+                return {};
+            const std::filesystem::path payload_path = std::filesystem::path(cache_dir) / ref_payload;
+            if (!std::filesystem::exists(payload_path))
+                return {};
+            return {payload_path.string(), ref_keep};
+        }
+
+      private:
+        struct Key {
+            std::string path;
+            int64_t mtime;
+            bool use_cache;
+            bool operator<(const Key& other) const {
+                return std::tie(path, mtime, use_cache) < std::tie(other.path, other.mtime, other.use_cache);
+            }
+        };
+
+        CorrectionSetRegistry() = default;
+
+        mutable std::mutex mutex_;
+        std::map<Key, std::shared_future<std::shared_ptr<const CorrectionSet>>> sets_;
+        Stats stats_;
+        bool used_subset_{false};
+    };
+
+    inline std::shared_ptr<const CorrectionSet> loadCorrectionSet(const std::string& file_name) {
+        return CorrectionSetRegistry::getGlobal().get(file_name);
+    }
+
+    // Resident memory attributed to each provider: the growth of the resident set size of the process while the
+    // provider is initialized, together with the corrections that it bound (see BoundCorrections).
+    // Payloads loaded by prefetchCorrectionSets are attributed to the prefetch entry: the providers initialized
+    // afterwards find them in the registry, so that their entries only include what they build on top of them.
+    class ProviderMemoryReport {
+      public:
+        struct Entry {
+            std::string provider;
+            long rss_kb{0};
+            std::vector<std::string> bound;
+        };
+
+        // Marks the initialization of a provider for the lifetime of the object.
+        class Scope {
+          public:
+            explicit Scope(const std::string& provider) { getGlobal().begin(provider); }
+            ~Scope() { getGlobal().end(); }
+        };
+
+        static ProviderMemoryReport& getGlobal() {
+            static ProviderMemoryReport report;
+            return report;
+        }
+
+        // Resident set size of the process in kB, from /proc/self/statm (-1 if not available).
+        static long residentKB() {
+            std::ifstream statm("/proc/self/statm");
+            long size = 0, resident = 0;
+            if (!(statm >> size >> resident))
+                return -1;
+            return resident * (sysconf(_SC_PAGESIZE) / 1024);
+        }
+
+        void begin(const std::string& provider) {
+            int status = 0;
+            std::unique_ptr<char, void (*)(void*)> demangled(
+                abi::__cxa_demangle(provider.c_str(), nullptr, nullptr, &status), std::free);
+            std::lock_guard<std::mutex> lock(mutex_);
+            entries_.push_back({status == 0 ? demangled.get() : provider, -residentKB(), {}});
+            current_ = entries_.size();
+        }
+
+        void end() {
+            std::lock_guard<std::mutex> lock(mutex_);
+            if (current_ > 0)
+                entries_[current_ - 1].rss_kb += residentKB();
+            current_ = 0;
+        }
+
+        void bind(const std::string& name) {
+            std::lock_guard<std::mutex> lock(mutex_);
+            if (current_ > 0)
+                entries_[current_ - 1].bound.push_back(name);
+        }
+
+        std::vector<Entry> entries() const {
+            std::lock_guard<std::mutex> lock(mutex_);
+            return entries_;
+        }
+
+        void print(std::ostream& os) const {
+            for (const auto& entry : entries()) {
+                os << "ProviderMemoryReport: " << entry.provider << ": " << entry.rss_kb / 1024. << " MB";
+                if (!entry.bound.empty()) {
+                    os << ", " << entry.bound.size() << " corrections bound:";
+                    for (const auto& name : entry.bound)
+                        os << " " << name;
+                }
+                os << std::endl;
+            }
+            os << "ProviderMemoryReport: resident set size " << residentKB() / 1024. << " MB" << std::endl;
+        }
+
+      private:
+        ProviderMemoryReport() = default;
+
+        mutable std::mutex mutex_;
+        std::vector<Entry> entries_;
+        size_t current_{0};  // 1 + index of the entry of the provider being initialized, 0 if none
+    };
+
+    // Loads payloads concurrently (see CorrectionSetRegistry::prefetch), with the memory attributed to a
+    // "payload prefetch" entry of the ProviderMemoryReport. Returns the number of payloads that failed to load.
+    inline size_t prefetchCorrectionSets(const std::vector<std::string>& file_names, size_t n_threads = 0) {
+        ProviderMemoryReport::Scope report_scope("payload prefetch (" + std::to_string(file_names.size()) +
+                                                 " payloads, shared by the providers below)");
+        return CorrectionSetRegistry::getGlobal().prefetch(file_names, n_threads);
+    }
+
+    // Corrections of a payload bound by a provider. The bound names are recorded in the ProviderMemoryReport.
+    // In the used-subset mode, release() drops the payload, so that the provider keeps alive only the corrections
+    // that it bound: call it at the end of the initialization, once everything needed is bound.
+    // A correction that is missing from a trimmed copy of the payload cache is taken from the original file.
+    class BoundCorrections {
+      public:
+        explicit BoundCorrections(const std::string& file_name)
+            : file_name_(file_name), corrset_(loadCorrectionSet(file_name)) {}
+
+        Correction::Ref at(const std::string& name) const {
+            const Correction::Ref corr = find(name, [&](const CorrectionSet& corrset) { return corrset.at(name); });
+            ProviderMemoryReport::getGlobal().bind(name);
+            return corr;
+        }
+
+        CompoundCorrection::Ref compoundAt(const std::string& name) const {
+            const CompoundCorrection::Ref corr =
+                find(name, [&](const CorrectionSet& corrset) { return corrset.compound().at(name); });
+            ProviderMemoryReport::getGlobal().bind(name);
+            return corr;
+        }
+
+        bool contains(const std::string& name) const {
+            const auto has = [&](const CorrectionSet& corrset) {
+                return std::any_of(
+                    corrset.begin(), corrset.end(), [&](const auto& item) { return item.first == name; });
+            };
+            if (has(set(name)))
+                return true;
+            const CorrectionSet* original = originalSet(name);
+            return original && has(*original);
+        }
+
+        const CorrectionSet& set(const std::string& requested = "") const {
+            if (!corrset_)
+                throw std::runtime_error("BoundCorrections: the payload was released before " + requested +
+                                         " was bound (used-subset mode).");
+            return *corrset_;
+        }
+
+        void release() {
+            if (CorrectionSetRegistry::getGlobal().usedSubset()) {
+                corrset_.reset();
+                original_.reset();
+            }
+        }
+
+      private:
+        CorrectionSetRegistry::CachedPayload cachedCopy() const {
+            std::error_code ec;
+            const auto path = std::filesystem::canonical(file_name_, ec);
+            return ec ? CorrectionSetRegistry::CachedPayload{} : CorrectionSetRegistry::cachedPayload(path.string());
+        }
+
+        // The original payload if the corrections are read from a copy in the payload cache, nullptr otherwise.
+        const CorrectionSet* originalSet(const std::string& requested) const {
+            if (!original_) {
+                const CorrectionSetRegistry::CachedPayload cached = cachedCopy();
+                if (cached.path.empty())
+                    return nullptr;
+                std::cerr << "BoundCorrections: " << requested << " is not in the cached copy " << cached.path << " of "
+                          << file_name_ << " (trimmed to: " << (cached.keep.empty() ? "-" : cached.keep)
+                          << "), loading the original file." << std::endl;
+                original_ = CorrectionSetRegistry::getGlobal().get(file_name_, false);
+            }
+            return original_.get();
+        }
+
+        template <typename Lookup>
+        std::invoke_result_t<const Lookup&, const CorrectionSet&> find(const std::string& name,
+                                                                       const Lookup& lookup) const {
+            try {
+                return lookup(set(name));
+            } catch (const std::out_of_range&) {
+            }
+            const CorrectionSet* original = originalSet(name);
+            if (original) {
+                try {
+                    return lookup(*original);
+                } catch (const std::out_of_range&) {
+                }
+            }
+            const CorrectionSetRegistry::CachedPayload cached = cachedCopy();
+            throw std::runtime_error("BoundCorrections: " + name + " is not in " + file_name_ +
+                                     (cached.path.empty() ? "" : " (payload cache: " + cached.path + ")"));
+        }
+
+        std::string file_name_;
+        std::shared_ptr<const CorrectionSet> corrset_;
+        mutable std::shared_ptr<const CorrectionSet> original_;  // loaded on a miss in a cached copy
+    };
+
     template <typename CorrectionClass>
     class CorrectionsBase {
       public:
@@ -54,6 +459,7 @@ namespace correction {
                     std::cerr << typeid(CorrectionClass).name() << " already initialized." << std::endl;
                     throw std::runtime_error("Class already initialized.");
                 }
+                ProviderMemoryReport::Scope report_scope(typeid(CorrectionClass).name());
                 _getGlobal() = std::make_unique<CorrectionClass>(args...);
             } catch (std::exception& e) {
                 std::cerr << "Error while initializing " << typeid(CorrectionClass).name()
@@ -0,0 +1,93 @@
+#pragma once
+
+#include <ROOT/RDataFrame.hxx>
+
+#include "corrections.h"
+
+namespace correction {
+
+    // One scale factor of a plan: the SF of a leg for a (source, scale) pair, defined as {sf_column} (double) and
+    // {column} (float). For the variations, central_column is the column of the same source with the central
+    // scale, and {column} is defined relative to it, as the _rel weight columns defined in python.
+    // The meaning of inputs and option is provider-specific (see e.g. TauCorrProvider::DefineSF).
+    struct SFPlanEntry {
+        SFPlanEntry(const std::vector<std::string>& inputs_,
+                    int source_,
+                    UncScale scale_,
+                    const std::string& option_,
+                    const std::string& sf_column_,
+                    const std::string& column_,
+                    const std::string& central_column_)
+            : inputs(inputs_),
+              source(source_),
+              scale(scale_),
+              option(option_),
+              sf_column(sf_column_),
+              column(column_),
+              central_column(central_column_) {}
+
+        std::vector<std::string> inputs;
+        int source;
+        UncScale scale;
+        std::string option;
+        std::string sf_column;
+        std::string column;
+        std::string central_column;
+    };
+
+    using SFPlan = std::vector<SFPlanEntry>;
+
+    // Helpers to define the columns of a plan with compiled callables instead of jitted expressions.
+    // The column types are checked when the plan is defined, so that a plan that does not match the dataframe
+    // throws ColumnTypeMismatch before anything is added to the graph and the caller can fall back to the jitted
+    // definitions.
+    namespace define_plan {
+        using RNode = ROOT::RDF::RNode;
+
+        // Thrown when a column of the dataframe does not have the type expected by the plan: the only error after
+        // which the caller falls back to the jitted definitions.
+        class ColumnTypeMismatch : public std::invalid_argument {
+          public:
+            using std::invalid_argument::invalid_argument;
+        };
+
+        template <typename T>
+        void checkColumnType(RNode& df, const std::string& column) {
+            const std::string type_name = df.GetColumnType(column);
+            if (ROOT::Internal::RDF::TypeName2TypeID(type_name) != typeid(T))
+                throw ColumnTypeMismatch("define_plan: column " + column + " has type " + type_name + ", expected " +
+                                         ROOT::Internal::RDF::TypeID2TypeName(typeid(T)));
+        }
+
+        // Returns a column of the enum type Enum with the content of column, which can be either of type Enum or
+        // of type int. The converted column is defined once and shared by all the entries that use it.
+        template <typename Enum>
+        std::string enumColumn(RNode& df, const std::string& column, const std::string& enum_name) {
+            const std::string type_name = df.GetColumnType(column);
+            if (type_name == enum_name)
+                return column;
+            checkColumnType<int>(df, column);
+            const std::string enum_column = column + "_" + enum_name;
+            if (!df.HasColumn(enum_column))
+                df = df.Define(enum_column, [](int value) { return static_cast<Enum>(value); }, {column});
+            return enum_column;
+        }
+
+        // Defines the float column of an entry from its double SF column.
+        inline RNode defineFinalColumn(RNode df, const SFPlanEntry& entry) {
+            if (entry.central_column.empty())
+                return df.Define(entry.column, [](double sf) { return static_cast<float>(sf); }, {entry.sf_column});
+            return df.Define(entry.column,
+                             [](double sf, float central) { return static_cast<float>(sf / central); },
+                             {entry.sf_column, entry.central_column});
+        }
+
+        inline void checkInputs(const SFPlanEntry& entry, size_t n_inputs, const std::string& provider) {
+            if (entry.inputs.size() != n_inputs)
+                throw std::invalid_argument(provider + ": expected " + std::to_string(n_inputs) +
+                                            " input columns for " + entry.sf_column + ", got " +
+                                            std::to_string(entry.inputs.size()));
+        }
+    }  // namespace define_plan
+
+}  // namespace correction
@@ -2,6 +2,7 @@
 
 #include "correction.h"
 #include "corrections.h"
+#include "definePlan.h"
 
 namespace correction {
     class EleCorrProvider : public CorrectionsBase<EleCorrProvider> {
@@ -42,8 +43,8 @@ namespace correction {
                         const std::string& EleESFile,
                         const std::string& EleIDFile_key,
                         const std::string& EleESFile_key)
-            : corrections_(CorrectionSet::from_file(EleIDFile)),
-              correctionsES_(CorrectionSet::from_file(EleESFile)),
+            : corrections_(loadCorrectionSet(EleIDFile)),
+              correctionsES_(loadCorrectionSet(EleESFile)),
               EleIDSF_(corrections_->at(EleIDFile_key)),
               EleES_(correctionsES_->at(EleESFile_key)) {}
 
@@ -68,6 +69,34 @@ namespace correction {
             }
             return value;
         }
+
+        // Defines the ID SF columns of a plan with compiled callables. Each entry has inputs {legType, p4, gen_kind},
+        // the working point as option and an UncSource as source.
+        ROOT::RDF::RNode DefineIDSF(ROOT::RDF::RNode df, const SFPlan& plan, const std::string& period) const {
+            for (const auto& entry : plan) {
+                define_plan::checkInputs(entry, 3, "EleCorrProvider::DefineIDSF");
+                define_plan::checkColumnType<LorentzVectorM>(df, entry.inputs.at(1));
+                define_plan::checkColumnType<int>(df, entry.inputs.at(2));
+            }
+            for (const auto& entry : plan) {
+                const std::string leg_type = define_plan::enumColumn<Leg>(df, entry.inputs.at(0), "Leg");
+                const UncSource source = static_cast<UncSource>(entry.source);
+                const UncScale scale = entry.scale;
+                const std::string working_point = entry.option;
+                df = df.Define(entry.sf_column,
+                               [this, source, scale, working_point, period](
+                                   Leg leg_type, const LorentzVectorM& p4, int gen_kind) -> double {
+                                   const bool gen_match = gen_kind == 1 || gen_kind == 3;
+                                   return leg_type == Leg::e && p4.pt() >= 10 && gen_match
+                                              ? getID_SF(p4, working_point, period, source, scale)
+                                              : 1.;
+                               },
+                               {leg_type, entry.inputs.at(1), entry.inputs.at(2)});
+                df = define_plan::defineFinalColumn(df, entry);
+            }
+            return df;
+        }
+
         // https://gitlab.cern.ch/cms-analysis-corrections/EGM/examples/-/blob/latest/egmScaleAndSmearingExample.py?ref_type=heads
         RVecLV getESEtDep_data(const RVecLV& Electron_p4,
                      const RVecI& Electron_genMatch,
@@ -151,7 +180,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> corrections_, correctionsES_;
+        std::shared_ptr<const CorrectionSet> corrections_, correctionsES_;
         Correction::Ref EleIDSF_, EleES_;
     };
 
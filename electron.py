@@ -1,6 +1,6 @@
 import os
-import ROOT
 from .CorrectionsCore import *
+from .aot import callOnRNode
 
 # https://twiki.cern.ch/twiki/bin/viewauth/CMS/EgammaUL2016To2018
 # https://github.com/cms-egamma/ScaleFactorsJSON?tab=readme-ov-file
@@ -91,8 +91,8 @@ class EleCorrProducer:
         "p4",
     ]
 
-    def __init__(self, *, period, columns, isData=False):
-        self.isData = isData
+    @staticmethod
+    def payloadFiles(period):
         file_nameID = ele_files_names[period]["eleID"]
         file_nameES = (
             ele_files_names[period]["eleES"]
@@ -102,18 +102,25 @@ class EleCorrProducer:
         EleID_JsonFile = EleCorrProducer.EleID_JsonPath.format(
             folderName=pog_folder_names["EGM"][period], filenameID=file_nameID
         )
-
         if period.startswith("Run2"):
             EleES_JsonFile = os.path.join(
                 os.environ["ANALYSIS_PATH"],
                 EleCorrProducer.EleES_JsonPath.format(period),
             )
-            EleID_JsonFile_key = "UL-Electron-ID-SF"
-            EleES_JsonFile_key = "UL-EGM_ScaleUnc"
         else:
             EleES_JsonFile = EleCorrProducer.EleES_JsonPath_Run3.format(
                 folderName=pog_folder_names["EGM"][period], filenameES=file_nameES
             )  # patch since in 2024 there is no eleES without EtDependent
+        return [EleID_JsonFile, EleES_JsonFile]
+
+    def __init__(self, *, period, columns, isData=False):
+        self.isData = isData
+        EleID_JsonFile, EleES_JsonFile = EleCorrProducer.payloadFiles(period)
+
+        if period.startswith("Run2"):
+            EleID_JsonFile_key = "UL-Electron-ID-SF"
+            EleES_JsonFile_key = "UL-EGM_ScaleUnc"
+        else:
             EleID_JsonFile_key = "Electron-ID-SF"
             EleES_JsonFile_key = "SmearAndSyst"
             # if period == "2023_Summer23":
@@ -123,9 +130,7 @@ class EleCorrProducer:
             # if period == "2024_Summer24":
             #     EleES_JsonFile_key = "SmearAndSyst"  # "compound corrections
         if not EleCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "electron.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("electron.h")
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::EleCorrProvider::Initialize("{EleID_JsonFile}", "{EleES_JsonFile}","{EleID_JsonFile_key}","{EleES_JsonFile_key}")'
             )
@@ -146,7 +151,9 @@ class EleCorrProducer:
         for col in EleCorrProducer.inputColumns:
             self.columns[col] = columns.get(col, col)
 
-    def getES(self, df, source_dict):
+    def getES(self, df, source_dict, columns=None):
+        if columns is None:
+            columns = DefinedColumns(df)
         sources = [central]
         if not self.isData:
             sources += EleCorrProducer.energyScaleSources_ele
@@ -157,13 +164,15 @@ class EleCorrProducer:
                 # if self.period.split("_")[0] == "2024" or self.period.split("_")[0] == "2023" or self.period.split("_")[0] == "2023BPix":
                 func_name = "getESEtDep_data" if self.isData else "getESEtDep_MC"
                 if (
-                    "Electron_superclusterEta" not in df.GetColumnNames()
+                    "Electron_superclusterEta" not in columns
                 ):  # Please note that the correct eta to use to fetch the electron and photon S&S corrections is the supercluster eta (that is Electron(Photon)_superclusterEta in NanoAOD v15). For NanoAOD versions < 15 this variable is not directly available, but one can calculate it as "Electron_eta + Electron_deltaEtaSC". This is unfortunately not the case for photons, for which deltaEtaSC does not exist. In this latter case, Photon_eta can be used instead. Ultimately, the difference between using supercluster era or eta should be minimal.
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         "Electron_superclusterEta",
                         "RVecF ele_SC_eta; for(size_t i = 0 ; i < Electron_eta.size(); i++) {{ele_SC_eta.push_back(Electron_deltaEtaSC[i]+Electron_eta[i]);}} return ele_SC_eta;",
                     )
-                df = df.Define(
+                df = columns.Define(
+                    df,
                     f"Electron_p4_{syst_name}",
                     f"""::correction::EleCorrProvider::getGlobal().{func_name}(Electron_p4_{nano}, Electron_genMatch, Electron_seedGain, Electron_superclusterEta, run,
                 Electron_r9,::correction::EleCorrProvider::UncSource::{source}, ::correction::UncScale::{scale})""",
@@ -174,16 +183,25 @@ class EleCorrProducer:
                 #         f"""::correction::EleCorrProvider::getGlobal().getES(Electron_p4_{nano}, Electron_genMatch,  Electron_seedGain, run,
                 #     Electron_r9,::correction::EleCorrProvider::UncSource::{source}, ::correction::UncScale::{scale})""",
                 #     )
-                df = df.Define(
+                df = columns.Define(
+                    df,
                     f"Electron_p4_{syst_name}_delta",
                     f"Electron_p4_{syst_name} - Electron_p4_{nano}",
                 )
         return df, source_dict
 
-    def getIDSF(self, df, lepton_legs, isCentral, return_variations):
+    def getIDSF(
+        self, df, lepton_legs, isCentral, return_variations, typed_define=False
+    ):
+        """Defines the electron ID SF weight columns of the lepton legs.
+
+        With typed_define, the columns are defined by EleCorrProvider::DefineIDSF from a single plan with compiled
+        callables, falling back to the jitted definitions if the plan cannot be defined.
+        """
         sf_sources = EleCorrProducer.ID_sources
         SF_branches = []
         sf_scales = [up, down] if return_variations else []
+        plan = ROOT.correction.SFPlan() if typed_define else None
         for working_point in EleCorrProducer.working_points:
             for source in sf_sources:
                 for scale in [central] + sf_scales:
@@ -200,6 +218,34 @@ class EleCorrProducer:
                         legType = f'{leg_name}_{self.columns["legType"]}'
                         p4 = f'{leg_name}_{self.columns["p4"]}'
 
+                        if plan is not None:
+                            if scale != central:
+                                branch_name_final = branch_name + "_rel"
+                            elif source == central:
+                                branch_name_final = (
+                                    f"""weight_{leg_name}_EleSF_{central}"""
+                                )
+                            else:
+                                branch_name_final = branch_name
+                            plan.push_back(
+                                ROOT.correction.SFPlanEntry(
+                                    [legType, p4, gen_kind],
+                                    int(
+                                        getattr(
+                                            ROOT.correction.EleCorrProvider.UncSource,
+                                            source,
+                                        )
+                                    ),
+                                    getattr(ROOT.correction.UncScale, scale),
+                                    working_point,
+                                    f"{branch_name}_double",
+                                    branch_name_final,
+                                    branch_central if scale != central else "",
+                                )
+                            )
+                            SF_branches.append(branch_name_final)
+                            continue
+
                         genMatch_bool = f"{gen_kind} == 1 || {gen_kind} == 3"
                         legType = getLegTypeString(df, legType)
 
@@ -232,4 +278,18 @@ class EleCorrProducer:
                             )
 
                         SF_branches.append(branch_name_final)
+        if plan is not None and plan.size() > 0:
+            try:
+                df = callOnRNode(
+                    df,
+                    lambda rnode: ROOT.correction.EleCorrProvider.getGlobal().DefineIDSF(
+                        rnode, plan, EleCorrProducer.year
+                    ),
+                    "DefineIDSF",
+                )
+            except ROOT.correction.define_plan.ColumnTypeMismatch as e:
+                print(
+                    f"EleCorrProducer: typed SF definitions failed ({e}), using jitted ones"
+                )
+                return self.getIDSF(df, lepton_legs, isCentral, return_variations)
         return df, SF_branches
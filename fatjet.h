@@ -43,7 +43,7 @@ namespace correction {
         FatJetCorrProvider(const std::string& fatjetFile,
                         const std::string& Hbb_key,
                         const std::string& Hcc_key)
-            : corrections_(CorrectionSet::from_file(fatjetFile)),
+            : corrections_(loadCorrectionSet(fatjetFile)),
               Hbb_(corrections_->at(Hbb_key)),
               Hcc_(corrections_->at(Hcc_key)) {}
 
@@ -79,7 +79,7 @@ namespace correction {
         }
 
     private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        std::shared_ptr<const CorrectionSet> corrections_;
         Correction::Ref Hbb_, Hcc_;
     };
 
@@ -1,5 +1,4 @@
 import os
-import ROOT
 from .CorrectionsCore import *
 
 
@@ -59,9 +58,7 @@ class FatJetCorrProducer:
         cc_key = this_dict["keys_cc"][period]
 
         if not FatJetCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "fatjet.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("fatjet.h")
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::FatJetCorrProvider::Initialize("{file_nameID}","{bb_key}","{cc_key}")'
             )
@@ -1,203 +1,552 @@
 #pragma once
 
+#include <algorithm>
+#include <array>
+#include <atomic>
+#include <mutex>
+#include <numeric>
+
 #include "correction.h"
 #include "corrections.h"
+#include "tabulated.h"
 
 namespace correction {
     class JetCorrectionProvider : public CorrectionsBase<JetCorrectionProvider> {
-        public:
-            enum class UncSource : int {
-                Central = -1,
-                JER = 0,
-                Total = 1,
-                RelativeBal = 2,
-                HF = 3,
-                BBEC1 = 4,
-                EC2 = 5,
-                Absolute = 6,
-                FlavorQCD = 7,
-                BBEC1_year = 8,
-                Absolute_year = 9,
-                EC2_year = 10,
-                HF_year = 11,
-                RelativeSample_year = 12
+      public:
+        enum class UncSource : int {
+            Central = -1,
+            JER = 0,
+            Total = 1,
+            RelativeBal = 2,
+            HF = 3,
+            BBEC1 = 4,
+            EC2 = 5,
+            Absolute = 6,
+            FlavorQCD = 7,
+            BBEC1_year = 8,
+            Absolute_year = 9,
+            EC2_year = 10,
+            HF_year = 11,
+            RelativeSample_year = 12
+        };
+
+        // number of UncSource values, including Central
+        static constexpr size_t n_unc_sources = static_cast<size_t>(UncSource::RelativeSample_year) + 2;
+
+        static size_t uncSourceIndex(UncSource source) { return static_cast<size_t>(static_cast<int>(source) + 1); }
+
+        // JES uncertainty corrections indexed by uncSourceIndex; entries of unused sources (and JER) are empty
+        using JESUncertaintyRefs = std::array<BinnedCorrectionRef, n_unc_sources>;
+
+        // Dense (source, scale) -> row table shared by the variation tensors below.
+        class VariationIndex {
+          public:
+            static constexpr size_t n_scales = 3;
+
+            VariationIndex() { row_index_.fill(-1); }
+
+            void reserve(size_t n_variations) { variations_.reserve(n_variations); }
+
+            size_t add(UncSource source, UncScale scale) {
+                const size_t row = variations_.size();
+                row_index_[key(source, scale)] = static_cast<int>(row);
+                variations_.emplace_back(source, scale);
+                return row;
+            }
+
+            bool has(UncSource source, UncScale scale) const { return row_index_[key(source, scale)] >= 0; }
+
+            size_t rowIndex(UncSource source, UncScale scale) const {
+                const int row = row_index_[key(source, scale)];
+                if (row < 0)
+                    throw std::runtime_error("JetCorrectionProvider: variation (" +
+                                             std::to_string(static_cast<int>(source)) + ", " +
+                                             std::to_string(static_cast<int>(scale)) + ") is not available.");
+                return static_cast<size_t>(row);
+            }
+
+            size_t size() const { return variations_.size(); }
+            const std::vector<std::pair<UncSource, UncScale>>& variations() const { return variations_; }
+
+          private:
+            static size_t key(UncSource source, UncScale scale) {
+                return uncSourceIndex(source) * n_scales + static_cast<size_t>(static_cast<int>(scale) + 1);
+            }
+
+            std::array<int, n_unc_sources * n_scales> row_index_;
+            std::vector<std::pair<UncSource, UncScale>> variations_;
+        };
+
+        // Flat result of getShiftedP4_Jet/getShiftedP4_FatJet.
+        // The shifted p4 of all variations are stored in a single contiguous buffer, row-major in (variation, jet),
+        // and rows are looked up by (source, scale) through a dense index table, so no per-event map is allocated.
+        // view() returns a non-owning RVecLV on one row: it is valid as long as the tensor itself is alive,
+        // i.e. for the event being processed when the tensor is an RDataFrame column.
+        class ShiftedP4Tensor {
+          public:
+            static constexpr size_t n_scales = VariationIndex::n_scales;
+
+            ShiftedP4Tensor() = default;
+
+            ShiftedP4Tensor(size_t n_variations, size_t n_jets) : n_jets_(n_jets), p4_(n_variations * n_jets) {
+                index_.reserve(n_variations);
+            }
+
+            size_t addVariation(UncSource source, UncScale scale) {
+                if ((index_.size() + 1) * n_jets_ > p4_.size())
+                    throw std::runtime_error("ShiftedP4Tensor: too many variations for the allocated buffer.");
+                return index_.add(source, scale);
+            }
+
+            LorentzVectorM* row(size_t row) { return p4_.data() + row * n_jets_; }
+            const LorentzVectorM* row(size_t row) const { return p4_.data() + row * n_jets_; }
+
+            bool has(UncSource source, UncScale scale) const { return index_.has(source, scale); }
+            size_t rowIndex(UncSource source, UncScale scale) const { return index_.rowIndex(source, scale); }
+
+            const LorentzVectorM& at(UncSource source, UncScale scale, size_t jet_idx) const {
+                return row(rowIndex(source, scale))[jet_idx];
+            }
+
+            RVecLV view(UncSource source, UncScale scale) const {
+                const size_t row_idx = rowIndex(source, scale);
+                if (n_jets_ == 0)
+                    return RVecLV();
+                return RVecLV(const_cast<LorentzVectorM*>(row(row_idx)), n_jets_);
+            }
+
+            // gen jet matched to each jet during the JER smearing (-1 if none), shared by all variations
+            void setGenMatchIdx(RVecI gen_match_idx) { gen_match_idx_ = std::move(gen_match_idx); }
+            const RVecI& genMatchIdx() const { return gen_match_idx_; }
+
+            size_t nJets() const { return n_jets_; }
+            size_t nVariations() const { return index_.size(); }
+            const std::vector<std::pair<UncSource, UncScale>>& variations() const { return index_.variations(); }
+
+          private:
+            size_t n_jets_{0};
+            RVecLV p4_;
+            VariationIndex index_;
+            RVecI gen_match_idx_;
+        };
+
+        // Compact counterpart of ShiftedP4Tensor, returned by getShiftedScales_Jet/getShiftedScales_FatJet.
+        // JES and JER variations only rescale pt and mass, so each variation is stored as one float per jet: the
+        // ratio of the varied pt (and mass) to the nominal one. The p4 are rebuilt on demand with scaleP4/scaleP4Delta
+        // from the nominal p4. JES variations are reproduced exactly, JER variations up to the float rounding of
+        // the ratio of the smearing factors. view() has the same lifetime rules as ShiftedP4Tensor::view().
+        class ShiftedScaleTensor {
+          public:
+            ShiftedScaleTensor() = default;
+
+            ShiftedScaleTensor(size_t n_variations, size_t n_jets) : n_jets_(n_jets), scale_(n_variations * n_jets) {
+                index_.reserve(n_variations);
+            }
+
+            size_t addVariation(UncSource source, UncScale scale) {
+                if ((index_.size() + 1) * n_jets_ > scale_.size())
+                    throw std::runtime_error("ShiftedScaleTensor: too many variations for the allocated buffer.");
+                return index_.add(source, scale);
+            }
+
+            float* row(size_t row) { return scale_.data() + row * n_jets_; }
+            const float* row(size_t row) const { return scale_.data() + row * n_jets_; }
+
+            bool has(UncSource source, UncScale scale) const { return index_.has(source, scale); }
+            size_t rowIndex(UncSource source, UncScale scale) const { return index_.rowIndex(source, scale); }
+
+            float at(UncSource source, UncScale scale, size_t jet_idx) const {
+                return row(rowIndex(source, scale))[jet_idx];
+            }
+
+            RVecF view(UncSource source, UncScale scale) const {
+                const size_t row_idx = rowIndex(source, scale);
+                if (n_jets_ == 0)
+                    return RVecF();
+                return RVecF(const_cast<float*>(row(row_idx)), n_jets_);
+            }
+
+            size_t nJets() const { return n_jets_; }
+            size_t nVariations() const { return index_.size(); }
+            const std::vector<std::pair<UncSource, UncScale>>& variations() const { return index_.variations(); }
+
+          private:
+            size_t n_jets_{0};
+            RVecF scale_;
+            VariationIndex index_;
+        };
+
+        // p4 of a variation from the nominal p4 and the pt scales of ShiftedScaleTensor.
+        // pt and mass are rescaled in single precision, as in getShiftedP4_Base.
+        static RVecLV scaleP4(const RVecLV& nominal_p4, const RVecF& pt_scale) {
+            RVecLV p4(nominal_p4.size());
+            for (size_t i = 0; i < nominal_p4.size(); ++i)
+                p4[i] = scaleP4(nominal_p4[i], pt_scale[i]);
+            return p4;
+        }
+
+        // Difference between the p4 of a variation and reference_p4, without materializing the varied p4.
+        static RVecLV scaleP4Delta(const RVecLV& nominal_p4, const RVecF& pt_scale, const RVecLV& reference_p4) {
+            RVecLV delta(nominal_p4.size());
+            for (size_t i = 0; i < nominal_p4.size(); ++i)
+                delta[i] = scaleP4(nominal_p4[i], pt_scale[i]) - reference_p4[i];
+            return delta;
+        }
+
+        static LorentzVectorM scaleP4(const LorentzVectorM& nominal_p4, float pt_scale) {
+            return LorentzVectorM(static_cast<float>(nominal_p4.pt()) * pt_scale,
+                                  nominal_p4.eta(),
+                                  nominal_p4.phi(),
+                                  static_cast<float>(nominal_p4.mass()) * pt_scale);
+        }
+
+        // Run-free specializations of the run-dependent data JEC (see specializeRunDependentJEC in jet.py).
+        // Interval k of the run edges (0 = underflow, run_edges.size() = overflow) is served by the k-th
+        // specialization, which is empty if correctionlib raises for those runs: the generic run-dependent
+        // correction is then used, reproducing the error.
+        class RunSpecializedJEC {
+          public:
+            struct Specialization {
+                std::unique_ptr<CorrectionSet> corrset;
+                CompoundCorrection::Ref cmpd_corr;
+                Correction::Ref corr_l2l3res;  // empty if the residual is not part of the compound stack
             };
 
-            // json_file_name - path to json file with corrections
-            // e.g. /cvmfs/cms-griddata.cern.ch/cat/metadata/JME/2022_Summer2022/jet_jerc.json.gz
-
-            // jecTag_corrName_algoType
-
-            // jec_tag - a string describing when sample was produced and type of sample
-            // e.g. Summer22_22Sep2023_V2_MC
-
-            // algo - type of jet algorithm
-            // e.g. AK4PFPuppi
-            JetCorrectionProvider(std::string const& json_file_name,
-                                std::string const& jetsmear_file_name,
-                                std::string const& jec_tag,
-                                std::string const& other_jec_tag,
-                                std::string const& jer_tag,
-                                std::string const& algo,
-                                std::string const& fatjson_file_name,
-                                std::string const& fatjec_tag,
-                                std::string const& other_fatjec_tag,
-                                std::string const& fatjer_tag,
-                                std::string const& fatalgo,
-                                std::string const& year,
-                                bool is_data,
-                                bool use_regrouped,
-                                bool use_cmpd_jec)
-                : corrset_(CorrectionSet::from_file(json_file_name)),
-                jersmear_corr_(CorrectionSet::from_file(jetsmear_file_name)->at("JERSmear")),
-                corr_jer_sf_(corrset_->at(jer_tag + "_ScaleFactor_" + algo)),
-                corr_jer_sfUnc_(corrset_->at(jer_tag + "_SFUncertainty_" + algo)),
-                corr_jer_res_(corrset_->at(jer_tag + "_PtResolution_" + algo)),
-                cmpd_corr_(corrset_->compound().at(other_jec_tag + "_L1L2L3Res_" + algo)),
-                corr_l1_(corrset_->at(other_jec_tag + "_L1FastJet_" + algo)),
-                corr_l2_(corrset_->at(other_jec_tag + "_L2Relative_" + algo)),
-                corr_l2l3res_(corrset_->at(other_jec_tag + "_L2L3Residual_" + algo)),
-                fat_corrset_(CorrectionSet::from_file(fatjson_file_name)),
-                fat_jersmear_corr_(CorrectionSet::from_file(jetsmear_file_name)->at("JERSmear")),
-                fat_corr_jer_sf_(fat_corrset_->at(fatjer_tag + "_ScaleFactor_" + fatalgo)),
-                fat_corr_jer_sfUnc_(fat_corrset_->at(fatjer_tag + "_SFUncertainty_" + fatalgo)),
-                fat_corr_jer_res_(fat_corrset_->at(fatjer_tag + "_PtResolution_" + fatalgo)),
-                fat_cmpd_corr_(fat_corrset_->compound().at(other_fatjec_tag + "_L1L2L3Res_" + fatalgo)),
-                is_data_(is_data),
-                year_(year),
-                use_cmpd_jec_(use_cmpd_jec) {
-                // map with uncertainty sources should only be filled for MC
-                std::cout << "JetCorrectionProvider: init" << std::endl;
-                if (!is_data_) {
-                    auto const& unc_map_ref = use_regrouped ? unc_map_regrouped : unc_map_total;
-                    for (auto const& [unc_source, unc_name] : unc_map_ref) {
-                        std::string full_name = jec_tag;
-                        full_name += '_';
-                        full_name += unc_name;
-                        full_name += '_';
-                        if (year_dep_map.at(unc_source)) {
-                            full_name += year;
-                            full_name += '_';
-                        }
-                        std::string full_name_jet = full_name + algo;
-                        std::string full_name_fat = full_name + fatalgo;
-                        unc_map_[unc_source] = full_name_jet;
-                        fat_unc_map_[unc_source] = full_name_fat;
+            RunSpecializedJEC(std::vector<double> run_edges,
+                              const std::vector<std::string>& corrset_jsons,
+                              const std::string& cmpd_name,
+                              const std::string& l2l3res_name)
+                : id_(nextId()), run_edges_(std::move(run_edges)) {
+                if (corrset_jsons.size() != run_edges_.size() + 1)
+                    throw std::runtime_error("RunSpecializedJEC: expected one correction set per run interval.");
+                for (const auto& corrset_json : corrset_jsons) {
+                    if (corrset_json.empty()) {
+                        specializations_.emplace_back();
+                        continue;
+                    }
+                    auto spec = std::make_unique<Specialization>();
+                    spec->corrset = CorrectionSet::from_string(corrset_json.c_str());
+                    spec->cmpd_corr = spec->corrset->compound().at(cmpd_name);
+                    for (const auto& [name, corr] : *spec->corrset) {
+                        if (name == l2l3res_name)
+                            spec->corr_l2l3res = corr;
                     }
+                    specializations_.push_back(std::move(spec));
                 }
             }
 
-            float evaluateJECCompound(float pt_raw,
-                        float eta,
-                        float phi,
-                        float area,
-                        float rho,
-                        unsigned int run,
-                        bool require_run_number,
-                        bool wantPhi) const {
-                float sf = 1.0;
+            // Specialization valid for the run, nullptr if there is none.
+            // The last run seen by each thread is cached, since runs come in long contiguous blocks. The cache is
+            // keyed on the unique id of the instance rather than on its address, which a replacement registered by
+            // registerRunSpecializedJEC can reuse.
+            const Specialization* find(unsigned int run) const {
+                struct LastRun {
+                    uint64_t owner_id{0};
+                    unsigned int run{0};
+                    const Specialization* spec{nullptr};
+                };
+                thread_local LastRun last;
+                if (last.owner_id == id_ && last.run == run)
+                    return last.spec;
+                // same run value and edge convention as the run input of correctionlib
+                const double run_value = static_cast<float>(run);
+                const size_t interval = static_cast<size_t>(
+                    std::upper_bound(run_edges_.begin(), run_edges_.end(), run_value) - run_edges_.begin());
+                last = {id_, run, specializations_[interval].get()};
+                return last.spec;
+            }
 
-                if (require_run_number) {
-                    if (wantPhi) {
-                        sf = cmpd_corr_->evaluate({area, eta, pt_raw, rho, phi, (float)run});
-                    } else {
-                        sf = cmpd_corr_->evaluate({area, eta, pt_raw, rho, (float)run});
-                    }
-                } else {
-                    if (wantPhi) {
-                        sf = cmpd_corr_->evaluate({area, eta, pt_raw, rho, phi});
-                    } else {
-                        sf = cmpd_corr_->evaluate({area, eta, pt_raw, rho});
-                    }
+            size_t nIntervals() const { return specializations_.size(); }
+
+          private:
+            static uint64_t nextId() {
+                static std::atomic<uint64_t> counter{0};
+                return ++counter;
+            }
+
+            const uint64_t id_;
+            std::vector<double> run_edges_;
+            std::vector<std::unique_ptr<Specialization>> specializations_;
+        };
+
+        // Run specializations registered from python before initialization, keyed by compound correction name.
+        static void registerRunSpecializedJEC(const std::string& cmpd_name,
+                                              const std::string& l2l3res_name,
+                                              const std::vector<double>& run_edges,
+                                              const std::vector<std::string>& corrset_jsons) {
+            auto spec = std::make_shared<const RunSpecializedJEC>(run_edges, corrset_jsons, cmpd_name, l2l3res_name);
+            std::lock_guard<std::mutex> lock(runSpecializationMutex());
+            runSpecializations()[cmpd_name] = std::move(spec);
+        }
+
+        // json_file_name - path to json file with corrections
+        // e.g. /cvmfs/cms-griddata.cern.ch/cat/metadata/JME/2022_Summer2022/jet_jerc.json.gz
+
+        // jecTag_corrName_algoType
+
+        // jec_tag - a string describing when sample was produced and type of sample
+        // e.g. Summer22_22Sep2023_V2_MC
+
+        // algo - type of jet algorithm
+        // e.g. AK4PFPuppi
+        JetCorrectionProvider(std::string const& json_file_name,
+                              std::string const& jetsmear_file_name,
+                              std::string const& jec_tag,
+                              std::string const& other_jec_tag,
+                              std::string const& jer_tag,
+                              std::string const& algo,
+                              std::string const& fatjson_file_name,
+                              std::string const& fatjec_tag,
+                              std::string const& other_fatjec_tag,
+                              std::string const& fatjer_tag,
+                              std::string const& fatalgo,
+                              std::string const& year,
+                              bool is_data,
+                              bool use_regrouped,
+                              bool use_cmpd_jec,
+                              bool use_tabulated = false)
+            : corrset_(json_file_name),
+              jersmear_corr_(BoundCorrections(jetsmear_file_name).at("JERSmear")),
+              corr_jer_sf_(corrset_.at(jer_tag + "_ScaleFactor_" + algo)),
+              corr_jer_sfUnc_(corrset_.at(jer_tag + "_SFUncertainty_" + algo)),
+              corr_jer_res_(corrset_.at(jer_tag + "_PtResolution_" + algo)),
+              cmpd_corr_(corrset_.compoundAt(other_jec_tag + "_L1L2L3Res_" + algo)),
+              corr_l1_(corrset_.at(other_jec_tag + "_L1FastJet_" + algo)),
+              corr_l2_(corrset_.at(other_jec_tag + "_L2Relative_" + algo)),
+              corr_l2l3res_(corrset_.at(other_jec_tag + "_L2L3Residual_" + algo)),
+              fat_corrset_(fatjson_file_name),
+              fat_jersmear_corr_(BoundCorrections(jetsmear_file_name).at("JERSmear")),
+              fat_corr_jer_sf_(fat_corrset_.at(fatjer_tag + "_ScaleFactor_" + fatalgo)),
+              fat_corr_jer_sfUnc_(fat_corrset_.at(fatjer_tag + "_SFUncertainty_" + fatalgo)),
+              fat_corr_jer_res_(fat_corrset_.at(fatjer_tag + "_PtResolution_" + fatalgo)),
+              fat_cmpd_corr_(fat_corrset_.compoundAt(other_fatjec_tag + "_L1L2L3Res_" + fatalgo)),
+              is_data_(is_data),
+              year_(year),
+              use_cmpd_jec_(use_cmpd_jec) {
+            // map with uncertainty sources should only be filled for MC
+            std::cout << "JetCorrectionProvider: init" << std::endl;
+            if (is_data_) {
+                std::lock_guard<std::mutex> lock(runSpecializationMutex());
+                const auto iter = runSpecializations().find(cmpd_corr_->name());
+                if (iter != runSpecializations().end()) {
+                    run_specialized_jec_ = iter->second;
+                    std::cout << "JetCorrectionProvider: using run specializations of " << cmpd_corr_->name() << " for "
+                              << run_specialized_jec_->nIntervals() << " run intervals" << std::endl;
                 }
+            }
+            if (!is_data_) {
+                auto const& unc_map_ref = use_regrouped ? unc_map_regrouped : unc_map_total;
+                for (auto const& [unc_source, unc_name] : unc_map_ref) {
+                    unc_sources_.push_back(unc_source);
+                    if (unc_source == UncSource::JER)
+                        continue;
+                    jes_unc_corr_[uncSourceIndex(unc_source)] =
+                        corrset_.at(uncertaintyCorrectionName(jec_tag, unc_source, unc_name, year, algo));
+                    fat_jes_unc_corr_[uncSourceIndex(unc_source)] =
+                        fat_corrset_.at(uncertaintyCorrectionName(jec_tag, unc_source, unc_name, year, fatalgo));
+                }
+                has_jer_unc_ =
+                    std::find(unc_sources_.begin(), unc_sources_.end(), UncSource::JER) != unc_sources_.end();
+                if (use_tabulated)
+                    activateTabulated();
+            }
+            corrset_.release();
+            fat_corrset_.release();
+        }
 
-                return sf;
+        static std::string uncertaintyCorrectionName(const std::string& jec_tag,
+                                                     UncSource unc_source,
+                                                     const std::string& unc_name,
+                                                     const std::string& year,
+                                                     const std::string& algo) {
+            std::string full_name = jec_tag;
+            full_name += '_';
+            full_name += unc_name;
+            full_name += '_';
+            if (year_dep_map.at(unc_source)) {
+                full_name += year;
+                full_name += '_';
             }
+            return full_name + algo;
+        }
 
-            float evaluateJECSeparately(float pt_raw,
-                                            float eta,
-                                            float phi,
-                                            float area,
-                                            float rho,
-                                            unsigned int run,
-                                            bool require_run_number,
-                                            bool wantPhi,
-                                            bool isdata_,
-                                            bool is2024Eta2To2p5) const {
+        // Names of the corrections that are evaluated through tabulated grids when use_tabulated = true:
+        // JER scale factor and its uncertainty, and the JES uncertainties.
+        // The grids must be registered in TabulatedGridRegistry under these names before initialization.
+        static std::vector<std::string> tabulatedCorrectionNames(const std::string& jec_tag,
+                                                                 const std::string& jer_tag,
+                                                                 const std::string& algo,
+                                                                 const std::string& year,
+                                                                 bool use_regrouped) {
+            std::vector<std::string> names = {jer_tag + "_ScaleFactor_" + algo, jer_tag + "_SFUncertainty_" + algo};
+            auto const& unc_map_ref = use_regrouped ? unc_map_regrouped : unc_map_total;
+            for (auto const& [unc_source, unc_name] : unc_map_ref) {
+                if (unc_source != UncSource::JER)
+                    names.push_back(uncertaintyCorrectionName(jec_tag, unc_source, unc_name, year, algo));
+            }
+            return names;
+        }
 
-                if (pt_raw <= 0.0) return 1.0;
+        bool tabulated() const { return tabulated_; }
 
-                float pt_after = pt_raw;
+        float evaluateJECCompound(float pt_raw,
+                                  float eta,
+                                  float phi,
+                                  float area,
+                                  float rho,
+                                  unsigned int run,
+                                  bool require_run_number,
+                                  bool wantPhi) const {
+            float sf = 1.0;
 
-                // 2) L1FastJet
-                float c1 = corr_l1_->evaluate({area, eta, pt_after, rho});
-                pt_after *= c1;
+            if (require_run_number && run_specialized_jec_) {
+                if (const auto* spec = run_specialized_jec_->find(run)) {
+                    if (wantPhi) {
+                        sf = spec->cmpd_corr->evaluate({area, eta, pt_raw, rho, phi});
+                    } else {
+                        sf = spec->cmpd_corr->evaluate({area, eta, pt_raw, rho});
+                    }
+                    return sf;
+                }
+            }
 
-                // 3) L2Relative
-                float c2 = 1.0;
+            if (require_run_number) {
                 if (wantPhi) {
-                    c2 = corr_l2_->evaluate({eta, phi, pt_after});
+                    sf = cmpd_corr_->evaluate({area, eta, pt_raw, rho, phi, (float)run});
                 } else {
-                    c2 = corr_l2_->evaluate({eta, pt_after});
+                    sf = cmpd_corr_->evaluate({area, eta, pt_raw, rho, (float)run});
                 }
-                pt_after *= c2;
+            } else {
+                if (wantPhi) {
+                    sf = cmpd_corr_->evaluate({area, eta, pt_raw, rho, phi});
+                } else {
+                    sf = cmpd_corr_->evaluate({area, eta, pt_raw, rho});
+                }
+            }
 
-                // add L3 --> it's always 1
+            return sf;
+        }
 
-                // 4) Residual (solo data)
-                // For MC-truth corrected pT < 30 GeV use L2L3Residual correction factor of MC-truth corrected pT = 30 GeV in 2.0 < |eta| < 2.5
+        float evaluateJECSeparately(float pt_raw,
+                                    float eta,
+                                    float phi,
+                                    float area,
+                                    float rho,
+                                    unsigned int run,
+                                    bool require_run_number,
+                                    bool wantPhi,
+                                    bool isdata_,
+                                    bool is2024Eta2To2p5) const {
+            if (pt_raw <= 0.0)
+                return 1.0;
+
+            float pt_after = pt_raw;
+
+            // 2) L1FastJet
+            float c1 = corr_l1_->evaluate({area, eta, pt_after, rho});
+            pt_after *= c1;
+
+            // 3) L2Relative
+            float c2 = 1.0;
+            if (wantPhi) {
+                c2 = corr_l2_->evaluate({eta, phi, pt_after});
+            } else {
+                c2 = corr_l2_->evaluate({eta, pt_after});
+            }
+            pt_after *= c2;
 
-                float cRes = 1.0;
-                float pt_for_corr = pt_after;
-                if (isdata_){
-                    if(is2024Eta2To2p5 and pt_after < 30. ){
-                        pt_for_corr = 30.;
-                    }
-                    if (require_run_number) {
-                        cRes = corr_l2l3res_->evaluate({float(run),eta,pt_for_corr});
-                    } else {
-                        cRes = corr_l2l3res_->evaluate({eta,pt_for_corr});
-                    }
+            // add L3 --> it's always 1
+
+            // 4) Residual (solo data)
+            // For MC-truth corrected pT < 30 GeV use L2L3Residual correction factor of MC-truth corrected pT = 30 GeV in 2.0 < |eta| < 2.5
+
+            float cRes = 1.0;
+            float pt_for_corr = pt_after;
+            if (isdata_) {
+                if (is2024Eta2To2p5 and pt_after < 30.) {
+                    pt_for_corr = 30.;
                 }
+                const auto* spec =
+                    require_run_number && run_specialized_jec_ ? run_specialized_jec_->find(run) : nullptr;
+                if (spec && spec->corr_l2l3res) {
+                    cRes = spec->corr_l2l3res->evaluate({eta, pt_for_corr});
+                } else if (require_run_number) {
+                    cRes = corr_l2l3res_->evaluate({float(run), eta, pt_for_corr});
+                } else {
+                    cRes = corr_l2l3res_->evaluate({eta, pt_for_corr});
+                }
+            }
 
-                pt_after *= cRes;
+            pt_after *= cRes;
 
+            return pt_after / pt_raw;
+        }
+
+        // Gen jets sorted in eta, built once per event and collection.
+        // The fallback matching of findGenMatch then only visits the gen jets inside the |deta| < dR window.
+        class GenJetEtaIndex {
+          public:
+            GenJetEtaIndex() = default;
 
-                return pt_after / pt_raw ;
+            explicit GenJetEtaIndex(const RVecF& gen_eta) : eta_(gen_eta.size()), idx_(gen_eta.size()) {
+                std::iota(idx_.begin(), idx_.end(), 0);
+                std::sort(idx_.begin(), idx_.end(), [&gen_eta](std::size_t a, std::size_t b) {
+                    return gen_eta[a] < gen_eta[b];
+                });
+                for (std::size_t n = 0; n < idx_.size(); ++n)
+                    eta_[n] = gen_eta[idx_[n]];
             }
 
+            bool empty() const { return idx_.empty(); }
 
+            // calls fn(gen_idx) for each gen jet with eta_min <= eta <= eta_max
+            template <typename Fn>
+            void forEachInEtaWindow(float eta_min, float eta_max, Fn&& fn) const {
+                auto it = std::lower_bound(eta_.begin(), eta_.end(), eta_min);
+                for (; it != eta_.end() && *it <= eta_max; ++it)
+                    fn(idx_[static_cast<std::size_t>(it - eta_.begin())]);
+            }
 
-            std::size_t findGenMatch(
-            const double pt, const float eta, const float phi,
-            const std::size_t genJetIdx, const ROOT::VecOps::RVec<float>& gen_pt,
-            const ROOT::VecOps::RVec<float>& gen_eta, const ROOT::VecOps::RVec<float>& gen_phi,
-            const double resolution, const bool isAK4=true ) const
-            {
-                const float m_genMatch_dR2max = isAK4 ? 0.2*0.2 : 0.4*0.4; // half cone squared
-                const float m_genMatch_dPtmax = 3; // 3 times the resolution
-                auto get_dr2 = [](float phi, float eta, float gen_phi, float gen_eta) -> float {
-                    const auto dphi = ROOT::Math::VectorUtil::Phi_mpi_pi(gen_phi - phi);
-                    const auto deta = gen_eta - eta;
-                    return dphi*dphi + deta*deta;
-                };
-                auto check_resolution = [resolution, m_genMatch_dPtmax](float pt, float gen_pt) -> bool {
-                    return std::abs(gen_pt - pt) < m_genMatch_dPtmax*resolution;
-                };
+          private:
+            std::vector<float> eta_;
+            std::vector<std::size_t> idx_;
+        };
+
+        std::size_t findGenMatch(const double pt,
+                                 const float eta,
+                                 const float phi,
+                                 const std::size_t genJetIdx,
+                                 const ROOT::VecOps::RVec<float>& gen_pt,
+                                 const ROOT::VecOps::RVec<float>& gen_eta,
+                                 const ROOT::VecOps::RVec<float>& gen_phi,
+                                 const double resolution,
+                                 const bool isAK4 = true,
+                                 const GenJetEtaIndex* gen_eta_index = nullptr) const {
+            const float m_genMatch_dR2max = isAK4 ? 0.2 * 0.2 : 0.4 * 0.4;  // half cone squared
+            const float m_genMatch_dPtmax = 3;                              // 3 times the resolution
+            auto get_dr2 = [](float phi, float eta, float gen_phi, float gen_eta) -> float {
+                const auto dphi = ROOT::Math::VectorUtil::Phi_mpi_pi(gen_phi - phi);
+                const auto deta = gen_eta - eta;
+                return dphi * dphi + deta * deta;
+            };
+            auto check_resolution = [resolution, m_genMatch_dPtmax](float pt, float gen_pt) -> bool {
+                return std::abs(gen_pt - pt) < m_genMatch_dPtmax * resolution;
+            };
 
-                // First check if matched genJet from NanoAOD is acceptable
-                if (genJetIdx < gen_pt.size()) {
-                    const float dr2 = get_dr2(phi, eta, gen_phi[genJetIdx], gen_eta[genJetIdx]);
-                    if ((dr2 < m_genMatch_dR2max) && check_resolution(pt, gen_pt[genJetIdx])) {
-                        return genJetIdx;
-                    }
+            // First check if matched genJet from NanoAOD is acceptable
+            if (genJetIdx < gen_pt.size()) {
+                const float dr2 = get_dr2(phi, eta, gen_phi[genJetIdx], gen_eta[genJetIdx]);
+                if ((dr2 < m_genMatch_dR2max) && check_resolution(pt, gen_pt[genJetIdx])) {
+                    return genJetIdx;
                 }
+            }
 
-                std::size_t igBest{gen_pt.size()};
-                auto dr2Min = std::numeric_limits<float>::max();
-                for ( std::size_t ig{0}; ig != gen_pt.size(); ++ig ) {
+            std::size_t igBest{gen_pt.size()};
+            auto dr2Min = std::numeric_limits<float>::max();
+            if (!gen_eta_index) {
+                for (std::size_t ig{0}; ig != gen_pt.size(); ++ig) {
                     const auto dr2 = get_dr2(phi, eta, gen_phi[ig], gen_eta[ig]);
-                    if ( ( dr2 < dr2Min ) && ( dr2 < m_genMatch_dR2max ) ) {
+                    if ((dr2 < dr2Min) && (dr2 < m_genMatch_dR2max)) {
                         if (check_resolution(pt, gen_pt[ig])) {
                             dr2Min = dr2;
                             igBest = ig;
@@ -207,398 +556,693 @@ namespace correction {
                 return igBest;
             }
 
-        std::map<std::pair<UncSource, UncScale>, RVecLV> getShiftedP4_Base(
-            const RVecF& pt_vec,
-            const RVecF& eta_vec,
-            const RVecF& phi_vec,
-            const RVecF& mass_vec,
-            const RVecF& rawFactor_vec,
-            const RVecF& area_vec,
-            const float rho,
-            int event,
-            bool apply_jer,
-            bool reapply_jec,
-            bool require_run_number,
-            const unsigned int run,
-            bool wantPhi,
-            bool apply_forward_jet_horns_fix,
-            std::map<UncSource, std::string> unc_map,
-            const std::unique_ptr<CorrectionSet>& corrset,
-            const Correction::Ref& corr_jer_sf,
-            const Correction::Ref& corr_jer_sfUnc,
-            const Correction::Ref& jersmear_corr,
-            const Correction::Ref& corr_jer_res,
-            const RVecF& gen_pt_vec = {},
-            const RVecF& gen_eta_vec = {},
-            const RVecF& gen_phi_vec = {},
-            const RVecI& genJetIdx_vec = {}
-        ) const
-        {
-            std::map<std::pair<UncSource, UncScale>, RVecLV> all_shifted_p4;
-            const size_t sz = pt_vec.size();
+            // same selection as the linear scan: on equal dR the lowest gen jet index wins
+            const float deta_max = std::sqrt(m_genMatch_dR2max) + 1e-4f;
+            gen_eta_index->forEachInEtaWindow(eta - deta_max, eta + deta_max, [&](std::size_t ig) {
+                const auto dr2 = get_dr2(phi, eta, gen_phi[ig], gen_eta[ig]);
+                if ((dr2 < dr2Min || (dr2 == dr2Min && ig < igBest)) && (dr2 < m_genMatch_dR2max)) {
+                    if (check_resolution(pt, gen_pt[ig])) {
+                        dr2Min = dr2;
+                        igBest = ig;
+                    }
+                }
+            });
+            return igBest;
+        }
 
-            // ============================================================
-            // Build list of variations
-            // ============================================================
+        // Variation-independent part of the jet calibration, evaluated once per jet:
+        // JEC re-application followed by the JER smearing factors for the nominal, up and down JER scale factors.
+        // All JES variations are then derived from the nominal smeared jet by a single multiplication.
+        struct JetNominalStage {
+            RVecF pt;                         // after JEC, before JER smearing
+            RVecF mass;                       // after JEC, before JER smearing
+            std::array<RVecF, 3> jer_factor;  // indexed by JERVariation
+            RVecI gen_match_idx;              // matched gen jet index, -1 if none
+            bool with_jer_variations{false};  // jer_factor Up/Down differ from Nominal only if set
+        };
+
+        struct JERFactors {
+            std::array<float, 3> factor;  // indexed by JERVariation
+            int gen_match_idx;
+        };
+
+        enum class JERVariation : int { Nominal = 0, Up = 1, Down = 2 };
+
+        float evaluateJEC(float pt_raw,
+                          float eta,
+                          float phi,
+                          float area,
+                          float rho,
+                          unsigned int run,
+                          bool require_run_number,
+                          bool wantPhi) const {
+            const float abs_eta = std::abs(eta);
+            const bool is2024Eta2To2p5 = (year_ == "2024" && abs_eta > 2.f && abs_eta < 2.5f);
+            if (use_cmpd_jec_ && !is2024Eta2To2p5) {
+                return evaluateJECCompound(pt_raw, eta, phi, area, rho, run, require_run_number, wantPhi);
+            }
+            return evaluateJECSeparately(
+                pt_raw, eta, phi, area, rho, run, require_run_number, wantPhi, is_data_, is2024Eta2To2p5);
+        }
 
-            std::vector<std::pair<UncSource, UncScale>> variations;
-            variations.emplace_back(UncSource::Central, UncScale::Central);
+        JERFactors evaluateJERFactors(float corrected_pt,
+                                      float eta,
+                                      float phi,
+                                      float rho,
+                                      int event,
+                                      int genJetIdx,
+                                      bool apply_forward_jet_horns_fix,
+                                      bool want_jer_variations,
+                                      bool isAK4,
+                                      const BinnedCorrectionRef& corr_jer_sf,
+                                      const BinnedCorrectionRef& corr_jer_sfUnc,
+                                      const Correction::Ref& jersmear_corr,
+                                      const Correction::Ref& corr_jer_res,
+                                      const RVecF& gen_pt_vec,
+                                      const RVecF& gen_eta_vec,
+                                      const RVecF& gen_phi_vec,
+                                      const GenJetEtaIndex& gen_eta_index) const {
+            const float abs_eta = std::abs(eta);
+
+            // pt resolution
+            const float jer_pt_res = corr_jer_res->evaluate({eta, corrected_pt, rho});
+
+            // Find valid gen match
+            // Same logic as JetMETVariationsCalculatorBase
+            float genjet_pt = -1.f;
+            int gen_match_idx = -1;
+            if (!gen_pt_vec.empty()) {
+                const size_t gen_idx = genJetIdx >= 0 ? static_cast<size_t>(genJetIdx) : gen_pt_vec.size();
+                const auto matched_idx = findGenMatch(corrected_pt,
+                                                      eta,
+                                                      phi,
+                                                      gen_idx,
+                                                      gen_pt_vec,
+                                                      gen_eta_vec,
+                                                      gen_phi_vec,
+                                                      jer_pt_res * corrected_pt,
+                                                      isAK4,
+                                                      &gen_eta_index);
+                if (matched_idx < gen_pt_vec.size()) {
+                    genjet_pt = gen_pt_vec[matched_idx];
+                    gen_match_idx = static_cast<int>(matched_idx);
+                }
+            }
 
-            if (!is_data_){
-                for (const auto& unc_scale : {UncScale::Up, UncScale::Down}){
-                    for (const auto& [unc_source, unc_name] : unc_map){
-                        variations.emplace_back(unc_source, unc_scale);
+            // JER scale factor
+            const float jer_sf = corr_jer_sf.evaluate(eta, corrected_pt);
+            const float jer_sf_unc = want_jer_variations ? corr_jer_sfUnc.evaluate(eta, corrected_pt) : 0.f;
+
+            // Forward jet horn fix
+            const bool is_fatjet_in_horn = (abs_eta >= 2.5f && abs_eta <= 3.f);
+            const bool has_gen_match = (genjet_pt > 0.f);
+            const bool skip_smearing =
+                apply_forward_jet_horns_fix && is_fatjet_in_horn && !has_gen_match && year_ != "2025";
+
+            auto smear = [&](float sf) -> float {
+                float jersmear_factor =
+                    jersmear_corr->evaluate({corrected_pt, eta, genjet_pt, rho, event, jer_pt_res, sf});
+
+                // If jersmear factor is negative, it should be reset to 1
+                // https://cms-jerc.web.cern.ch/JER/#smearing-procedures
+                // Proof in python format that the negative safety is NOT implemented internally
+                // >>> import correctionlib
+                // >>> corrset = correctionlib.CorrectionSet.from_file("/cvmfs/cms-griddata.cern.ch/cat/metadata/JME/JER-Smearing/latest/jer_smear.json.gz")
+                // >>> c = corrset['JERSmear']
+                // >>> c.evaluate(pt, eta, genjet, rho, 136883, jer, jersf)
+                // -1.0618014379136045
+                // >>> pt
+                // 106.42100524902344
+                // >>> eta
+                // 1.5625
+                // >>> genjet
+                // -1.0
+                // >>> rho
+                // 62.69664764404297
+                // >>> jer
+                // 1.0
+                // >>> jersf
+                // 1.2209999561309814
+                if (jersmear_factor < 0.0) {
+                    jersmear_factor = 1.f;
+                }
+                if (skip_smearing) {
+                    jersmear_factor = 1.f;
+                }
+                return jersmear_factor;
+            };
+
+            JERFactors factors;
+            factors.gen_match_idx = gen_match_idx;
+            auto& factor = factors.factor;
+            factor[static_cast<int>(JERVariation::Nominal)] = smear(jer_sf);
+            if (want_jer_variations) {
+                factor[static_cast<int>(JERVariation::Up)] = smear(jer_sf * (1 + jer_sf_unc));
+                factor[static_cast<int>(JERVariation::Down)] = smear(jer_sf * (1 - jer_sf_unc));
+            } else {
+                factor[static_cast<int>(JERVariation::Up)] = factor[static_cast<int>(JERVariation::Nominal)];
+                factor[static_cast<int>(JERVariation::Down)] = factor[static_cast<int>(JERVariation::Nominal)];
+            }
+            return factors;
+        }
+
+        JetNominalStage evaluateNominalStage(const RVecF& pt_vec,
+                                             const RVecF& eta_vec,
+                                             const RVecF& phi_vec,
+                                             const RVecF& mass_vec,
+                                             const RVecF& rawFactor_vec,
+                                             const RVecF& area_vec,
+                                             const float rho,
+                                             int event,
+                                             bool apply_jer,
+                                             bool reapply_jec,
+                                             bool require_run_number,
+                                             const unsigned int run,
+                                             bool wantPhi,
+                                             bool apply_forward_jet_horns_fix,
+                                             bool want_jer_variations,
+                                             bool isAK4,
+                                             const BinnedCorrectionRef& corr_jer_sf,
+                                             const BinnedCorrectionRef& corr_jer_sfUnc,
+                                             const Correction::Ref& jersmear_corr,
+                                             const Correction::Ref& corr_jer_res,
+                                             const RVecF& gen_pt_vec,
+                                             const RVecF& gen_eta_vec,
+                                             const RVecF& gen_phi_vec,
+                                             const RVecI& genJetIdx_vec) const {
+            const size_t sz = pt_vec.size();
+            JetNominalStage stage;
+            stage.pt = pt_vec;
+            stage.mass = mass_vec;
+            for (auto& factor : stage.jer_factor) {
+                factor = RVecF(sz, 1.f);
+            }
+            stage.gen_match_idx = RVecI(sz, -1);
+            stage.with_jer_variations = want_jer_variations;
+
+            const bool smear = apply_jer && !is_data_;
+            const GenJetEtaIndex gen_eta_index =
+                smear && !gen_pt_vec.empty() ? GenJetEtaIndex(gen_eta_vec) : GenJetEtaIndex();
+            for (size_t i = 0; i < sz; ++i) {
+                if (reapply_jec) {
+                    const float raw_sf = 1.f - rawFactor_vec[i];
+                    const float pt_raw = pt_vec[i] * raw_sf;
+                    const float mass_raw = mass_vec[i] * raw_sf;
+                    const float jec_sf =
+                        evaluateJEC(pt_raw, eta_vec[i], phi_vec[i], area_vec[i], rho, run, require_run_number, wantPhi);
+                    stage.pt[i] = pt_raw * jec_sf;
+                    stage.mass[i] = mass_raw * jec_sf;
+                }
+
+                if (smear) {
+                    const int genJetIdx = i < genJetIdx_vec.size() ? genJetIdx_vec[i] : -1;
+                    const auto factors = evaluateJERFactors(stage.pt[i],
+                                                            eta_vec[i],
+                                                            phi_vec[i],
+                                                            rho,
+                                                            event,
+                                                            genJetIdx,
+                                                            apply_forward_jet_horns_fix,
+                                                            want_jer_variations,
+                                                            isAK4,
+                                                            corr_jer_sf,
+                                                            corr_jer_sfUnc,
+                                                            jersmear_corr,
+                                                            corr_jer_res,
+                                                            gen_pt_vec,
+                                                            gen_eta_vec,
+                                                            gen_phi_vec,
+                                                            gen_eta_index);
+                    for (size_t n = 0; n < factors.factor.size(); ++n) {
+                        stage.jer_factor[n][i] = factors.factor[n];
                     }
+                    stage.gen_match_idx[i] = factors.gen_match_idx;
                 }
             }
+            return stage;
+        }
+
+        ShiftedP4Tensor getShiftedP4_Base(const RVecF& pt_vec,
+                                          const RVecF& eta_vec,
+                                          const RVecF& phi_vec,
+                                          const RVecF& mass_vec,
+                                          const RVecF& rawFactor_vec,
+                                          const RVecF& area_vec,
+                                          const float rho,
+                                          int event,
+                                          bool apply_jer,
+                                          bool reapply_jec,
+                                          bool require_run_number,
+                                          const unsigned int run,
+                                          bool wantPhi,
+                                          bool apply_forward_jet_horns_fix,
+                                          const JESUncertaintyRefs& jes_unc_corr,
+                                          bool isAK4,
+                                          const BinnedCorrectionRef& corr_jer_sf,
+                                          const BinnedCorrectionRef& corr_jer_sfUnc,
+                                          const Correction::Ref& jersmear_corr,
+                                          const Correction::Ref& corr_jer_res,
+                                          const RVecF& gen_pt_vec = {},
+                                          const RVecF& gen_eta_vec = {},
+                                          const RVecF& gen_phi_vec = {},
+                                          const RVecI& genJetIdx_vec = {}) const {
+            const size_t sz = pt_vec.size();
 
             // ============================================================
-            // Main loop over uncertainties
+            // Stage 1: JEC + JER, once per jet
             // ============================================================
 
-            for (const auto& [unc_source, unc_scale] : variations){
-                RVecLV shifted_p4(sz);
+            const bool want_jer_variations = !is_data_ && has_jer_unc_;
+            const JetNominalStage stage = evaluateNominalStage(pt_vec,
+                                                               eta_vec,
+                                                               phi_vec,
+                                                               mass_vec,
+                                                               rawFactor_vec,
+                                                               area_vec,
+                                                               rho,
+                                                               event,
+                                                               apply_jer,
+                                                               reapply_jec,
+                                                               require_run_number,
+                                                               run,
+                                                               wantPhi,
+                                                               apply_forward_jet_horns_fix,
+                                                               want_jer_variations,
+                                                               isAK4,
+                                                               corr_jer_sf,
+                                                               corr_jer_sfUnc,
+                                                               jersmear_corr,
+                                                               corr_jer_res,
+                                                               gen_pt_vec,
+                                                               gen_eta_vec,
+                                                               gen_phi_vec,
+                                                               genJetIdx_vec);
+
+            const size_t n_variations = is_data_ ? 1 : 1 + 2 * unc_sources_.size();
+            ShiftedP4Tensor shifted_p4(n_variations, sz);
+            shifted_p4.setGenMatchIdx(stage.gen_match_idx);
+
+            auto fillSmeared = [&](UncSource unc_source, UncScale unc_scale, JERVariation jer_variation) {
+                const RVecF& jer_factor = stage.jer_factor[static_cast<int>(jer_variation)];
+                LorentzVectorM* p4 = shifted_p4.row(shifted_p4.addVariation(unc_source, unc_scale));
                 for (size_t i = 0; i < sz; ++i) {
-                    const float eta = eta_vec[i];
-                    const float phi = phi_vec[i];
-                    const float abs_eta = std::abs(eta);
-
-                    // ====================================================
-                    // Start from NanoAOD values
-                    // ====================================================
-
-                    float corrected_pt = pt_vec[i];
-                    float corrected_mass = mass_vec[i];
-
-                    // ====================================================
-                    // Reapply JEC
-                    // ====================================================
-
-                    if (reapply_jec) {
-                        const float raw_sf = 1.f - rawFactor_vec[i];
-                        const float pt_raw = pt_vec[i] * raw_sf;
-                        const float mass_raw = mass_vec[i] * raw_sf;
-
-                        const bool is2024Eta2To2p5 =
-                            (
-                                year_ == "2024" &&
-                                abs_eta > 2.f &&
-                                abs_eta < 2.5f
-                            );
-
-                        float jec_sf = 1.f;
-
-                        if (use_cmpd_jec_ && !is2024Eta2To2p5){
-                            jec_sf = evaluateJECCompound(
-                                pt_raw,
-                                eta,
-                                phi,
-                                area_vec[i],
-                                rho,
-                                run,
-                                require_run_number,
-                                wantPhi
-                            );
-                        } else {
-                            jec_sf = evaluateJECSeparately(
-                                pt_raw,
-                                eta,
-                                phi,
-                                area_vec[i],
-                                rho,
-                                run,
-                                require_run_number,
-                                wantPhi,
-                                is_data_,
-                                is2024Eta2To2p5
-                            );
-                        }
+                    p4[i] = LorentzVectorM(
+                        stage.pt[i] * jer_factor[i], eta_vec[i], phi_vec[i], stage.mass[i] * jer_factor[i]);
+                }
+            };
 
-                        corrected_pt = pt_raw * jec_sf;
-                        corrected_mass = mass_raw * jec_sf;
-                    }
+            fillSmeared(UncSource::Central, UncScale::Central, JERVariation::Nominal);
 
-                    // ====================================================
-                    // JER smearing
-                    // ====================================================
-
-                    float jersmear_factor = 1.f;
-
-                    if (apply_jer && !is_data_) {
-
-                        // ------------------------------------------------
-                        // pt resolution
-                        // ------------------------------------------------
-
-                        const float jer_pt_res =
-                            corr_jer_res->evaluate({
-                                eta,
-                                corrected_pt,
-                                rho
-                            });
-
-                        // ------------------------------------------------
-                        // Find valid gen match
-                        // Same logic as JetMETVariationsCalculatorBase
-                        // ------------------------------------------------
-
-                        float genjet_pt = -1.f;
-
-                        if (!gen_pt_vec.empty()){
-                            const size_t genJetIdx_nano_size = genJetIdx_vec.size();
-                            const size_t gen_pt_size = gen_pt_vec.size();
-                            const size_t gen_size = (i < genJetIdx_nano_size && genJetIdx_vec[i] >= 0) ? static_cast<size_t>(genJetIdx_vec[i]) : gen_pt_size;
-                            const auto matched_idx = findGenMatch(
-                                corrected_pt,
-                                eta,
-                                phi,
-                                gen_size,
-                                gen_pt_vec,
-                                gen_eta_vec,
-                                gen_phi_vec,
-                                jer_pt_res * corrected_pt
-                            );
-
-                            if (matched_idx < gen_pt_vec.size()) {
-                                genjet_pt = gen_pt_vec[matched_idx];
-                            }
-                        }
+            if (is_data_) {
+                return shifted_p4;
+            }
 
-                        // ------------------------------------------------
-                        // JER scale factor
-                        // ------------------------------------------------
-
-
-                        float jer_sf =
-                            corr_jer_sf->evaluate({
-                                eta,
-                                corrected_pt
-                            });
-                        const float jer_sf_unc = corr_jer_sfUnc->evaluate({
-                                eta,
-                                corrected_pt
-                            });
-
-                        // ------------------------------------------------
-                        // JER scale factor tag
-                        // ------------------------------------------------
-
-                        std::string jer_tag = "nom";
-
-                        if (unc_source == UncSource::JER) {
-                            if (unc_scale == UncScale::Up) {
-                                jer_tag = "up";
-                                jer_sf = jer_sf * (1 + jer_sf_unc);
-                            }
-                            else if (unc_scale == UncScale::Down) {
-                                jer_tag = "down";
-                                jer_sf = jer_sf * (1 - jer_sf_unc);
-                            }
-                        }
+            // ============================================================
+            // Stage 2: JER and JES variations from the nominal stage
+            // ============================================================
 
-                        // ------------------------------------------------
-                        // JER smearing
-                        // ------------------------------------------------
-
-                        jersmear_factor =
-                            jersmear_corr->evaluate({
-                                corrected_pt,
-                                eta,
-                                genjet_pt,
-                                rho,
-                                event,
-                                jer_pt_res,
-                                jer_sf
-                            });
-
-                        // If jersmear factor is negative, it should be reset to 1
-                        // https://cms-jerc.web.cern.ch/JER/#smearing-procedures
-                        // Proof in python format that the negative safety is NOT implemented internally
-                        // >>> import correctionlib
-                        // >>> corrset = correctionlib.CorrectionSet.from_file("/cvmfs/cms-griddata.cern.ch/cat/metadata/JME/JER-Smearing/latest/jer_smear.json.gz")
-                        // >>> c = corrset['JERSmear']
-                        // >>> c.evaluate(pt, eta, genjet, rho, 136883, jer, jersf)
-                        // -1.0618014379136045
-                        // >>> pt
-                        // 106.42100524902344
-                        // >>> eta
-                        // 1.5625
-                        // >>> genjet
-                        // -1.0
-                        // >>> rho
-                        // 62.69664764404297
-                        // >>> jer
-                        // 1.0
-                        // >>> jersf
-                        // 1.2209999561309814
-
-                        if (jersmear_factor < 0.0){
-                            jersmear_factor = 1.f;
-                        }
+            const RVecF& nominal_jer_factor = stage.jer_factor[static_cast<int>(JERVariation::Nominal)];
+            const RVecF nominal_pt = stage.pt * nominal_jer_factor;
+            const RVecF nominal_mass = stage.mass * nominal_jer_factor;
 
-                        // ------------------------------------------------
-                        // Forward jet horn fix
-                        // ------------------------------------------------
+            for (const UncSource unc_source : unc_sources_) {
+                if (unc_source == UncSource::JER) {
+                    fillSmeared(UncSource::JER, UncScale::Up, JERVariation::Up);
+                    fillSmeared(UncSource::JER, UncScale::Down, JERVariation::Down);
+                    continue;
+                }
 
-                        const bool is_fatjet_in_horn = (abs_eta >= 2.5f && abs_eta <= 3.f);
-                        const bool has_gen_match = (genjet_pt > 0.f);
+                const RVecF unc_vec = jes_unc_corr[uncSourceIndex(unc_source)].evaluateBatch(eta_vec, nominal_pt);
+                LorentzVectorM* shifted_up = shifted_p4.row(shifted_p4.addVariation(unc_source, UncScale::Up));
+                LorentzVectorM* shifted_down = shifted_p4.row(shifted_p4.addVariation(unc_source, UncScale::Down));
+                for (size_t i = 0; i < sz; ++i) {
+                    const float corrected_pt = nominal_pt[i];
+                    const float corrected_mass = nominal_mass[i];
+                    const float unc = unc_vec[i];
+                    const float sf_up = 1.f + static_cast<int>(UncScale::Up) * unc;
+                    const float sf_down = 1.f + static_cast<int>(UncScale::Down) * unc;
+                    shifted_up[i] =
+                        LorentzVectorM(corrected_pt * sf_up, eta_vec[i], phi_vec[i], corrected_mass * sf_up);
+                    shifted_down[i] =
+                        LorentzVectorM(corrected_pt * sf_down, eta_vec[i], phi_vec[i], corrected_mass * sf_down);
+                }
+            }
 
-                        if (apply_forward_jet_horns_fix && is_fatjet_in_horn && !has_gen_match && year_ != "2025") {
-                            jersmear_factor = 1.f;
-                        }
+            return shifted_p4;
+        }
+
+        // Throws if the variation can not be derived from the nominal stage; returns true for JES variations.
+        bool checkVariation(const JetNominalStage& stage,
+                            UncSource unc_source,
+                            UncScale unc_scale,
+                            const JESUncertaintyRefs& jes_unc_corr) const {
+            const bool is_central = unc_source == UncSource::Central;
+            if (is_central != (unc_scale == UncScale::Central))
+                throw std::runtime_error("JetCorrectionProvider: inconsistent source and scale combination.");
+            if (!is_central && is_data_)
+                throw std::runtime_error("JetCorrectionProvider: variations are not available for data.");
+            if (unc_source == UncSource::JER && !stage.with_jer_variations)
+                throw std::runtime_error("JetCorrectionProvider: the nominal stage has no JER variations.");
+            const bool is_jes = !is_central && unc_source != UncSource::JER;
+            if (is_jes && !jes_unc_corr[uncSourceIndex(unc_source)])
+                throw std::runtime_error("JetCorrectionProvider: JES source " +
+                                         std::to_string(static_cast<int>(unc_source)) + " is not available.");
+            return is_jes;
+        }
+
+        static JERVariation jerVariation(UncSource unc_source, UncScale unc_scale) {
+            if (unc_source != UncSource::JER)
+                return JERVariation::Nominal;
+            return unc_scale == UncScale::Up ? JERVariation::Up : JERVariation::Down;
+        }
+
+        // Single variation derived from the nominal stage, with the same arithmetic as getShiftedP4_Base, so that
+        // each variation column only evaluates its own JES uncertainty.
+        RVecLV getVariedP4_Base(const JetNominalStage& stage,
+                                const RVecF& eta_vec,
+                                const RVecF& phi_vec,
+                                UncSource unc_source,
+                                UncScale unc_scale,
+                                const JESUncertaintyRefs& jes_unc_corr) const {
+            const bool is_jes = checkVariation(stage, unc_source, unc_scale, jes_unc_corr);
+            const RVecF& jer_factor = stage.jer_factor[static_cast<int>(jerVariation(unc_source, unc_scale))];
+
+            const size_t sz = stage.pt.size();
+            RVecLV p4(sz);
+            if (!is_jes) {
+                for (size_t i = 0; i < sz; ++i) {
+                    p4[i] = LorentzVectorM(
+                        stage.pt[i] * jer_factor[i], eta_vec[i], phi_vec[i], stage.mass[i] * jer_factor[i]);
+                }
+                return p4;
+            }
+
+            const RVecF nominal_pt = stage.pt * jer_factor;
+            const RVecF nominal_mass = stage.mass * jer_factor;
+            const RVecF unc_vec = jes_unc_corr[uncSourceIndex(unc_source)].evaluateBatch(eta_vec, nominal_pt);
+            for (size_t i = 0; i < sz; ++i) {
+                const float sf = 1.f + static_cast<int>(unc_scale) * unc_vec[i];
+                p4[i] = LorentzVectorM(nominal_pt[i] * sf, eta_vec[i], phi_vec[i], nominal_mass[i] * sf);
+            }
+            return p4;
+        }
 
-                        corrected_pt *= jersmear_factor;
-                        corrected_mass *= jersmear_factor;
+        // pt scale of a variation with respect to the nominal smeared jet, stored in the row pt_scale.
+        void fillPtScale(const JetNominalStage& stage,
+                         const RVecF& eta_vec,
+                         const RVecF& nominal_pt,
+                         UncSource unc_source,
+                         UncScale unc_scale,
+                         bool is_jes,
+                         const JESUncertaintyRefs& jes_unc_corr,
+                         float* pt_scale) const {
+            const size_t sz = stage.pt.size();
+            if (is_jes) {
+                const RVecF unc_vec = jes_unc_corr[uncSourceIndex(unc_source)].evaluateBatch(eta_vec, nominal_pt);
+                for (size_t i = 0; i < sz; ++i)
+                    pt_scale[i] = 1.f + static_cast<int>(unc_scale) * unc_vec[i];
+                return;
+            }
+            const RVecF& nominal_factor = stage.jer_factor[static_cast<int>(JERVariation::Nominal)];
+            const RVecF& jer_factor = stage.jer_factor[static_cast<int>(jerVariation(unc_source, unc_scale))];
+            for (size_t i = 0; i < sz; ++i)
+                pt_scale[i] = nominal_factor[i] != 0.f ? jer_factor[i] / nominal_factor[i] : 1.f;
+        }
+
+        ShiftedScaleTensor getShiftedScales_Base(const JetNominalStage& stage,
+                                                 const RVecF& eta_vec,
+                                                 const JESUncertaintyRefs& jes_unc_corr) const {
+            const size_t sz = stage.pt.size();
+            const size_t n_variations = is_data_ ? 1 : 1 + 2 * unc_sources_.size();
+            ShiftedScaleTensor pt_scales(n_variations, sz);
+            float* central = pt_scales.row(pt_scales.addVariation(UncSource::Central, UncScale::Central));
+            std::fill(central, central + sz, 1.f);
+            if (is_data_)
+                return pt_scales;
+
+            const RVecF nominal_pt = stage.pt * stage.jer_factor[static_cast<int>(JERVariation::Nominal)];
+            for (const UncSource unc_source : unc_sources_) {
+                if (unc_source == UncSource::JER && !stage.with_jer_variations)
+                    continue;
+                const bool is_jes = unc_source != UncSource::JER;
+                if (is_jes) {
+                    // up and down share the uncertainty evaluation
+                    const RVecF unc_vec = jes_unc_corr[uncSourceIndex(unc_source)].evaluateBatch(eta_vec, nominal_pt);
+                    float* up = pt_scales.row(pt_scales.addVariation(unc_source, UncScale::Up));
+                    float* down = pt_scales.row(pt_scales.addVariation(unc_source, UncScale::Down));
+                    for (size_t i = 0; i < sz; ++i) {
+                        up[i] = 1.f + static_cast<int>(UncScale::Up) * unc_vec[i];
+                        down[i] = 1.f + static_cast<int>(UncScale::Down) * unc_vec[i];
                     }
+                    continue;
+                }
+                for (const UncScale unc_scale : {UncScale::Up, UncScale::Down}) {
+                    fillPtScale(stage,
+                                eta_vec,
+                                nominal_pt,
+                                unc_source,
+                                unc_scale,
+                                false,
+                                jes_unc_corr,
+                                pt_scales.row(pt_scales.addVariation(unc_source, unc_scale)));
+                }
+            }
+            return pt_scales;
+        }
 
-                    // ====================================================
-                    // JES uncertainties
-                    // ====================================================
+        RVecF getVariedPtScale_Base(const JetNominalStage& stage,
+                                    const RVecF& eta_vec,
+                                    UncSource unc_source,
+                                    UncScale unc_scale,
+                                    const JESUncertaintyRefs& jes_unc_corr) const {
+            const bool is_jes = checkVariation(stage, unc_source, unc_scale, jes_unc_corr);
+            RVecF pt_scale(stage.pt.size(), 1.f);
+            if (unc_source == UncSource::Central)
+                return pt_scale;
+            const RVecF nominal_pt =
+                is_jes ? stage.pt * stage.jer_factor[static_cast<int>(JERVariation::Nominal)] : RVecF();
+            fillPtScale(stage, eta_vec, nominal_pt, unc_source, unc_scale, is_jes, jes_unc_corr, pt_scale.data());
+            return pt_scale;
+        }
 
-                    if (
-                        unc_source != UncSource::Central &&
-                        unc_source != UncSource::JER
-                    ) {
+        ShiftedP4Tensor getShiftedP4_Jet(const RVecF& Jet_pt,
+                                         const RVecF& Jet_eta,
+                                         const RVecF& Jet_phi,
+                                         const RVecF& Jet_mass,
+                                         const RVecF& Jet_rawFactor,
+                                         const RVecF& Jet_area,
+                                         const float rho,
+                                         int event,
+                                         bool apply_jer,
+                                         bool reapply_jec,
+                                         bool require_run_number,
+                                         const unsigned int run,
+                                         bool wantPhi,
+                                         bool apply_forward_jet_horns_fix,
+                                         const RVecF& GenJet_pt = {},
+                                         const RVecF& GenJet_eta = {},
+                                         const RVecF& GenJet_phi = {},
+                                         const RVecI& Jet_genJetIdx = {}) const {
+            return getShiftedP4_Base(Jet_pt,
+                                     Jet_eta,
+                                     Jet_phi,
+                                     Jet_mass,
+                                     Jet_rawFactor,
+                                     Jet_area,
+                                     rho,
+                                     event,
+                                     apply_jer,
+                                     reapply_jec,
+                                     require_run_number,
+                                     run,
+                                     wantPhi,
+                                     apply_forward_jet_horns_fix,
+                                     jes_unc_corr_,
+                                     true,
+                                     corr_jer_sf_,
+                                     corr_jer_sfUnc_,
+                                     jersmear_corr_,
+                                     corr_jer_res_,
+                                     GenJet_pt,
+                                     GenJet_eta,
+                                     GenJet_phi,
+                                     Jet_genJetIdx);
+        }
 
-                        const auto corr =
-                            corrset->at(
-                                unc_map.at(unc_source)
-                            );
+        ShiftedP4Tensor getShiftedP4_FatJet(const RVecF& FatJet_pt,
+                                            const RVecF& FatJet_eta,
+                                            const RVecF& FatJet_phi,
+                                            const RVecF& FatJet_mass,
+                                            const RVecF& FatJet_rawFactor,
+                                            const RVecF& FatJet_area,
+                                            const float rho,
+                                            int event,
+                                            bool apply_jer,
+                                            bool reapply_jec,
+                                            bool require_run_number,
+                                            const unsigned int run,
+                                            bool wantPhi,
+                                            bool apply_forward_jet_horns_fix,
+                                            const RVecF& GenFatJet_pt = {},
+                                            const RVecF& GenFatJet_eta = {},
+                                            const RVecF& GenFatJet_phi = {},
+                                            const RVecI& FatJet_genJetIdx = {}) const {
+            return getShiftedP4_Base(FatJet_pt,
+                                     FatJet_eta,
+                                     FatJet_phi,
+                                     FatJet_mass,
+                                     FatJet_rawFactor,
+                                     FatJet_area,
+                                     rho,
+                                     event,
+                                     apply_jer,
+                                     reapply_jec,
+                                     require_run_number,
+                                     run,
+                                     wantPhi,
+                                     apply_forward_jet_horns_fix,
+                                     fat_jes_unc_corr_,
+                                     false,
+                                     fat_corr_jer_sf_,
+                                     fat_corr_jer_sfUnc_,
+                                     fat_jersmear_corr_,
+                                     fat_corr_jer_res_,
+                                     GenFatJet_pt,
+                                     GenFatJet_eta,
+                                     GenFatJet_phi,
+                                     FatJet_genJetIdx);
+        }
 
-                        const float unc =
-                            corr->evaluate({
-                                eta,
-                                corrected_pt
-                            });
+        // Lazy mode: the nominal stage is an RDataFrame column of its own and every variation is a separate
+        // column computed from it by getVariedP4_Jet/getVariedP4_FatJet, so variations that are never read
+        // are never evaluated. The JER up/down smearing is only evaluated if want_jer_variations is set.
+        JetNominalStage getNominalStage_Jet(const RVecF& Jet_pt,
+                                            const RVecF& Jet_eta,
+                                            const RVecF& Jet_phi,
+                                            const RVecF& Jet_mass,
+                                            const RVecF& Jet_rawFactor,
+                                            const RVecF& Jet_area,
+                                            const float rho,
+                                            int event,
+                                            bool apply_jer,
+                                            bool reapply_jec,
+                                            bool require_run_number,
+                                            const unsigned int run,
+                                            bool wantPhi,
+                                            bool apply_forward_jet_horns_fix,
+                                            bool want_jer_variations,
+                                            const RVecF& GenJet_pt = {},
+                                            const RVecF& GenJet_eta = {},
+                                            const RVecF& GenJet_phi = {},
+                                            const RVecI& Jet_genJetIdx = {}) const {
+            return evaluateNominalStage(Jet_pt,
+                                        Jet_eta,
+                                        Jet_phi,
+                                        Jet_mass,
+                                        Jet_rawFactor,
+                                        Jet_area,
+                                        rho,
+                                        event,
+                                        apply_jer,
+                                        reapply_jec,
+                                        require_run_number,
+                                        run,
+                                        wantPhi,
+                                        apply_forward_jet_horns_fix,
+                                        want_jer_variations && !is_data_ && has_jer_unc_,
+                                        true,
+                                        corr_jer_sf_,
+                                        corr_jer_sfUnc_,
+                                        jersmear_corr_,
+                                        corr_jer_res_,
+                                        GenJet_pt,
+                                        GenJet_eta,
+                                        GenJet_phi,
+                                        Jet_genJetIdx);
+        }
 
-                        const float sf =
-                            1.f +
-                            static_cast<int>(unc_scale) * unc;
+        JetNominalStage getNominalStage_FatJet(const RVecF& FatJet_pt,
+                                               const RVecF& FatJet_eta,
+                                               const RVecF& FatJet_phi,
+                                               const RVecF& FatJet_mass,
+                                               const RVecF& FatJet_rawFactor,
+                                               const RVecF& FatJet_area,
+                                               const float rho,
+                                               int event,
+                                               bool apply_jer,
+                                               bool reapply_jec,
+                                               bool require_run_number,
+                                               const unsigned int run,
+                                               bool wantPhi,
+                                               bool apply_forward_jet_horns_fix,
+                                               bool want_jer_variations,
+                                               const RVecF& GenFatJet_pt = {},
+                                               const RVecF& GenFatJet_eta = {},
+                                               const RVecF& GenFatJet_phi = {},
+                                               const RVecI& FatJet_genJetIdx = {}) const {
+            return evaluateNominalStage(FatJet_pt,
+                                        FatJet_eta,
+                                        FatJet_phi,
+                                        FatJet_mass,
+                                        FatJet_rawFactor,
+                                        FatJet_area,
+                                        rho,
+                                        event,
+                                        apply_jer,
+                                        reapply_jec,
+                                        require_run_number,
+                                        run,
+                                        wantPhi,
+                                        apply_forward_jet_horns_fix,
+                                        want_jer_variations && !is_data_ && has_jer_unc_,
+                                        false,
+                                        fat_corr_jer_sf_,
+                                        fat_corr_jer_sfUnc_,
+                                        fat_jersmear_corr_,
+                                        fat_corr_jer_res_,
+                                        GenFatJet_pt,
+                                        GenFatJet_eta,
+                                        GenFatJet_phi,
+                                        FatJet_genJetIdx);
+        }
 
-                        corrected_pt *= sf;
-                        corrected_mass *= sf;
-                    }
+        RVecLV getVariedP4_Jet(const JetNominalStage& stage,
+                               const RVecF& Jet_eta,
+                               const RVecF& Jet_phi,
+                               UncSource unc_source,
+                               UncScale unc_scale) const {
+            return getVariedP4_Base(stage, Jet_eta, Jet_phi, unc_source, unc_scale, jes_unc_corr_);
+        }
 
-                    // ====================================================
-                    // Build Lorentz vector
-                    // ====================================================
+        RVecLV getVariedP4_FatJet(const JetNominalStage& stage,
+                                  const RVecF& FatJet_eta,
+                                  const RVecF& FatJet_phi,
+                                  UncSource unc_source,
+                                  UncScale unc_scale) const {
+            return getVariedP4_Base(stage, FatJet_eta, FatJet_phi, unc_source, unc_scale, fat_jes_unc_corr_);
+        }
 
-                    shifted_p4[i] = LorentzVectorM(
-                        corrected_pt,
-                        eta,
-                        phi,
-                        corrected_mass
-                    );
-                }
+        ShiftedScaleTensor getShiftedScales_Jet(const JetNominalStage& stage, const RVecF& Jet_eta) const {
+            return getShiftedScales_Base(stage, Jet_eta, jes_unc_corr_);
+        }
 
-                all_shifted_p4.insert({
-                    {unc_source, unc_scale},
-                    shifted_p4
-                });
-            }
+        ShiftedScaleTensor getShiftedScales_FatJet(const JetNominalStage& stage, const RVecF& FatJet_eta) const {
+            return getShiftedScales_Base(stage, FatJet_eta, fat_jes_unc_corr_);
+        }
 
-            return all_shifted_p4;
-        }
-
-
-        std::map<std::pair<UncSource, UncScale>, RVecLV> getShiftedP4_Jet(
-            const RVecF& Jet_pt,
-            const RVecF& Jet_eta,
-            const RVecF& Jet_phi,
-            const RVecF& Jet_mass,
-            const RVecF& Jet_rawFactor,
-            const RVecF& Jet_area,
-            const float rho,
-            int event,
-            bool apply_jer,
-            bool reapply_jec,
-            bool require_run_number,
-            const unsigned int run,
-            bool wantPhi,
-            bool apply_forward_jet_horns_fix,
-            const RVecF& GenJet_pt = {},
-            const RVecF& GenJet_eta = {},
-            const RVecF& GenJet_phi = {},
-            const RVecI& Jet_genJetIdx = {}
-        ) const
-        {
-            return getShiftedP4_Base(
-                Jet_pt,
-                Jet_eta,
-                Jet_phi,
-                Jet_mass,
-                Jet_rawFactor,
-                Jet_area,
-                rho,
-                event,
-                apply_jer,
-                reapply_jec,
-                require_run_number,
-                run,
-                wantPhi,
-                apply_forward_jet_horns_fix,
-                unc_map_,
-                corrset_,
-                corr_jer_sf_,
-                corr_jer_sfUnc_,
-                jersmear_corr_,
-                corr_jer_res_,
-                GenJet_pt,
-                GenJet_eta,
-                GenJet_phi,
-                Jet_genJetIdx
-            );
-        }
-
-        std::map<std::pair<UncSource, UncScale>, RVecLV> getShiftedP4_FatJet(
-            const RVecF& FatJet_pt,
-            const RVecF& FatJet_eta,
-            const RVecF& FatJet_phi,
-            const RVecF& FatJet_mass,
-            const RVecF& FatJet_rawFactor,
-            const RVecF& FatJet_area,
-            const float rho,
-            int event,
-            bool apply_jer,
-            bool reapply_jec,
-            bool require_run_number,
-            const unsigned int run,
-            bool wantPhi,
-            bool apply_forward_jet_horns_fix,
-            const RVecF& GenFatJet_pt = {},
-            const RVecF& GenFatJet_eta = {},
-            const RVecF& GenFatJet_phi = {},
-            const RVecI& FatJet_genJetIdx = {}
-        ) const
-        {
-            return getShiftedP4_Base(
-                FatJet_pt,
-                FatJet_eta,
-                FatJet_phi,
-                FatJet_mass,
-                FatJet_rawFactor,
-                FatJet_area,
-                rho,
-                event,
-                apply_jer,
-                reapply_jec,
-                require_run_number,
-                run,
-                wantPhi,
-                apply_forward_jet_horns_fix,
-                fat_unc_map_,
-                fat_corrset_,
-                fat_corr_jer_sf_,
-                fat_corr_jer_sfUnc_,
-                fat_jersmear_corr_,
-                fat_corr_jer_res_,
-                GenFatJet_pt,
-                GenFatJet_eta,
-                GenFatJet_phi,
-                FatJet_genJetIdx
-            );
+        RVecF getVariedPtScale_Jet(const JetNominalStage& stage,
+                                   const RVecF& Jet_eta,
+                                   UncSource unc_source,
+                                   UncScale unc_scale) const {
+            return getVariedPtScale_Base(stage, Jet_eta, unc_source, unc_scale, jes_unc_corr_);
         }
 
+        RVecF getVariedPtScale_FatJet(const JetNominalStage& stage,
+                                      const RVecF& FatJet_eta,
+                                      UncSource unc_source,
+                                      UncScale unc_scale) const {
+            return getVariedPtScale_Base(stage, FatJet_eta, unc_source, unc_scale, fat_jes_unc_corr_);
+        }
 
         RVecF GetResolutions(RVecF pt, RVecF mass, RVecF const& raw_factor, RVecF const& eta, float rho) const {
             size_t sz = pt.size();
@@ -612,59 +1256,97 @@ namespace correction {
             return res;
         }
 
-        private:
-            std::map<UncSource, std::string> unc_map_;
-            std::unique_ptr<CorrectionSet> corrset_;
-            Correction::Ref jersmear_corr_;  // aka shared_ptr<Correction const>, sizeof = 8
-            Correction::Ref corr_l1_;
-            Correction::Ref corr_l2_;
-            Correction::Ref corr_l2l3res_;
-            Correction::Ref corr_jer_sf_;
-            Correction::Ref corr_jer_sfUnc_;
-            Correction::Ref corr_jer_res_;
-            CompoundCorrection::Ref cmpd_corr_;
-            std::map<UncSource, std::string> fat_unc_map_;
-            std::unique_ptr<CorrectionSet> fat_corrset_;
-            Correction::Ref fat_jersmear_corr_;  // aka shared_ptr<Correction const>, sizeof = 8
-            Correction::Ref fat_corr_jer_sf_;
-            Correction::Ref fat_corr_jer_sfUnc_;
-            Correction::Ref fat_corr_jer_res_;
-            CompoundCorrection::Ref fat_cmpd_corr_;
-            bool is_data_;
-            std::string year_;
-            bool use_cmpd_jec_;
-
-            inline static const std::map<UncSource, std::string> unc_map_total = {{UncSource::Total, "Total"},
-                                                                                {UncSource::JER, "JER"}};
-
-            inline static const std::map<UncSource, bool> year_dep_map = {{UncSource::Central, false},
-                                                                        {UncSource::JER, false},
-                                                                        {UncSource::Total, false},
-                                                                        {UncSource::RelativeBal, false},
-                                                                        {UncSource::HF, false},
-                                                                        {UncSource::BBEC1, false},
-                                                                        {UncSource::EC2, false},
-                                                                        {UncSource::Absolute, false},
-                                                                        {UncSource::FlavorQCD, false},
-                                                                        {UncSource::BBEC1_year, true},
-                                                                        {UncSource::Absolute_year, true},
-                                                                        {UncSource::EC2_year, true},
-                                                                        {UncSource::HF_year, true},
-                                                                        {UncSource::RelativeSample_year, true}};
-
-            inline static const std::map<UncSource, std::string> unc_map_regrouped = {
-                {UncSource::JER, "JER"},
-                {UncSource::RelativeBal, "Regrouped_RelativeBal"},
-                {UncSource::HF, "Regrouped_HF"},
-                {UncSource::BBEC1, "Regrouped_BBEC1"},
-                {UncSource::EC2, "Regrouped_EC2"},
-                {UncSource::Absolute, "Regrouped_Absolute"},
-                {UncSource::FlavorQCD, "Regrouped_FlavorQCD"},
-                {UncSource::BBEC1_year, "Regrouped_BBEC1"},
-                {UncSource::Absolute_year, "Regrouped_Absolute"},
-                {UncSource::EC2_year, "Regrouped_EC2"},
-                {UncSource::HF_year, "Regrouped_RelativeStatHF"},
-                {UncSource::RelativeSample_year, "Regrouped_RelativeSample"}};
+      private:
+        // Switches to the tabulated grids only if all of them are registered and reproduce correctionlib exactly.
+        void activateTabulated() {
+            std::vector<BinnedCorrectionRef*> refs = {
+                &corr_jer_sf_, &corr_jer_sfUnc_, &fat_corr_jer_sf_, &fat_corr_jer_sfUnc_};
+            for (UncSource unc_source : unc_sources_) {
+                if (unc_source == UncSource::JER)
+                    continue;
+                refs.push_back(&jes_unc_corr_[uncSourceIndex(unc_source)]);
+                refs.push_back(&fat_jes_unc_corr_[uncSourceIndex(unc_source)]);
+            }
+            for (auto* ref : refs) {
+                std::string message;
+                if (!ref->activateTabulated(message)) {
+                    std::cerr << "JetCorrectionProvider: tabulated mode not activated, " << message << std::endl;
+                    for (auto* other : refs)
+                        other->deactivateTabulated();
+                    return;
+                }
+            }
+            tabulated_ = true;
+            std::cout << "JetCorrectionProvider: tabulated mode activated for " << refs.size() << " corrections"
+                      << std::endl;
+        }
+
+        std::vector<UncSource> unc_sources_;
+        bool has_jer_unc_{false};
+        BoundCorrections corrset_;
+        Correction::Ref jersmear_corr_;  // aka shared_ptr<Correction const>, sizeof = 8
+        Correction::Ref corr_l1_;
+        Correction::Ref corr_l2_;
+        Correction::Ref corr_l2l3res_;
+        BinnedCorrectionRef corr_jer_sf_;
+        BinnedCorrectionRef corr_jer_sfUnc_;
+        Correction::Ref corr_jer_res_;
+        CompoundCorrection::Ref cmpd_corr_;
+        JESUncertaintyRefs jes_unc_corr_;
+        BoundCorrections fat_corrset_;
+        Correction::Ref fat_jersmear_corr_;  // aka shared_ptr<Correction const>, sizeof = 8
+        BinnedCorrectionRef fat_corr_jer_sf_;
+        BinnedCorrectionRef fat_corr_jer_sfUnc_;
+        Correction::Ref fat_corr_jer_res_;
+        CompoundCorrection::Ref fat_cmpd_corr_;
+        JESUncertaintyRefs fat_jes_unc_corr_;
+        bool is_data_;
+        std::string year_;
+        bool use_cmpd_jec_;
+        bool tabulated_{false};
+        std::shared_ptr<const RunSpecializedJEC> run_specialized_jec_;
+
+        static std::map<std::string, std::shared_ptr<const RunSpecializedJEC>>& runSpecializations() {
+            static std::map<std::string, std::shared_ptr<const RunSpecializedJEC>> specializations;
+            return specializations;
+        }
+
+        static std::mutex& runSpecializationMutex() {
+            static std::mutex m;
+            return m;
+        }
+
+        inline static const std::map<UncSource, std::string> unc_map_total = {{UncSource::Total, "Total"},
+                                                                              {UncSource::JER, "JER"}};
+
+        inline static const std::map<UncSource, bool> year_dep_map = {{UncSource::Central, false},
+                                                                      {UncSource::JER, false},
+                                                                      {UncSource::Total, false},
+                                                                      {UncSource::RelativeBal, false},
+                                                                      {UncSource::HF, false},
+                                                                      {UncSource::BBEC1, false},
+                                                                      {UncSource::EC2, false},
+                                                                      {UncSource::Absolute, false},
+                                                                      {UncSource::FlavorQCD, false},
+                                                                      {UncSource::BBEC1_year, true},
+                                                                      {UncSource::Absolute_year, true},
+                                                                      {UncSource::EC2_year, true},
+                                                                      {UncSource::HF_year, true},
+                                                                      {UncSource::RelativeSample_year, true}};
+
+        inline static const std::map<UncSource, std::string> unc_map_regrouped = {
+            {UncSource::JER, "JER"},
+            {UncSource::RelativeBal, "Regrouped_RelativeBal"},
+            {UncSource::HF, "Regrouped_HF"},
+            {UncSource::BBEC1, "Regrouped_BBEC1"},
+            {UncSource::EC2, "Regrouped_EC2"},
+            {UncSource::Absolute, "Regrouped_Absolute"},
+            {UncSource::FlavorQCD, "Regrouped_FlavorQCD"},
+            {UncSource::BBEC1_year, "Regrouped_BBEC1"},
+            {UncSource::Absolute_year, "Regrouped_Absolute"},
+            {UncSource::EC2_year, "Regrouped_EC2"},
+            {UncSource::HF_year, "Regrouped_RelativeStatHF"},
+            {UncSource::RelativeSample_year, "Regrouped_RelativeSample"}};
     };
 
 }  // namespace correction
\ No newline at end of file
@@ -1,6 +1,8 @@
+import bisect
+import itertools
+import json
+import math
 import os
-import urllib.request
-import ROOT
 from .CorrectionsCore import *
 
 # https://docs.google.com/spreadsheets/d/1JZfk78_9SD225bcUuTWVo4i02vwI5FfeVKH-dwzUdhM/edit#gid=1345121349
@@ -51,6 +53,8 @@ def getJMEFile(jme_repo, jme_file):
     jme_file_dir = os.path.join(this_file_dir, repo_entry["path"])
     jme_file_path = os.path.join(jme_file_dir, jme_file)
     if not os.path.exists(jme_file_path):
+        import urllib.request
+
         if not os.path.exists(jme_file_dir):
             os.makedirs(jme_file_dir)
         url = repo_entry["url"] + jme_file
@@ -59,6 +63,304 @@ def getJMEFile(jme_repo, jme_file):
     return jme_file_path
 
 
+def _binIndex(edges, flow, value):
+    """Returns the content index of value in a correctionlib binning, or the flow node if it is used."""
+    if isinstance(edges, dict):
+        n, low, high = edges["n"], edges["low"], edges["high"]
+        if low <= value < high:
+            return min(int(n * ((value - low) / (high - low))), n - 1), None
+        n_bins = n
+        underflow = value < low
+    else:
+        idx = bisect.bisect_right(edges, value)
+        if 0 < idx < len(edges):
+            return idx - 1, None
+        n_bins = len(edges) - 1
+        underflow = idx == 0
+    if flow == "clamp":
+        return (0 if underflow else n_bins - 1), None
+    if flow == "error":
+        raise ValueError(f"value {value} out of range")
+    return None, flow
+
+
+class RunSpecializationError(RuntimeError):
+    pass
+
+
+def _specializeNode(node, correction, input_name, value):
+    """Partially evaluates a correctionlib node for a fixed value of one input."""
+    if not isinstance(node, dict):
+        return node
+    nodetype = node["nodetype"]
+    if nodetype == "binning":
+        if node["input"] != input_name:
+            node = dict(node)
+            node["content"] = [
+                _specializeNode(c, correction, input_name, value)
+                for c in node["content"]
+            ]
+            node["flow"] = _specializeNode(node["flow"], correction, input_name, value)
+            return node
+        idx, flow_node = _binIndex(node["edges"], node["flow"], value)
+        selected = flow_node if idx is None else node["content"][idx]
+        return _specializeNode(selected, correction, input_name, value)
+    if nodetype == "multibinning":
+        node = dict(node)
+        if input_name in node["inputs"]:
+            axis = node["inputs"].index(input_name)
+            n_bins = [
+                e["n"] if isinstance(e, dict) else len(e) - 1 for e in node["edges"]
+            ]
+            idx, flow_node = _binIndex(node["edges"][axis], node["flow"], value)
+            if idx is None:
+                return _specializeNode(flow_node, correction, input_name, value)
+            stride = 1
+            for n in n_bins[axis + 1 :]:
+                stride *= n
+            content = [
+                c
+                for k, c in enumerate(node["content"])
+                if (k // stride) % n_bins[axis] == idx
+            ]
+            node["inputs"] = node["inputs"][:axis] + node["inputs"][axis + 1 :]
+            node["edges"] = node["edges"][:axis] + node["edges"][axis + 1 :]
+            node["content"] = content
+            if len(node["inputs"]) == 1:
+                node = {
+                    "nodetype": "binning",
+                    "input": node["inputs"][0],
+                    "edges": node["edges"][0],
+                    "content": content,
+                    "flow": node["flow"],
+                }
+        node["content"] = [
+            _specializeNode(c, correction, input_name, value) for c in node["content"]
+        ]
+        node["flow"] = _specializeNode(node["flow"], correction, input_name, value)
+        return node
+    if nodetype == "category":
+        if node["input"] == input_name:
+            for item in node["content"]:
+                if item["key"] == value:
+                    return _specializeNode(item["value"], correction, input_name, value)
+            if "default" not in node or node["default"] is None:
+                raise ValueError(f"value {value} not in category")
+            return _specializeNode(node["default"], correction, input_name, value)
+        node = dict(node)
+        node["content"] = [
+            {
+                "key": item["key"],
+                "value": _specializeNode(item["value"], correction, input_name, value),
+            }
+            for item in node["content"]
+        ]
+        if node.get("default") is not None:
+            node["default"] = _specializeNode(
+                node["default"], correction, input_name, value
+            )
+        return node
+    if nodetype == "formula":
+        variables = node["variables"]
+    elif nodetype == "formularef":
+        variables = correction["generic_formulas"][node["index"]]["variables"]
+    elif nodetype == "transform":
+        variables = [node["input"]]
+    elif nodetype == "hashprng":
+        variables = node["inputs"]
+    else:
+        raise RunSpecializationError(f"unsupported node type {nodetype}")
+    if input_name in variables:
+        raise RunSpecializationError(
+            f"{correction['name']}: {nodetype} depending on {input_name} can not be specialized"
+        )
+    if nodetype == "transform":
+        node = dict(node)
+        node["rule"] = _specializeNode(node["rule"], correction, input_name, value)
+        node["content"] = _specializeNode(
+            node["content"], correction, input_name, value
+        )
+    return node
+
+
+def _collectEdges(node, input_name, edges):
+    if isinstance(node, list):
+        for item in node:
+            _collectEdges(item, input_name, edges)
+        return
+    if not isinstance(node, dict):
+        return
+    nodetype = node.get("nodetype")
+    node_edges = []
+    if nodetype == "binning" and node["input"] == input_name:
+        node_edges = [node["edges"]]
+    elif nodetype == "multibinning" and input_name in node["inputs"]:
+        node_edges = [node["edges"][node["inputs"].index(input_name)]]
+    elif nodetype == "category" and node["input"] == input_name:
+        # each key k is the interval [k, k + 1) of the (integer) input
+        for item in node["content"]:
+            edges.add(item["key"])
+            if not isinstance(item["key"], str):
+                edges.add(item["key"] + 1)
+    for e in node_edges:
+        if isinstance(e, dict):
+            n, low, high = e["n"], e["low"], e["high"]
+            edges.update(low + (high - low) * k / n for k in range(n))
+            edges.add(high)
+        else:
+            edges.update(e)
+    for key in ["content", "flow", "default", "rule", "value"]:
+        if key in node:
+            _collectEdges(node[key], input_name, edges)
+
+
+def specializeRunDependentJEC(json_file, compound_name, run_input="run"):
+    """Splits a run-dependent compound JEC into run-free correction sets, one per run interval.
+
+    Returns the run edges and, for each interval (underflow, bins, overflow), the JSON of a correction set holding
+    the run-free compound correction and its stack, or an empty string if correctionlib raises in that interval.
+    """
+    from .tabulated import loadPayload
+
+    payload = loadPayload(json_file)
+    compound = next(
+        (c for c in payload["compound_corrections"] if c["name"] == compound_name),
+        None,
+    )
+    if compound is None:
+        raise RunSpecializationError(f"{compound_name} not found in {json_file}")
+    if run_input not in [v["name"] for v in compound["inputs"]]:
+        raise RunSpecializationError(f"{compound_name} does not depend on {run_input}")
+    corrections = {c["name"]: c for c in payload["corrections"]}
+    stack = [corrections[name] for name in compound["stack"]]
+
+    run_edges = set()
+    for correction in stack:
+        if run_input in [v["name"] for v in correction["inputs"]]:
+            _collectEdges(correction["data"], run_input, run_edges)
+    run_edges = sorted(run_edges)
+    # one representative run per interval: below the first edge for the underflow, then the lower edge of each
+    # interval, which belongs to it as in correctionlib and RunSpecializedJEC::find; a category key is the lower
+    # edge of its own interval
+    if run_edges:
+        representatives = [run_edges[0] - 1] + run_edges
+    else:
+        representatives = [0]
+
+    def dropRun(entry):
+        entry = dict(entry)
+        entry["inputs"] = [v for v in entry["inputs"] if v["name"] != run_input]
+        return entry
+
+    specialized_sets = []
+    for run in representatives:
+        try:
+            specialized_stack = []
+            for correction in stack:
+                if run_input in [v["name"] for v in correction["inputs"]]:
+                    correction = dropRun(correction)
+                    correction["data"] = _specializeNode(
+                        correction["data"], correction, run_input, run
+                    )
+                specialized_stack.append(correction)
+        except ValueError:
+            specialized_sets.append("")
+            continue
+        specialized_set = {
+            "schema_version": payload["schema_version"],
+            "corrections": specialized_stack,
+            "compound_corrections": [dropRun(compound)],
+        }
+        specialized_sets.append(json.dumps(specialized_set))
+    return run_edges, specialized_sets
+
+
+def _sampleValues(nodes, variable, n_values=4):
+    """A few values of an input spread over its bins in nodes, to compare two corrections."""
+    edges = set()
+    _collectEdges(nodes, variable["name"], edges)
+    if variable["type"] == "string":
+        values = sorted(e for e in edges if isinstance(e, str))
+    else:
+        edges = sorted(e for e in edges if not isinstance(e, str))
+        if variable["type"] == "int":
+            values = [math.ceil(a) for a in edges[:-1]]
+        else:
+            values = [0.5 * (a + b) for a, b in zip(edges[:-1], edges[1:])]
+        if not values:
+            values = [0] if variable["type"] == "int" else [10.0, 100.0]
+    if len(values) <= n_values:
+        return values
+    return [
+        values[round(k * (len(values) - 1) / (n_values - 1))] for k in range(n_values)
+    ]
+
+
+def _runsInInterval(run_edges, interval):
+    """First and last run of an interval of the run edges, as RunSpecializedJEC::find assigns them."""
+    if not run_edges:
+        return [1]
+    if interval == 0:
+        first, last = math.ceil(run_edges[0]) - 1, math.ceil(run_edges[0]) - 1
+    elif interval == len(run_edges):
+        first, last = math.ceil(run_edges[-1]), math.ceil(run_edges[-1])
+    else:
+        first = math.ceil(run_edges[interval - 1])
+        last = math.ceil(run_edges[interval]) - 1
+    return sorted(set(run for run in [first, last] if 0 <= run and first <= last))
+
+
+def validateRunSpecialization(
+    json_file, compound_name, run_edges, specialized_sets, run_input="run"
+):
+    """Compares the run-free compound correction of each interval with the original one, for the first and last
+    runs of the interval and a few values of the other inputs; raises RunSpecializationError if any differ.
+    """
+    import correctionlib
+    from .tabulated import loadPayload, _loadCorrectionSet
+
+    payload = loadPayload(json_file)
+    compound = next(
+        c for c in payload["compound_corrections"] if c["name"] == compound_name
+    )
+    nodes = [
+        c["data"] for c in payload["corrections"] if c["name"] in compound["stack"]
+    ]
+    inputs = [v for v in compound["inputs"] if v["name"] != run_input]
+    run_idx = [v["name"] for v in compound["inputs"]].index(run_input)
+    run_type = float if compound["inputs"][run_idx]["type"] == "real" else int
+    samples = list(itertools.product(*[_sampleValues(nodes, v) for v in inputs]))
+    original = _loadCorrectionSet(json_file).compound[compound_name]
+
+    def evaluate(corr, args):
+        try:
+            return corr.evaluate(*args)
+        except Exception:
+            return None
+
+    for interval, specialized_set in enumerate(specialized_sets):
+        if not specialized_set:
+            continue  # the generic correction is used
+        specialized = correctionlib.CorrectionSet.from_string(specialized_set).compound[
+            compound_name
+        ]
+        for run in _runsInInterval(run_edges, interval):
+            for args in samples:
+                expected = evaluate(
+                    original,
+                    list(args[:run_idx]) + [run_type(run)] + list(args[run_idx:]),
+                )
+                value = evaluate(specialized, list(args))
+                if (expected is None) != (value is None) or (
+                    expected is not None
+                    and not math.isclose(value, expected, rel_tol=1e-6, abs_tol=1e-9)
+                ):
+                    raise RunSpecializationError(
+                        f"{compound_name}: the specialization for run {run} gives {value} instead of {expected} "
+                        f"for {dict(zip([v['name'] for v in inputs], args))}"
+                    )
+
+
 directories_JER = {
     "2018_UL": "Summer19UL18_JRV2",
     "2017_UL": "Summer19UL17_JRV2",
@@ -276,13 +578,32 @@ class JetCorrProducer:
     # Sources = []
     period = None
 
+    @staticmethod
+    def payloadFiles(period):
+        """correctionlib payloads of the jets, the JER smearing and the fat jets."""
+        jet_path = JetCorrProducer.jet_jsonPath.format(pog_folder_names["JERC"][period])
+        fatjet_path = JetCorrProducer.fatjet_jsonPath.format(
+            pog_folder_names["JERC"][period]
+        )
+        return [
+            os.path.join(os.environ["ANALYSIS_PATH"], path)
+            for path in [jet_path, JetCorrProducer.jersmear_jsonPath, fatjet_path]
+        ]
+
     def __init__(
-        self, period, isData, sample_name, use_corrlib=True, use_regrouped=False
+        self,
+        period,
+        isData,
+        sample_name,
+        use_corrlib=True,
+        use_regrouped=False,
+        use_tabulated=False,
     ):
         self.isData = isData
         self.sample_name = sample_name
         self.use_regrouped = use_regrouped
         self.use_corrlib = use_corrlib
+        self.use_tabulated = use_tabulated
         self.uncSources_toUse = []
         if self.use_regrouped:
             self.uncSources_toUse = JetCorrProducer.uncSources_regrouped
@@ -308,14 +629,13 @@ class JetCorrProducer:
                 ROOT.gSystem.Load("libCondFormatsJetMETObjects.so")
                 ROOT.gSystem.Load("libCommonToolsUtils.so")
                 headers_dir = os.path.dirname(os.path.abspath(__file__))
-                header_path = os.path.join(headers_dir, "jet.h")
                 JME_calc_base = os.path.join(headers_dir, "JMECalculatorBase.cc")
                 JME_calc_path = os.path.join(
                     headers_dir, "JMESystematicsCalculators.cc"
                 )
                 ROOT.gInterpreter.Declare(f'#include "{JME_calc_base}"')
                 ROOT.gInterpreter.Declare(f'#include "{JME_calc_path}"')
-                ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+                loadHeader("jet.h")
 
                 ROOT.gInterpreter.ProcessLine(
                     f"""::correction::JetCorrProvider::Initialize("{ptResolution}", "{ptResolutionSF}","{JEC_Regrouped}", "{periods[period]}")"""
@@ -325,12 +645,9 @@ class JetCorrProducer:
         else:
             print("Initializing new JetCorrProducer")
 
-            jet_path = JetCorrProducer.jet_jsonPath.format(
-                pog_folder_names["JERC"][period]
+            jet_jsonFile, jetsmear_jsonFile, fatjet_jsonFile = (
+                JetCorrProducer.payloadFiles(period)
             )
-            jet_jsonFile = os.path.join(os.environ["ANALYSIS_PATH"], jet_path)
-            jersmear_path = JetCorrProducer.jersmear_jsonPath
-            jetsmear_jsonFile = os.path.join(os.environ["ANALYSIS_PATH"], jersmear_path)
             year = period.split("_")[0]
             jec_tag_map = (
                 JetCorrProducer.jec_tag_map_data
@@ -344,10 +661,6 @@ class JetCorrProducer:
                 jec_tag_array[1] if len(jec_tag_array) > 1 else jec_tag_array[0]
             )
             # print(f"jec_tag is {jec_tag}")
-            fatjet_path = JetCorrProducer.fatjet_jsonPath.format(
-                pog_folder_names["JERC"][period]
-            )
-            fatjet_jsonFile = os.path.join(os.environ["ANALYSIS_PATH"], fatjet_path)
             fatjec_tag_map = (
                 JetCorrProducer.fatjec_tag_map_data
                 if self.isData
@@ -423,12 +736,23 @@ class JetCorrProducer:
             fatalgo = JetCorrProducer.fatjet_algorithm
 
             if not JetCorrProducer.initialized:
-                headers_dir = os.path.dirname(os.path.abspath(__file__))
-                header_path = os.path.join(headers_dir, "jet.h")
-                ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+                loadHeader("jet.h")
                 is_data = "true" if self.isData else "false"
                 regrouped = "true" if self.use_regrouped else "false"
                 apply_compound = "true"
+                tabulated = "false"
+                if self.use_tabulated and not self.isData:
+                    self.registerTabulatedCorrections(
+                        [
+                            (jet_jsonFile, jec_tag, jer_tag, algo),
+                            # AK8 JES uncertainties are named after the AK4 jec tag, as in JetCorrectionProvider
+                            (fatjet_jsonFile, jec_tag, fatjer_tag, fatalgo),
+                        ],
+                        year,
+                    )
+                    tabulated = "true"
+                if self.isData:
+                    self.registerRunSpecializedJEC(jet_jsonFile, other_jec_tag, algo)
                 ROOT.gInterpreter.ProcessLine(
                     f"""::correction::JetCorrectionProvider::Initialize("{jet_jsonFile}",
                                                                                                   "{jetsmear_jsonFile}",
@@ -444,17 +768,97 @@ class JetCorrProducer:
                                                                                                   "{year}",
                                                                                                    {is_data},
                                                                                                    {regrouped},
-                                                                                                   {apply_compound})"""
+                                                                                                   {apply_compound},
+                                                                                                   {tabulated})"""
                 )
                 JetCorrProducer.initialized = True
 
+    def registerTabulatedCorrections(self, payloads, year):
+        from .tabulated import registerTabulatedCorrection
+
+        for json_file, jec_tag, jer_tag, algo in payloads:
+            names = ROOT.correction.JetCorrectionProvider.tabulatedCorrectionNames(
+                jec_tag, jer_tag, algo, year, self.use_regrouped
+            )
+            for name in names:
+                try:
+                    registerTabulatedCorrection(json_file, str(name))
+                except RuntimeError as e:
+                    # the provider refuses the tabulated mode if any grid is missing
+                    print(f"JetCorrProducer: {e}")
+
+    def registerRunSpecializedJEC(self, json_file, jec_tag, algo):
+        cmpd_name = f"{jec_tag}_L1L2L3Res_{algo}"
+        try:
+            run_edges, corrset_jsons = specializeRunDependentJEC(json_file, cmpd_name)
+            validateRunSpecialization(json_file, cmpd_name, run_edges, corrset_jsons)
+        except RunSpecializationError as e:
+            print(f"JetCorrProducer: no run specialization, {e}")
+            return
+        ROOT.correction.JetCorrectionProvider.registerRunSpecializedJEC(
+            cmpd_name,
+            f"{jec_tag}_L2L3Residual_{algo}",
+            ROOT.std.vector["double"](run_edges),
+            ROOT.std.vector["std::string"](corrset_jsons),
+        )
+
     def getP4Variations(
-        self, df, source_dict, apply_JER, apply_JES, apply_forward_jet_horns_fix_=False
+        self,
+        df,
+        source_dict,
+        apply_JER,
+        apply_JES,
+        apply_forward_jet_horns_fix_=False,
+        lazy_variations=False,
+        consumed_systematics=None,
+        compact_variations=False,
+        columns=None,
     ):
+        """Defines {Jet,FatJet}_p4_{syst} (and _delta) for the central value and the JES/JER variations.
+
+        consumed_systematics restricts the variations to the listed sources (e.g. ["JER", "JES_Total"]), all
+        sources are defined if it is None. With lazy_variations, each variation column is evaluated on its own
+        from the nominal JEC + JER stage, so that the variations that are not read downstream are not computed.
+        With compact_variations, the variations are stored as {Jet,FatJet}_ptScale_{syst} (one float per jet,
+        relative to {Jet,FatJet}_p4_Central) and the p4 and _delta columns are computed from them on demand.
+
+        columns is the DefinedColumns tracker of df, if the caller keeps one.
+        """
+        if columns is None:
+            columns = DefinedColumns(df)
         class_name = ""
         apply_forward_jet_horns_fix = (
             "true" if apply_forward_jet_horns_fix_ else "false"
         )
+
+        apply_jer_list = []
+        if apply_JER:
+            apply_jer_list.append("JER")
+        apply_jes_list = self.uncSources_toUse if apply_JES else []
+        # central variable is imported from CorrectionsCore.py, where it is defined
+        variations = []
+        for source in [central] + apply_jes_list + apply_jer_list:
+            source_eff = source
+            if source in apply_jes_list:  # source!=central and source != "JER":
+                source_eff = "JES_" + source_eff
+            if source.endswith("_"):
+                source_eff = source_eff + JetCorrProducer.period.split("_")[0]
+                source += "year"
+            if (
+                source != central
+                and consumed_systematics is not None
+                and source_eff not in consumed_systematics
+            ):
+                continue
+            variations.append((source, source_eff))
+
+        if (lazy_variations or compact_variations) and not self.use_corrlib:
+            print(
+                "JetCorrProducer: lazy and compact variations require correctionlib, computing all variations"
+            )
+            lazy_variations = False
+            compact_variations = False
+
         if self.use_corrlib:
             apply_jer = "true" if apply_JER and not self.isData else "false"
             reapply_jec = "true"  # by the time being
@@ -469,34 +873,84 @@ class JetCorrProducer:
                 or (self.period == "2024_Summer24" or self.period == "2025_Summer24")
                 else "false"
             )
-            if not self.isData:
-                df = df.Define(
-                    "Jet_p4_shifted_map",
-                    f"""::correction::JetCorrectionProvider::getGlobal().getShiftedP4_Jet(Jet_pt, Jet_eta, Jet_phi, Jet_mass,
+            class_name = "JetCorrectionProvider"
+            if lazy_variations or compact_variations:
+                want_jer_variations = (
+                    "true"
+                    if any(source == "JER" for source, _ in variations)
+                    else "false"
+                )
+                gen_args = {
+                    "Jet": ", GenJet_pt, GenJet_eta, GenJet_phi, Jet_genJetIdx",
+                    "FatJet": ", GenJetAK8_pt, GenJetAK8_eta, GenJetAK8_phi, FatJet_genJetAK8Idx",
+                }
+                for obj in ["Jet", "FatJet"]:
+                    df = columns.Define(
+                        df,
+                        f"{obj}_p4_nominal_stage",
+                        f"""::correction::JetCorrectionProvider::getGlobal().getNominalStage_{obj}({obj}_pt, {obj}_eta, {obj}_phi, {obj}_mass,
+                                                                                                                       {obj}_rawFactor, {obj}_area, Rho_fixedGridRhoFastjetAll, event, {apply_jer},
+                                                                                                                       {reapply_jec}, {require_run_number}, run, {wantPhi}, {apply_forward_jet_horns_fix},
+                                                                                                                       {want_jer_variations}{gen_args[obj] if not self.isData else ""})""",
+                    )
+                shifted_p4_expr = "::correction::{class_name}::getGlobal().getVariedP4_{obj}({obj}_p4_nominal_stage, {obj}_eta, {obj}_phi, ::correction::{class_name}::UncSource::{source}, ::correction::UncScale::{scale})"
+                if compact_variations:
+                    for obj in ["Jet", "FatJet"]:
+                        df = columns.Define(
+                            df,
+                            f"{obj}_p4_{central}",
+                            shifted_p4_expr.format(
+                                obj=obj,
+                                class_name=class_name,
+                                source=central,
+                                scale=central,
+                            ),
+                        )
+                        if not lazy_variations:
+                            df = columns.Define(
+                                df,
+                                f"{obj}_ptScale_shifted_map",
+                                f"::correction::JetCorrectionProvider::getGlobal().getShiftedScales_{obj}({obj}_p4_nominal_stage, {obj}_eta)",
+                            )
+                    if lazy_variations:
+                        pt_scale_expr = "::correction::{class_name}::getGlobal().getVariedPtScale_{obj}({obj}_p4_nominal_stage, {obj}_eta, ::correction::{class_name}::UncSource::{source}, ::correction::UncScale::{scale})"
+                    else:
+                        pt_scale_expr = "{obj}_ptScale_shifted_map.view(::correction::{class_name}::UncSource::{source}, ::correction::UncScale::{scale})"
+            else:
+                if not self.isData:
+                    df = columns.Define(
+                        df,
+                        "Jet_p4_shifted_map",
+                        f"""::correction::JetCorrectionProvider::getGlobal().getShiftedP4_Jet(Jet_pt, Jet_eta, Jet_phi, Jet_mass,
                                                                                                                        Jet_rawFactor, Jet_area, Rho_fixedGridRhoFastjetAll, event, {apply_jer},
                                                                                                                        {reapply_jec}, {require_run_number}, run, {wantPhi}, {apply_forward_jet_horns_fix},
-                                                                                                                       GenJet_pt, Jet_genJetIdx)""",
-                )
+                                                                                                                       GenJet_pt, GenJet_eta, GenJet_phi, Jet_genJetIdx)""",
+                    )
 
-                df = df.Define(
-                    "FatJet_p4_shifted_map",
-                    f"""::correction::JetCorrectionProvider::getGlobal().getShiftedP4_FatJet(FatJet_pt, FatJet_eta, FatJet_phi, FatJet_mass,
+                    df = columns.Define(
+                        df,
+                        "FatJet_p4_shifted_map",
+                        f"""::correction::JetCorrectionProvider::getGlobal().getShiftedP4_FatJet(FatJet_pt, FatJet_eta, FatJet_phi, FatJet_mass,
                                                                                                                        FatJet_rawFactor, FatJet_area, Rho_fixedGridRhoFastjetAll, event, {apply_jer},
                                                                                                                        {reapply_jec}, {require_run_number}, run, {wantPhi}, {apply_forward_jet_horns_fix},
-                                                                                                                       GenJetAK8_pt, FatJet_genJetAK8Idx)""",
-                )
-            else:
-                df = df.Define(
-                    "Jet_p4_shifted_map",
-                    f"""::correction::JetCorrectionProvider::getGlobal().getShiftedP4_Jet(Jet_pt, Jet_eta, Jet_phi, Jet_mass, Jet_rawFactor, Jet_area, Rho_fixedGridRhoFastjetAll, event, {apply_jer}, {reapply_jec}, {require_run_number}, run, {wantPhi}, {apply_forward_jet_horns_fix})""",
-                )
-                df = df.Define(
-                    "FatJet_p4_shifted_map",
-                    f"""::correction::JetCorrectionProvider::getGlobal().getShiftedP4_FatJet(FatJet_pt, FatJet_eta, FatJet_phi, FatJet_mass, FatJet_rawFactor, FatJet_area, Rho_fixedGridRhoFastjetAll, event, {apply_jer}, {reapply_jec}, {require_run_number}, run, {wantPhi}, {apply_forward_jet_horns_fix})""",
-                )
-            class_name = "JetCorrectionProvider"
+                                                                                                                       GenJetAK8_pt, GenJetAK8_eta, GenJetAK8_phi, FatJet_genJetAK8Idx)""",
+                    )
+                else:
+                    df = columns.Define(
+                        df,
+                        "Jet_p4_shifted_map",
+                        f"""::correction::JetCorrectionProvider::getGlobal().getShiftedP4_Jet(Jet_pt, Jet_eta, Jet_phi, Jet_mass, Jet_rawFactor, Jet_area, Rho_fixedGridRhoFastjetAll, event, {apply_jer}, {reapply_jec}, {require_run_number}, run, {wantPhi}, {apply_forward_jet_horns_fix})""",
+                    )
+                    df = columns.Define(
+                        df,
+                        "FatJet_p4_shifted_map",
+                        f"""::correction::JetCorrectionProvider::getGlobal().getShiftedP4_FatJet(FatJet_pt, FatJet_eta, FatJet_phi, FatJet_mass, FatJet_rawFactor, FatJet_area, Rho_fixedGridRhoFastjetAll, event, {apply_jer}, {reapply_jec}, {require_run_number}, run, {wantPhi}, {apply_forward_jet_horns_fix})""",
+                    )
+                # zero-copy views on the flat variation tensor
+                shifted_p4_expr = "{obj}_p4_shifted_map.view(::correction::{class_name}::UncSource::{source}, ::correction::UncScale::{scale})"
         else:
-            df = df.Define(
+            df = columns.Define(
+                df,
                 "Jet_p4_shifted_map",
                 f"""::correction::JetCorrProvider::getGlobal().getShiftedP4(
                             Jet_pt, Jet_eta, Jet_phi, Jet_mass, Jet_rawFactor, Jet_area,
@@ -504,38 +958,52 @@ class JetCorrProducer:
                             GenJet_phi, GenJet_mass, event)""",
             )
             class_name = "JetCorrProvider"
+            shifted_p4_expr = "{obj}_p4_shifted_map.at({{::correction::{class_name}::UncSource::{source}, ::correction::UncScale::{scale}}})"
 
-        apply_jer_list = []
-        if apply_JER:
-            apply_jer_list.append("JER")
-        apply_jes_list = self.uncSources_toUse if apply_JES else []
-        # central variable is imported from CorrectionsCore.py, where it is defined
-        for source in [central] + apply_jes_list + apply_jer_list:
-            source_eff = source
-            if source in apply_jes_list:  # source!=central and source != "JER":
-                source_eff = "JES_" + source_eff
-            if source.endswith("_"):
-                source_eff = source_eff + JetCorrProducer.period.split("_")[0]
-                source += "year"
+        for source, source_eff in variations:
             updateSourceDict(source_dict, source_eff, "Jet")
             updateSourceDict(source_dict, source_eff, "FatJet")
             for scale in getScales(source):
                 syst_name = getSystName(source_eff, scale)
-                df = df.Define(
-                    f"Jet_p4_{syst_name}",
-                    f"Jet_p4_shifted_map.at({{::correction::{class_name}::UncSource::{source}, ::correction::UncScale::{scale}}})",
-                )
-                df = df.Define(
-                    f"Jet_p4_{syst_name}_delta", f"Jet_p4_{syst_name} - Jet_p4_{nano}"
-                )
-                df = df.Define(
-                    f"FatJet_p4_{syst_name}",
-                    f"FatJet_p4_shifted_map.at({{::correction::{class_name}::UncSource::{source}, ::correction::UncScale::{scale}}})",
-                )
-                df = df.Define(
-                    f"FatJet_p4_{syst_name}_delta",
-                    f"FatJet_p4_{syst_name} - FatJet_p4_{nano}",
-                )
+                for obj in ["Jet", "FatJet"]:
+                    if compact_variations and source != central:
+                        df = columns.Define(
+                            df,
+                            f"{obj}_ptScale_{syst_name}",
+                            pt_scale_expr.format(
+                                obj=obj,
+                                class_name=class_name,
+                                source=source,
+                                scale=scale,
+                            ),
+                        )
+                        df = columns.Define(
+                            df,
+                            f"{obj}_p4_{syst_name}",
+                            f"::correction::JetCorrectionProvider::scaleP4({obj}_p4_{central}, {obj}_ptScale_{syst_name})",
+                        )
+                        df = columns.Define(
+                            df,
+                            f"{obj}_p4_{syst_name}_delta",
+                            f"::correction::JetCorrectionProvider::scaleP4Delta({obj}_p4_{central}, {obj}_ptScale_{syst_name}, {obj}_p4_{nano})",
+                        )
+                        continue
+                    if not (compact_variations and source == central):
+                        df = columns.Define(
+                            df,
+                            f"{obj}_p4_{syst_name}",
+                            shifted_p4_expr.format(
+                                obj=obj,
+                                class_name=class_name,
+                                source=source,
+                                scale=scale,
+                            ),
+                        )
+                    df = columns.Define(
+                        df,
+                        f"{obj}_p4_{syst_name}_delta",
+                        f"{obj}_p4_{syst_name} - {obj}_p4_{nano}",
+                    )
 
         return df, source_dict
 
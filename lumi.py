@@ -1,5 +1,5 @@
-import ROOT
 import os
+from .CorrectionsCore import ROOT, loadHeader
 
 
 class LumiFilter:
@@ -7,10 +7,7 @@ class LumiFilter:
 
     def __init__(self, lumi_json_file):
         if not LumiFilter.initialized:
-            lumi_filter_header = os.path.join(
-                os.path.dirname(os.path.abspath(__file__)), "lumi.h"
-            )
-            ROOT.gInterpreter.Declare(f'#include "{lumi_filter_header}"')
+            loadHeader("lumi.h")
             ROOT.gInterpreter.ProcessLine(
                 f'LumiFilter::Initialize("{lumi_json_file}");'
             )
@@ -35,4 +35,58 @@ namespace correction {
         return LorentzVectorM(met_p4_shifted.pt(), 0., met_p4_shifted.phi(), 0.);
     }
 
+    // Variations of one object collection that enter the MET: the nominal p4 and, for each systematic, the varied
+    // p4 (nullptr if the collection is not affected by that systematic). Only pointers to the columns are held.
+    struct MetObjectVariations {
+        const RVecLV* nominal;
+        std::vector<const RVecLV*> varied;
+    };
+
+    // All MET variations of an event, computed by a single pass over the objects of each collection.
+    // The shifts are accumulated in px/py directly from the varied and nominal p4, and each systematic is
+    // turned into a LorentzVectorM only when it is read.
+    class MetVariations {
+      public:
+        static MetVariations Compute(const LorentzVectorM& met_p4,
+                                     size_t n_systs,
+                                     const std::vector<MetObjectVariations>& collections) {
+            MetVariations result;
+            result.px_.assign(n_systs, met_p4.px());
+            result.py_.assign(n_systs, met_p4.py());
+            for (const auto& collection : collections) {
+                if (collection.varied.size() != n_systs)
+                    throw std::runtime_error("MetVariations: expected one varied collection per systematic.");
+                const RVecLV& nominal = *collection.nominal;
+                for (size_t obj_idx = 0; obj_idx < nominal.size(); ++obj_idx) {
+                    const double px = nominal[obj_idx].px();
+                    const double py = nominal[obj_idx].py();
+                    for (size_t syst_idx = 0; syst_idx < n_systs; ++syst_idx) {
+                        const RVecLV* varied = collection.varied[syst_idx];
+                        if (!varied)
+                            continue;
+                        const LorentzVectorM& varied_p4 = (*varied)[obj_idx];
+                        result.px_[syst_idx] -= varied_p4.px() - px;
+                        result.py_[syst_idx] -= varied_p4.py() - py;
+                    }
+                }
+            }
+            return result;
+        }
+
+        size_t size() const { return px_.size(); }
+
+        LorentzVectorM p4(size_t syst_idx) const {
+            const double px = px_.at(syst_idx);
+            const double py = py_.at(syst_idx);
+            return LorentzVectorM(std::hypot(px, py), 0., std::atan2(py, px), 0.);
+        }
+
+        LorentzVectorM delta(size_t syst_idx, const LorentzVectorM& reference_p4) const {
+            return p4(syst_idx) - reference_p4;
+        }
+
+      private:
+        std::vector<double> px_, py_;
+    };
+
 }  // namespace correction
\ No newline at end of file
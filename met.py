@@ -1,6 +1,5 @@
 import copy
 import os
-import ROOT
 from .CorrectionsCore import *
 
 
@@ -9,32 +8,72 @@ class METCorrProducer:
 
     def __init__(self):
         if not METCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "met.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("met.h")
             METCorrProducer.initialized = True
 
-    def getMET(self, df, source_dict, MET_type):
+    def getMET(self, df, source_dict, MET_type, fused=True, columns=None):
+        """Defines {MET_type}_p4_{syst} (and _delta) by propagating the object variations to the MET.
+
+        With fused, all the MET variations are computed by a single MetVariations column that reads the object
+        variations once, and the per-systematic MET columns are accessors on it. Otherwise, each MET variation is
+        computed by its own ShiftMet call, which only evaluates the object variations of that systematic.
+
+        columns is the DefinedColumns tracker of df, if the caller keeps one.
+        """
+        if columns is None:
+            columns = DefinedColumns(df)
         MET_objs = {"Electron", "Muon", "Tau", "Jet"}
         source_dict_upd = copy.deepcopy(source_dict)
+        systs = []
         for source, all_source_objs in source_dict.items():
             source_objs = set(all_source_objs).intersection(MET_objs)
             if source == central or len(source_objs) > 0:
                 updateSourceDict(source_dict_upd, source, "MET")
                 for scale in getScales(source):
-                    syst_name = getSystName(source, scale)
-                    p4_delta_list = [
-                        f"{obj}_p4_{syst_name}_delta" for obj in source_objs
-                    ]
-                    p4_delta_str = ", ".join(p4_delta_list)
-
-                    df = df.Define(
-                        f"{MET_type}_p4_{syst_name}",
-                        f"::correction::ShiftMet({MET_type}_p4_{nano}, {{ {p4_delta_str} }}, false)",
-                    )
-                    df = df.Define(
-                        f"{MET_type}_p4_{syst_name}_delta",
-                        f"{MET_type}_p4_{syst_name} - {MET_type}_p4_{nano}",
-                    )
+                    systs.append((getSystName(source, scale), sorted(source_objs)))
+
+        if fused:
+            collections = sorted(set(obj for _, objs in systs for obj in objs))
+            collections_str = ", ".join(
+                f"{{ &{obj}_p4_{nano}, {{ "
+                + ", ".join(
+                    f"&{obj}_p4_{syst_name}" if obj in objs else "nullptr"
+                    for syst_name, objs in systs
+                )
+                + " } }"
+                for obj in collections
+            )
+            df = columns.Define(
+                df,
+                f"{MET_type}_p4_shifted_map",
+                f"::correction::MetVariations::Compute({MET_type}_p4_{nano}, {len(systs)}, {{ {collections_str} }})",
+            )
+
+        for syst_idx, (syst_name, source_objs) in enumerate(systs):
+            if fused:
+                df = columns.Define(
+                    df,
+                    f"{MET_type}_p4_{syst_name}",
+                    f"{MET_type}_p4_shifted_map.p4({syst_idx})",
+                )
+                df = columns.Define(
+                    df,
+                    f"{MET_type}_p4_{syst_name}_delta",
+                    f"{MET_type}_p4_shifted_map.delta({syst_idx}, {MET_type}_p4_{nano})",
+                )
+                continue
+            p4_delta_list = [f"{obj}_p4_{syst_name}_delta" for obj in source_objs]
+            p4_delta_str = ", ".join(p4_delta_list)
+
+            df = columns.Define(
+                df,
+                f"{MET_type}_p4_{syst_name}",
+                f"::correction::ShiftMet({MET_type}_p4_{nano}, {{ {p4_delta_str} }}, false)",
+            )
+            df = columns.Define(
+                df,
+                f"{MET_type}_p4_{syst_name}_delta",
+                f"{MET_type}_p4_{syst_name} - {MET_type}_p4_{nano}",
+            )
 
         return df, source_dict_upd
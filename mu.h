@@ -223,8 +223,11 @@ namespace correction {
         // 3. Consider propagating any changes also to the soft and high-pT muons.
         // 4. Review the map between corrections_ and the actual evaluation to clarify its purpose.
 
-        MuCorrProvider(const std::string& fileName, const std::string& era)
-            : corrections_(CorrectionSet::from_file(fileName)) {
+        // used_sources: names of the corrections evaluated by getMuonSF; if empty, all the corrections of the file.
+        MuCorrProvider(const std::string& fileName,
+                       const std::string& era,
+                       const std::vector<std::string>& used_sources = {})
+            : corrections_(fileName) {
             /*
         Eventually we want to switch this interface with a map and a loop
         map < era -> set<string>
@@ -237,39 +240,48 @@ namespace correction {
         */
 
             if (era == "Run2_2016" || era == "Run2_2016_HIPM" || era == "Run2_2017" || era == "Run2_2018") {
-                muIDCorrections["NUM_TrackerMuons_DEN_genTracks"] = corrections_->at("NUM_TrackerMuons_DEN_genTracks");
-                muIDCorrections["NUM_TightID_DEN_TrackerMuons"] = corrections_->at("NUM_TightID_DEN_TrackerMuons");
-                muIDCorrections["NUM_TightID_DEN_genTracks"] = corrections_->at("NUM_TightID_DEN_genTracks");
-                muIDCorrections["NUM_HighPtID_DEN_TrackerMuons"] = corrections_->at("NUM_HighPtID_DEN_TrackerMuons");
-                muIDCorrections["NUM_HighPtID_DEN_genTracks"] = corrections_->at("NUM_HighPtID_DEN_genTracks");
+                muIDCorrections["NUM_TrackerMuons_DEN_genTracks"] = corrections_.at("NUM_TrackerMuons_DEN_genTracks");
+                muIDCorrections["NUM_TightID_DEN_TrackerMuons"] = corrections_.at("NUM_TightID_DEN_TrackerMuons");
+                muIDCorrections["NUM_TightID_DEN_genTracks"] = corrections_.at("NUM_TightID_DEN_genTracks");
+                muIDCorrections["NUM_HighPtID_DEN_TrackerMuons"] = corrections_.at("NUM_HighPtID_DEN_TrackerMuons");
+                muIDCorrections["NUM_HighPtID_DEN_genTracks"] = corrections_.at("NUM_HighPtID_DEN_genTracks");
                 muIDCorrections["NUM_TightRelIso_DEN_TightIDandIPCut"] =
-                    corrections_->at("NUM_TightRelIso_DEN_TightIDandIPCut");
+                    corrections_.at("NUM_TightRelIso_DEN_TightIDandIPCut");
                 muIDCorrections["NUM_TightRelTkIso_DEN_TrkHighPtIDandIPCut"] =
-                    corrections_->at("NUM_TightRelTkIso_DEN_TrkHighPtIDandIPCut");
+                    corrections_.at("NUM_TightRelTkIso_DEN_TrkHighPtIDandIPCut");
             }
             if (era == "Run2_2018") {
                 muIDCorrections["NUM_IsoMu24_DEN_CutBasedIdTight_and_PFIsoTight"] =
-                    corrections_->at("NUM_IsoMu24_DEN_CutBasedIdTight_and_PFIsoTight");
+                    corrections_.at("NUM_IsoMu24_DEN_CutBasedIdTight_and_PFIsoTight");
             }
             if (era == "Run2_2017") {
                 muIDCorrections["NUM_IsoMu27_DEN_CutBasedIdTight_and_PFIsoTight"] =
-                    corrections_->at("NUM_IsoMu27_DEN_CutBasedIdTight_and_PFIsoTight");
+                    corrections_.at("NUM_IsoMu27_DEN_CutBasedIdTight_and_PFIsoTight");
             }
             if ((era == "Run2_2016_HIPM") || (era == "Run2_2016")) {
                 muIDCorrections["NUM_IsoMu24_or_IsoTkMu24_DEN_CutBasedIdTight_and_PFIsoTight"] =
-                    corrections_->at("NUM_IsoMu24_or_IsoTkMu24_DEN_CutBasedIdTight_and_PFIsoTight");
+                    corrections_.at("NUM_IsoMu24_or_IsoTkMu24_DEN_CutBasedIdTight_and_PFIsoTight");
             }
             if (era == "Run3_2022" || era == "Run3_2022EE" || era == "Run3_2023" || era == "Run3_2023BPix") {
-                muIDCorrections["NUM_TightID_DEN_TrackerMuons"] = corrections_->at("NUM_TightID_DEN_TrackerMuons");
-                muIDCorrections["NUM_LoosePFIso_DEN_TightID"] = corrections_->at("NUM_LoosePFIso_DEN_TightID");
+                muIDCorrections["NUM_TightID_DEN_TrackerMuons"] = corrections_.at("NUM_TightID_DEN_TrackerMuons");
+                muIDCorrections["NUM_LoosePFIso_DEN_TightID"] = corrections_.at("NUM_LoosePFIso_DEN_TightID");
                 muIDCorrections["NUM_IsoMu24_DEN_CutBasedIdTight_and_PFIsoTight"] =
-                    corrections_->at("NUM_IsoMu24_DEN_CutBasedIdTight_and_PFIsoTight");
+                    corrections_.at("NUM_IsoMu24_DEN_CutBasedIdTight_and_PFIsoTight");
 
-                muIDCorrections["NUM_MediumID_DEN_TrackerMuons"] = corrections_->at("NUM_MediumID_DEN_TrackerMuons");
-                muIDCorrections["NUM_LoosePFIso_DEN_MediumID"] = corrections_->at("NUM_LoosePFIso_DEN_MediumID");
+                muIDCorrections["NUM_MediumID_DEN_TrackerMuons"] = corrections_.at("NUM_MediumID_DEN_TrackerMuons");
+                muIDCorrections["NUM_LoosePFIso_DEN_MediumID"] = corrections_.at("NUM_LoosePFIso_DEN_MediumID");
                 muIDCorrections["NUM_IsoMu24_DEN_CutBasedIdMedium_and_PFIsoMedium"] =
-                    corrections_->at("NUM_IsoMu24_DEN_CutBasedIdMedium_and_PFIsoMedium");
+                    corrections_.at("NUM_IsoMu24_DEN_CutBasedIdMedium_and_PFIsoMedium");
             }
+            if (used_sources.empty()) {
+                for (const auto& [name, corr] : corrections_.set())
+                    sourceCorrections_[name] = corr;
+            }
+            for (const auto& name : used_sources) {
+                if (corrections_.contains(name))
+                    sourceCorrections_[name] = corrections_.at(name);
+            }
+            corrections_.release();
         }
         // float getMuonSFMedium(const LorentzVectorM & muon_p4, const float Muon_pfRelIso04_all, const bool Muon_MediumId, UncSource source, UncScale scale) const {
         //     const UncScale muID_scale = sourceAppliesMedium(source, Muon_pfRelIso04_all,  muon_p4.Pt(), Muon_MediumId) ? scale : UncScale::Central;
@@ -301,7 +313,7 @@ namespace correction {
             static const double pt_low = 15.0;
             const double muon_pt = std::max(pt_low, muon_p4.pt());
             const float corr_SF =
-                corrections_->at(getUncSourceName(source))->evaluate({abs(muon_p4.Eta()), muon_pt, scale_str});
+                sourceCorrections_.at(getUncSourceName(source))->evaluate({abs(muon_p4.Eta()), muon_pt, scale_str});
             return source == UncSource::Central ? 1. : corr_SF;
         }
         //Check range, but if it is out of range it is still valid and return 1.
@@ -449,8 +461,9 @@ namespace correction {
 
 
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        BoundCorrections corrections_;
         std::map<std::string, Correction::Ref> muIDCorrections;
+        std::map<std::string, Correction::Ref> sourceCorrections_;
     };
 
     class HighPtMuCorrProvider : public CorrectionsBase<HighPtMuCorrProvider> {
@@ -515,7 +528,7 @@ namespace correction {
             return false;
         }
 
-        HighPtMuCorrProvider(const std::string& fileName) : corrections_(CorrectionSet::from_file(fileName)) {
+        HighPtMuCorrProvider(const std::string& fileName) : corrections_(loadCorrectionSet(fileName)) {
             highPtmuCorrections["NUM_GlobalMuons_DEN_TrackerMuonProbes"] =
                 corrections_->at("NUM_GlobalMuons_DEN_TrackerMuonProbes");
             highPtmuCorrections["NUM_TightID_DEN_GlobalMuonProbes"] =
@@ -604,7 +617,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        std::shared_ptr<const CorrectionSet> corrections_;
         std::map<std::string, Correction::Ref> highPtmuCorrections;
     };
 
@@ -646,7 +659,7 @@ namespace correction {
             return false;
         }
 
-        LowPtMuCorrProvider(const std::string& fileName) : corrections_(CorrectionSet::from_file(fileName)) {
+        LowPtMuCorrProvider(const std::string& fileName) : corrections_(loadCorrectionSet(fileName)) {
             lowPtmuCorrections["NUM_TightID_DEN_TrackerMuons"] = corrections_->at("NUM_TightID_DEN_TrackerMuons");
             lowPtmuCorrections["NUM_MediumID_DEN_TrackerMuons"] = corrections_->at("NUM_MediumID_DEN_TrackerMuons");
         }
@@ -684,7 +697,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        std::shared_ptr<const CorrectionSet> corrections_;
         std::map<std::string, Correction::Ref> lowPtmuCorrections;
     };
 
@@ -1,5 +1,4 @@
 import os
-import ROOT
 from .CorrectionsCore import *
 
 # https://twiki.cern.ch/twiki/bin/viewauth/CMS/SWGuideMuonSelection
@@ -428,31 +427,44 @@ class MuCorrProducer:
         "looseId",
     ]
 
-    def __init__(self, *, era, columns):
+    @staticmethod
+    def payloadFiles(era):
+        """Payloads of the medium, high-pT and, if available, low-pT muon SFs."""
         period = period_names[era]
-        jsonFile_eff = os.path.join(
-            os.environ["ANALYSIS_PATH"],
-            MuCorrProducer.muIDEff_JsonPath.format(pog_folder_names["MUO"][period]),
-        )
-        jsonFile_eff_highPt = os.path.join(
-            os.environ["ANALYSIS_PATH"],
-            MuCorrProducer.HighPtmuIDEff_JsonPath.format(
-                pog_folder_names["MUO"][period]
-            ),
-        )
+        json_paths = [
+            MuCorrProducer.muIDEff_JsonPath,
+            MuCorrProducer.HighPtmuIDEff_JsonPath,
+        ]
         if era not in ("Run3_2025", "Run3_2026"):
-            jsonFile_eff_lowPt = os.path.join(
+            json_paths.append(MuCorrProducer.LowPtmuIDEff_JsonPath)
+        return [
+            os.path.join(
                 os.environ["ANALYSIS_PATH"],
-                MuCorrProducer.LowPtmuIDEff_JsonPath.format(
-                    pog_folder_names["MUO"][period]
-                ),
+                json_path.format(pog_folder_names["MUO"][period]),
             )
+            for json_path in json_paths
+        ]
+
+    def __init__(self, *, era, columns, used_subset=False):
+        period = period_names[era]
+        payload_files = MuCorrProducer.payloadFiles(era)
+        jsonFile_eff, jsonFile_eff_highPt = payload_files[:2]
+        if era not in ("Run3_2025", "Run3_2026"):
+            jsonFile_eff_lowPt = payload_files[2]
         if not MuCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "mu.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("mu.h")
+            used_sources = ""
+            if used_subset:
+                # bind only the corrections evaluated by getMuonIDSF
+                sources = (
+                    MuCorrProducer.MediumMuIDIso_SF_Sources[period]
+                    + MuCorrProducer.MediumMuReco_SF_sources[period]
+                )
+                used_sources = ", std::vector<std::string>{{{}}}".format(
+                    ", ".join(f'"{source}"' for source in sources)
+                )
             ROOT.gInterpreter.ProcessLine(
-                f'::correction::MuCorrProvider::Initialize("{jsonFile_eff}", "{era}")'
+                f'::correction::MuCorrProvider::Initialize("{jsonFile_eff}", "{era}"{used_sources})'
             )
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::HighPtMuCorrProvider::Initialize("{jsonFile_eff_highPt}")'
@@ -0,0 +1,147 @@
+import argparse
+import fnmatch
+import gzip
+import hashlib
+import json
+import os
+
+# Local cache of the correctionlib payloads (see CorrectionSetRegistry in corrections.h).
+# Each payload is stored uncompressed, keyed by the hash of its content, and optionally trimmed to the corrections
+# that match a list of patterns (plus the corrections that the kept compound corrections are built from).
+# The entry <hash of the original path>.ref maps the original file, identified by its size and modification time,
+# to its cached copy and the keep patterns of the copy; the providers read the copy instead of the original as long
+# as the original is unchanged, and the original if they need a correction that the copy does not keep.
+# The cache is used if $CORRECTIONS_PAYLOAD_CACHE points to it.
+#
+# Warm the cache for an era ahead of a production (the JME payloads are trimmed to the tags of the era):
+#   python -m Corrections.payload_cache warm --era Run3_2022 --cache-dir /tmp/corrections_payloads
+# or for given files:
+#   python -m Corrections.payload_cache warm --files btagging.json.gz --keep "deepJet_*"
+
+
+def cacheDir():
+    return os.environ.get("CORRECTIONS_PAYLOAD_CACHE", "")
+
+
+def pathHash(path):
+    """FNV-1a hash of the path, as CorrectionSetRegistry::pathHash."""
+    value = 14695981039346656037
+    for byte in path.encode():
+        value ^= byte
+        value = (value * 1099511628211) % (1 << 64)
+    return f"{value:016x}"
+
+
+def refPath(cache_dir, source):
+    return os.path.join(cache_dir, f"{pathHash(os.path.realpath(source))}.ref")
+
+
+def trimPayload(payload, keep):
+    """Keeps the corrections and compound corrections whose name matches one of the keep patterns."""
+
+    def kept(name):
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in keep)
+
+    compounds = [
+        c for c in payload.get("compound_corrections") or [] if kept(c["name"])
+    ]
+    needed = set(name for c in compounds for name in c["stack"])
+    trimmed = dict(payload)
+    trimmed["corrections"] = [
+        c for c in payload["corrections"] if kept(c["name"]) or c["name"] in needed
+    ]
+    if "compound_corrections" in payload:
+        trimmed["compound_corrections"] = compounds
+    return trimmed
+
+
+def _writeAtomic(path, content):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def warm(source, cache_dir, keep=None):
+    """Stores the cached copy of one payload and its .ref entry; returns the path of the copy.
+
+    The copies trimmed to different keep lists are stored side by side, and the .ref entry points to the last one.
+    """
+    source = os.path.realpath(source)
+    with open(source, "rb") as f:
+        raw = f.read()
+    stat = os.stat(source)
+    content_hash = hashlib.sha256(raw).hexdigest()[:32]
+    payload_name = content_hash
+    if keep:
+        keep_hash = hashlib.sha256("\n".join(sorted(keep)).encode()).hexdigest()[:8]
+        payload_name += f"-{keep_hash}"
+    payload_name += ".json"
+
+    os.makedirs(cache_dir, exist_ok=True)
+    payload_path = os.path.join(cache_dir, payload_name)
+    if not os.path.exists(payload_path):
+        text = gzip.decompress(raw) if source.endswith(".gz") else raw
+        payload = json.loads(text)
+        if keep:
+            payload = trimPayload(payload, keep)
+        _writeAtomic(payload_path, json.dumps(payload, separators=(",", ":")))
+    _writeAtomic(
+        refPath(cache_dir, source),
+        f"{source}\n{stat.st_size} {stat.st_mtime_ns}\n{payload_name}\n{' '.join(sorted(keep or []))}\n",
+    )
+    return payload_path
+
+
+def payloadsForEra(era):
+    """Returns {payload file: keep patterns or None} for the large payloads of an era."""
+    from .CorrectionsCore import period_names
+    from .jet import JetCorrProducer
+    from .btag import bTagCorrProducer
+
+    period = period_names[era]
+    tags = [JetCorrProducer.jer_tag_map.get(period)]
+    tags.append(JetCorrProducer.fatjer_tag_map.get(period))
+    for tag_map in [
+        JetCorrProducer.jec_tag_map_mc,
+        JetCorrProducer.jec_tag_map_data,
+        JetCorrProducer.fatjec_tag_map_mc,
+        JetCorrProducer.fatjec_tag_map_data,
+    ]:
+        tags.extend(tag_map.get(period, []))
+    jme_keep = sorted(set(f"{tag.format('*')}_*" for tag in tags if tag))
+
+    jet_file, jersmear_file, fatjet_file = JetCorrProducer.payloadFiles(period)
+    payloads = {jet_file: jme_keep, fatjet_file: jme_keep, jersmear_file: None}
+    for btag_file in bTagCorrProducer.payloadFiles(period):
+        payloads[btag_file] = None
+    return {path: keep for path, keep in payloads.items() if os.path.exists(path)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Local cache of correctionlib payloads."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    warm_parser = subparsers.add_parser("warm", help="store the payloads in the cache")
+    warm_parser.add_argument("--cache-dir", default=cacheDir())
+    warm_parser.add_argument("--era", default=None)
+    warm_parser.add_argument("--files", nargs="*", default=[])
+    warm_parser.add_argument(
+        "--keep",
+        nargs="*",
+        default=None,
+        help="patterns of the corrections to keep in --files (default: all)",
+    )
+    args = parser.parse_args()
+    if not args.cache_dir:
+        raise RuntimeError("Set --cache-dir or CORRECTIONS_PAYLOAD_CACHE.")
+
+    payloads = payloadsForEra(args.era) if args.era else {}
+    for path in args.files:
+        payloads[path] = args.keep
+    for path, keep in payloads.items():
+        cached = warm(path, args.cache_dir, keep)
+        print(
+            f"{path} -> {cached} ({os.path.getsize(path) / 2**20:.1f} MB -> {os.path.getsize(cached) / 2**20:.1f} MB)"
+        )
@@ -0,0 +1,236 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Optional prebuilt library with all the correction providers.
+# By default, every producer declares its header to cling at first use, so that the headers (and correction.h) are
+# parsed and JIT-compiled in every job. build() compiles all of them once into a shared library with a ROOT
+# dictionary and C++ module; loadPrebuiltLibrary() loads it instead, if it is present and newer than the headers.
+#
+# Build:
+#   python prebuilt.py --prelude $ANALYSIS_PATH/FLAF/include/Utilities.h [--output-dir DIR]
+# The prelude headers must declare what FLAF declares before the producers are used (e.g. the analysis::
+# namespace and the working point enums). The library is searched in $CORRECTIONS_PREBUILT_DIR, or in the build
+# directory next to this file; CORRECTIONS_PREBUILT=0 disables it.
+
+library_name = "CorrectionsPrebuilt"
+
+headers = [
+    "corrections.h",
+    "tabulated.h",
+    "definePlan.h",
+    "tau.h",
+    "jet.h",
+    "fatjet.h",
+    "electron.h",
+    "mu.h",
+    "btag.h",
+    "btagShape.h",
+    "pu.h",
+    "met.h",
+    "triggers.h",  # includes SF_Met.cc
+    "triggersRun3.h",
+    "puJetID.h",
+    "Vpt.h",
+    "lumi.h",
+    "JetVetoMap.h",
+    "MuonScaReProvider.h",
+    "MuonFsrRecoveryProvider.h",
+    "bosonicRecoil.h",
+    "DY_hhbbtautau.h",
+    "DY_hhbbww.h",
+]
+
+# sources compiled into the library through the headers that include them
+sources = ["SF_Met.cc", "SF_Met.h"]
+
+headers_dir = os.path.dirname(os.path.abspath(__file__))
+
+_library_loaded = None
+
+
+def defaultOutputDir():
+    return os.environ.get(
+        "CORRECTIONS_PREBUILT_DIR", os.path.join(headers_dir, "build")
+    )
+
+
+def libraryPath(output_dir=None):
+    return os.path.join(output_dir or defaultOutputDir(), f"lib{library_name}.so")
+
+
+def _correctionlibFlags(*flags):
+    output = subprocess.check_output(["correction", "config", *flags], text=True)
+    return output.split()
+
+
+def _rootConfig(*flags):
+    output = subprocess.check_output(["root-config", *flags], text=True)
+    return output.split()
+
+
+def _write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def includeFlags(output_dir, prelude=()):
+    flags = [f"-I{headers_dir}", f"-I{output_dir}"]
+    flags += sorted(
+        set(f"-I{os.path.dirname(os.path.abspath(path))}" for path in prelude)
+    )
+    flags += [flag for flag in _correctionlibFlags("--cflags") if flag.startswith("-I")]
+    return flags
+
+
+def compileCommand(sources, library, include_flags, extra_flags=(), libs=()):
+    return [
+        os.environ.get("CXX", "c++"),
+        "-shared",
+        "-fPIC",
+        "-O2",
+        *_rootConfig("--cflags"),
+        *include_flags,
+        *extra_flags,
+        *sources,
+        "-o",
+        library,
+        *libs,
+        *_rootConfig("--libs"),
+        "-lROOTVecOps",
+        "-lROOTDataFrame",
+        *_correctionlibFlags("--ldflags", "--rpath"),
+    ]
+
+
+def build(output_dir=None, prelude=(), extra_flags=(), verbose=False):
+    """Compiles all the provider headers into lib{library_name}.so with its dictionary and C++ module."""
+    output_dir = os.path.abspath(output_dir or defaultOutputDir())
+    os.makedirs(output_dir, exist_ok=True)
+
+    umbrella = f"{library_name}.h"
+    umbrella_lines = ["#pragma once"]
+    umbrella_lines += [f'#include "{os.path.abspath(path)}"' for path in prelude]
+    umbrella_lines += [f'#include "{os.path.join(headers_dir, h)}"' for h in headers]
+    _write(os.path.join(output_dir, umbrella), "\n".join(umbrella_lines) + "\n")
+
+    linkdef_lines = [
+        "#ifdef __CLING__",
+        "#pragma link off all globals;",
+        "#pragma link off all classes;",
+        "#pragma link off all functions;",
+        "#pragma link C++ nestedclasses;",
+    ]
+    linkdef_lines += [
+        f'#pragma link C++ defined_in "{os.path.join(headers_dir, h)}";'
+        for h in headers
+    ]
+    linkdef_lines.append("#endif")
+    _write(os.path.join(output_dir, "LinkDef.h"), "\n".join(linkdef_lines) + "\n")
+    _write(
+        os.path.join(output_dir, "module.modulemap"),
+        f'module {library_name} {{\n    header "{umbrella}"\n    export *\n}}\n',
+    )
+
+    include_flags = includeFlags(output_dir, prelude)
+    library = libraryPath(output_dir)
+    dictionary = f"G__{library_name}.cxx"
+
+    commands = [
+        [
+            "rootcling",
+            "-f",
+            dictionary,
+            "-s",
+            library,
+            "-rml",
+            os.path.basename(library),
+            "-rmf",
+            os.path.join(output_dir, f"lib{library_name}.rootmap"),
+            "-cxxmodule",
+            f"-moduleMapFile={os.path.join(output_dir, 'module.modulemap')}",
+            *include_flags,
+            umbrella,
+            "LinkDef.h",
+        ],
+        compileCommand([dictionary], library, include_flags, extra_flags),
+    ]
+    for command in commands:
+        if verbose:
+            print(" ".join(command))
+        subprocess.check_call(command, cwd=output_dir)
+    return library
+
+
+def _isUpToDate(library):
+    if not os.path.exists(library):
+        return False
+    library_mtime = os.path.getmtime(library)
+    return all(
+        os.path.getmtime(os.path.join(headers_dir, name)) <= library_mtime
+        for name in headers + sources
+    )
+
+
+def loadPrebuiltLibrary():
+    """Loads the prebuilt library once; returns False if it is disabled, missing, outdated or fails to load."""
+    global _library_loaded
+    if _library_loaded is not None:
+        return _library_loaded
+    _library_loaded = False
+    if os.environ.get("CORRECTIONS_PREBUILT", "1") == "0":
+        return False
+    library = libraryPath()
+    if not os.path.exists(library):
+        return False
+    if not _isUpToDate(library):
+        print(
+            f"Corrections: {library} is older than the headers, declaring the headers instead",
+            file=sys.stderr,
+        )
+        return False
+
+    import ROOT
+
+    # the module map must be visible to cling for the C++ module to be used
+    ROOT.gInterpreter.AddIncludePath(os.path.dirname(library))
+    ROOT.gInterpreter.AddIncludePath(headers_dir)
+    if ROOT.gSystem.Load(library) < 0:
+        print(f"Corrections: failed to load {library}", file=sys.stderr)
+        return False
+    if not ROOT.gInterpreter.Declare(
+        "namespace correction { using PrebuiltLibraryCheck = ::correction::UncScale; }"
+    ):
+        print(
+            f"Corrections: declarations of {library} are not available",
+            file=sys.stderr,
+        )
+        return False
+    _library_loaded = True
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=f"Build lib{library_name}.so with all the correction providers."
+    )
+    parser.add_argument("--output-dir", default=None)
+    parser.add_argument(
+        "--prelude",
+        nargs="*",
+        default=[],
+        help="headers to include before the providers (e.g. FLAF/include/Utilities.h)",
+    )
+    parser.add_argument(
+        "--extra-flags", nargs="*", default=[], help="additional compiler flags"
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    library = build(
+        output_dir=args.output_dir,
+        prelude=args.prelude,
+        extra_flags=args.extra_flags,
+        verbose=args.verbose,
+    )
+    print(f"Built {library}")
@@ -15,7 +15,7 @@ namespace correction {
             return names.at(scale);
         }
         puCorrProvider(const std::string& fileName, const std::string& jsonName)
-            : corrections_(CorrectionSet::from_file(fileName)), puweight(corrections_->at(jsonName)) {}
+            : corrections_(loadCorrectionSet(fileName)), puweight(corrections_->at(jsonName)) {}
 
         float getWeight(UncScale scale, float Pileup_nTrueInt) const {
             const std::string& scale_str = getScaleStr(scale);
@@ -23,7 +23,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        std::shared_ptr<const CorrectionSet> corrections_;
         Correction::Ref puweight;
     };
 
@@ -1,6 +1,5 @@
 import os
 import sys
-import ROOT
 from .CorrectionsCore import *
 
 # lumi POG: https://twiki.cern.ch/twiki/bin/view/CMS/TWikiLUM
@@ -30,15 +29,18 @@ class puWeightProducer:
         "2016postVFP_UL": "Collisions16_UltraLegacy_goldenJSON",
     }
 
-    def __init__(self, period):
+    @staticmethod
+    def payloadFiles(period):
         suffix = "_BCDEFGHI" if period == "2024_Summer24" else ""  # tmp patch
         jsonFile = puWeightProducer.JsonPath.format(
             folder=pog_folder_names["LUM"][period], suffix=suffix
         )
+        return [jsonFile]
+
+    def __init__(self, period):
+        (jsonFile,) = puWeightProducer.payloadFiles(period)
         if not puWeightProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "pu.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("pu.h")
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::puCorrProvider::Initialize("{jsonFile}", "{self.golden_json_dict[period]}")'
             )
@@ -28,7 +28,7 @@ namespace correction {
         }
 
         PUJetIDCorrProvider(const std::string& fileName)
-            : corrections_(CorrectionSet::from_file(fileName)), puJetEff_(corrections_->at("PUJetID_eff")) {}
+            : corrections_(loadCorrectionSet(fileName)), puJetEff_(corrections_->at("PUJetID_eff")) {}
         RVecF getPUJetID_eff(const RVecF& Jet_pt,
                              const RVecF& Jet_eta,
                              const std::string working_point,
@@ -48,7 +48,7 @@ namespace correction {
 
       private:
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        std::shared_ptr<const CorrectionSet> corrections_;
         Correction::Ref puJetEff_;
     };
 
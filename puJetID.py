@@ -1,5 +1,4 @@
 import os
-import ROOT
 from .CorrectionsCore import *
 
 # https://twiki.cern.ch/twiki/bin/viewauth/CMS/PileupJetIDUL
@@ -14,15 +13,19 @@ class puJetIDCorrProducer:
     period = None
     puJetID = "L"
 
+    @staticmethod
+    def payloadFiles(period):
+        return [
+            os.path.join(
+                os.environ["ANALYSIS_PATH"],
+                puJetIDCorrProducer.PUJetID_JsonPath.format(period),
+            )
+        ]
+
     def __init__(self, period):
-        jsonFile_eff = os.path.join(
-            os.environ["ANALYSIS_PATH"],
-            puJetIDCorrProducer.PUJetID_JsonPath.format(period),
-        )
+        (jsonFile_eff,) = puJetIDCorrProducer.payloadFiles(period)
         if not puJetIDCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "puJetID.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("puJetID.h")
             ROOT.gInterpreter.ProcessLine(
                 f'::correction::PUJetIDCorrProvider::Initialize("{jsonFile_eff}")'
             )
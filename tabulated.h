@@ -0,0 +1,296 @@
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstring>
+#include <limits>
+#include <mutex>
+#include <optional>
+#include <sstream>
+
+#include "correction.h"
+#include "corrections.h"
+
+namespace correction {
+
+    // Dense N-dimensional table of a binned correction.
+    // Each axis holds the union of the bin edges used by the correction for that input, and the table stores one
+    // value per cell, including the underflow (cell 0) and overflow (cell n_edges) regions, so that the original
+    // flow behaviour is reproduced. Cells for which correctionlib raises an error are stored as NaN and evaluating
+    // them throws. Cells are looked up with the same edge convention as correctionlib (std::upper_bound), or with a
+    // direct index for uniform axes.
+    class TabulatedGrid {
+      public:
+        class Axis {
+          public:
+            Axis(std::vector<double> edges, bool uniform) : edges_(std::move(edges)), uniform_(uniform) {
+                if (!std::is_sorted(edges_.begin(), edges_.end()))
+                    throw std::runtime_error("TabulatedGrid: axis edges are not sorted.");
+                if (uniform_ && edges_.size() < 2)
+                    throw std::runtime_error("TabulatedGrid: uniform axis requires at least two edges.");
+                if (uniform_) {
+                    low_ = edges_.front();
+                    high_ = edges_.back();
+                    n_bins_ = edges_.size() - 1;
+                }
+            }
+
+            size_t nCells() const { return edges_.size() + 1; }
+            const std::vector<double>& edges() const { return edges_; }
+            bool uniform() const { return uniform_; }
+
+            size_t cell(double x) const {
+                if (uniform_) {
+                    if (x < low_)
+                        return 0;
+                    if (x >= high_ || std::isnan(x))
+                        return n_bins_ + 1;
+                    const size_t bin = static_cast<size_t>(n_bins_ * ((x - low_) / (high_ - low_)));
+                    return std::min(bin, n_bins_ - 1) + 1;
+                }
+                return static_cast<size_t>(std::upper_bound(edges_.begin(), edges_.end(), x) - edges_.begin());
+            }
+
+          private:
+            std::vector<double> edges_;
+            bool uniform_;
+            double low_{0}, high_{0};
+            size_t n_bins_{0};
+        };
+
+        TabulatedGrid(const std::string& name, std::vector<Axis> axes, std::vector<double> content)
+            : name_(name), axes_(std::move(axes)), content_(std::move(content)) {
+            size_t n_cells = 1;
+            for (const auto& axis : axes_)
+                n_cells *= axis.nCells();
+            if (n_cells != content_.size()) {
+                std::ostringstream ss;
+                ss << "TabulatedGrid " << name_ << ": expected " << n_cells << " cells, got " << content_.size() << ".";
+                throw std::runtime_error(ss.str());
+            }
+        }
+
+        const std::string& name() const { return name_; }
+        size_t nAxes() const { return axes_.size(); }
+        const std::vector<Axis>& axes() const { return axes_; }
+
+        template <typename... X>
+        double evaluate(X... x) const {
+            const double values[] = {static_cast<double>(x)...};
+            return evaluateArray(values, sizeof...(X));
+        }
+
+        double evaluateArray(const double* values, size_t n_values) const {
+            if (n_values != axes_.size())
+                throw std::runtime_error("TabulatedGrid " + name_ + ": wrong number of inputs.");
+            size_t index = 0;
+            for (size_t n = 0; n < axes_.size(); ++n)
+                index = index * axes_[n].nCells() + axes_[n].cell(values[n]);
+            const double value = content_[index];
+            if (std::isnan(value))
+                throw std::runtime_error("TabulatedGrid " + name_ + ": input out of range.");
+            return value;
+        }
+
+        // Batch evaluation over RVec inputs of the same size
+        template <typename... V>
+        RVecF evaluateBatch(const V&... x) const {
+            const size_t sz = std::get<0>(std::forward_as_tuple(x...)).size();
+            RVecF result(sz);
+            for (size_t i = 0; i < sz; ++i)
+                result[i] = static_cast<float>(evaluate(x[i]...));
+            return result;
+        }
+
+        // Compare the table bit-for-bit with the correction on a grid made of, for each axis, every edge, the
+        // values next to it, the bin centres and points outside the edges. Inputs that are not grid axes are
+        // taken from fixed_inputs (positions that are std::nullopt are filled from the grid axes, in order).
+        bool validate(const Correction& corr,
+                      const std::vector<std::optional<Variable::Type>>& fixed_inputs,
+                      std::string& message) const {
+            const size_t n_grid_inputs = std::count(fixed_inputs.begin(), fixed_inputs.end(), std::nullopt);
+            if (fixed_inputs.size() != corr.inputs().size() || n_grid_inputs != axes_.size()) {
+                message = "inputs of " + corr.name() + " do not match the grid axes";
+                return false;
+            }
+            std::vector<std::vector<double>> points(axes_.size());
+            for (size_t n = 0; n < axes_.size(); ++n) {
+                const auto& edges = axes_[n].edges();
+                auto& axis_points = points[n];
+                if (edges.empty()) {
+                    axis_points.push_back(0.);
+                    continue;
+                }
+                axis_points.push_back(edges.front() - 1.);
+                for (size_t k = 0; k < edges.size(); ++k) {
+                    axis_points.push_back(std::nextafter(edges[k], -std::numeric_limits<double>::infinity()));
+                    axis_points.push_back(edges[k]);
+                    axis_points.push_back(std::nextafter(edges[k], std::numeric_limits<double>::infinity()));
+                    if (k + 1 < edges.size())
+                        axis_points.push_back(0.5 * (edges[k] + edges[k + 1]));
+                }
+                axis_points.push_back(edges.back() + 1.);
+            }
+
+            std::vector<size_t> idx(axes_.size(), 0);
+            std::vector<double> grid_values(axes_.size());
+            std::vector<Variable::Type> corr_values(fixed_inputs.size());
+            while (true) {
+                size_t axis = 0;
+                for (size_t k = 0; k < fixed_inputs.size(); ++k) {
+                    if (fixed_inputs[k]) {
+                        corr_values[k] = *fixed_inputs[k];
+                    } else {
+                        grid_values[axis] = points[axis][idx[axis]];
+                        corr_values[k] = grid_values[axis];
+                        ++axis;
+                    }
+                }
+                std::optional<double> expected, actual;
+                try {
+                    expected = corr.evaluate(corr_values);
+                } catch (std::exception&) {
+                }
+                try {
+                    actual = evaluateArray(grid_values.data(), grid_values.size());
+                } catch (std::exception&) {
+                }
+                const bool same = expected.has_value() == actual.has_value() &&
+                                  (!expected || std::memcmp(&*expected, &*actual, sizeof(double)) == 0);
+                if (!same) {
+                    std::ostringstream ss;
+                    ss << "mismatch for " << corr.name() << " at (";
+                    for (size_t n = 0; n < grid_values.size(); ++n)
+                        ss << (n ? ", " : "") << grid_values[n];
+                    ss << "): correctionlib ";
+                    if (expected)
+                        ss << *expected;
+                    else
+                        ss << "error";
+                    ss << ", table ";
+                    if (actual)
+                        ss << *actual;
+                    else
+                        ss << "error";
+                    message = ss.str();
+                    return false;
+                }
+
+                size_t n = axes_.size();
+                while (n > 0) {
+                    --n;
+                    if (++idx[n] < points[n].size())
+                        break;
+                    idx[n] = 0;
+                    if (n == 0)
+                        return true;
+                }
+                if (axes_.empty())
+                    return true;
+            }
+        }
+
+      private:
+        std::string name_;
+        std::vector<Axis> axes_;
+        std::vector<double> content_;
+    };
+
+    // Process-wide store of tabulated grids, filled from python (see tabulated.py) before the providers that use
+    // them are initialized.
+    class TabulatedGridRegistry {
+      public:
+        // edges of all axes concatenated, n_edges[n] edges for axis n; uniform[n] != 0 for uniform axes;
+        // content in row-major order over the axes cells
+        static void Register(const std::string& key,
+                             const std::vector<double>& edges,
+                             const std::vector<size_t>& n_edges,
+                             const std::vector<int>& uniform,
+                             const std::vector<double>& content) {
+            if (n_edges.size() != uniform.size())
+                throw std::runtime_error("TabulatedGridRegistry: inconsistent axes definition for " + key + ".");
+            std::vector<TabulatedGrid::Axis> axes;
+            size_t offset = 0;
+            for (size_t n = 0; n < n_edges.size(); ++n) {
+                if (offset + n_edges[n] > edges.size())
+                    throw std::runtime_error("TabulatedGridRegistry: inconsistent axes definition for " + key + ".");
+                axes.emplace_back(std::vector<double>(edges.begin() + offset, edges.begin() + offset + n_edges[n]),
+                                  uniform[n] != 0);
+                offset += n_edges[n];
+            }
+            auto grid = std::make_shared<const TabulatedGrid>(key, std::move(axes), content);
+            std::lock_guard<std::mutex> lock(mutex());
+            grids()[key] = std::move(grid);
+        }
+
+        static std::shared_ptr<const TabulatedGrid> Get(const std::string& key) {
+            std::lock_guard<std::mutex> lock(mutex());
+            const auto iter = grids().find(key);
+            return iter == grids().end() ? nullptr : iter->second;
+        }
+
+        static bool Contains(const std::string& key) { return Get(key) != nullptr; }
+
+      private:
+        static std::map<std::string, std::shared_ptr<const TabulatedGrid>>& grids() {
+            static std::map<std::string, std::shared_ptr<const TabulatedGrid>> grids;
+            return grids;
+        }
+
+        static std::mutex& mutex() {
+            static std::mutex m;
+            return m;
+        }
+    };
+
+    // Correction::Ref that is evaluated through a TabulatedGrid when one has been activated for it.
+    class BinnedCorrectionRef {
+      public:
+        BinnedCorrectionRef() = default;
+        BinnedCorrectionRef(Correction::Ref corr) : corr_(std::move(corr)) {}
+
+        const Correction::Ref& correction() const { return corr_; }
+        bool tabulated() const { return static_cast<bool>(grid_); }
+        explicit operator bool() const { return static_cast<bool>(corr_); }
+
+        // Looks up the grid registered under the correction name and activates it if it reproduces the
+        // correction on the validation grid. Returns false (and leaves the correction untabulated) otherwise.
+        bool activateTabulated(std::string& message) {
+            auto grid = TabulatedGridRegistry::Get(corr_->name());
+            if (!grid) {
+                message = "no tabulated grid registered for " + corr_->name();
+                return false;
+            }
+            std::vector<std::optional<Variable::Type>> fixed_inputs(corr_->inputs().size());
+            if (!grid->validate(*corr_, fixed_inputs, message))
+                return false;
+            grid_ = std::move(grid);
+            return true;
+        }
+
+        void deactivateTabulated() { grid_.reset(); }
+
+        template <typename... X>
+        double evaluate(X... x) const {
+            if (grid_)
+                return grid_->evaluate(x...);
+            return corr_->evaluate({x...});
+        }
+
+        template <typename... V>
+        RVecF evaluateBatch(const V&... x) const {
+            if (grid_)
+                return grid_->evaluateBatch(x...);
+            const size_t sz = std::get<0>(std::forward_as_tuple(x...)).size();
+            RVecF result(sz);
+            for (size_t i = 0; i < sz; ++i)
+                result[i] = static_cast<float>(corr_->evaluate({x[i]...}));
+            return result;
+        }
+
+      private:
+        Correction::Ref corr_;
+        std::shared_ptr<const TabulatedGrid> grid_;
+    };
+
+}  // namespace correction
@@ -0,0 +1,221 @@
+import gzip
+import json
+import os
+from .CorrectionsCore import ROOT, loadHeader
+
+# Compilation of binned correctionlib corrections into dense tables (see tabulated.h).
+# The table axes are the real-valued inputs of the correction that are not fixed; their bin edges are the union of
+# all the edges used for that input in the correction tree, so that every cell of the table lies entirely inside
+# one bin of the original correction. The value of each cell is then taken from correctionlib itself.
+
+_declared = False
+_payloads = {}
+_correction_sets = {}
+
+
+def _declareHeader():
+    global _declared
+    if not _declared:
+        loadHeader("tabulated.h")
+        _declared = True
+
+
+def loadPayload(json_file):
+    if json_file not in _payloads:
+        opener = gzip.open if json_file.endswith(".gz") else open
+        with opener(json_file, "rt") as f:
+            _payloads[json_file] = json.load(f)
+    return _payloads[json_file]
+
+
+def _loadCorrectionSet(json_file):
+    if json_file not in _correction_sets:
+        import correctionlib
+
+        _correction_sets[json_file] = correctionlib.CorrectionSet.from_file(json_file)
+    return _correction_sets[json_file]
+
+
+def _uniformEdges(edges):
+    n, low, high = edges["n"], edges["low"], edges["high"]
+    return [low + (high - low) * k / n for k in range(n)] + [high]
+
+
+class _EdgeCollector:
+    def __init__(self, correction, grid_inputs, fixed_inputs):
+        self.correction = correction
+        self.grid_inputs = grid_inputs
+        self.fixed_inputs = fixed_inputs
+        self.edges = {name: set() for name in grid_inputs}
+        self.uniform = {name: [] for name in grid_inputs}
+        self.non_uniform = {name: False for name in grid_inputs}
+
+    def _addEdges(self, input_name, edges):
+        if input_name not in self.grid_inputs:
+            return
+        if isinstance(edges, dict):
+            self.uniform[input_name].append((edges["n"], edges["low"], edges["high"]))
+            self.edges[input_name].update(_uniformEdges(edges))
+        else:
+            self.non_uniform[input_name] = True
+            self.edges[input_name].update(edges)
+
+    def _checkFlow(self, flow, input_names):
+        if flow == "wrap" and any(name in self.grid_inputs for name in input_names):
+            raise RuntimeError(
+                f"{self.correction['name']}: wrap flow on {input_names} can not be tabulated"
+            )
+        if isinstance(flow, dict):
+            self.visit(flow)
+
+    def _checkVariables(self, variables, what):
+        grid_variables = [name for name in variables if name in self.grid_inputs]
+        if grid_variables:
+            raise RuntimeError(
+                f"{self.correction['name']}: {what} depending on {grid_variables} can not be tabulated"
+            )
+
+    def visit(self, node):
+        if not isinstance(node, dict):
+            return
+        nodetype = node["nodetype"]
+        if nodetype == "binning":
+            self._addEdges(node["input"], node["edges"])
+            self._checkFlow(node["flow"], [node["input"]])
+            for content in node["content"]:
+                self.visit(content)
+        elif nodetype == "multibinning":
+            for input_name, edges in zip(node["inputs"], node["edges"]):
+                self._addEdges(input_name, edges)
+            self._checkFlow(node["flow"], node["inputs"])
+            for content in node["content"]:
+                self.visit(content)
+        elif nodetype == "category":
+            input_name = node["input"]
+            if input_name in self.grid_inputs:
+                raise RuntimeError(
+                    f"{self.correction['name']}: category on {input_name} can not be tabulated"
+                )
+            if input_name in self.fixed_inputs:
+                value = self.fixed_inputs[input_name]
+                for item in node["content"]:
+                    if item["key"] == value:
+                        self.visit(item["value"])
+                        return
+                self.visit(node.get("default"))
+                return
+            for item in node["content"]:
+                self.visit(item["value"])
+            self.visit(node.get("default"))
+        elif nodetype == "formula":
+            self._checkVariables(node["variables"], "formula")
+        elif nodetype == "formularef":
+            generic = self.correction["generic_formulas"][node["index"]]
+            self._checkVariables(generic["variables"], "formula")
+        elif nodetype == "transform":
+            self._checkVariables([node["input"]], "transform")
+            self.visit(node["rule"])
+            self.visit(node["content"])
+        elif nodetype == "hashprng":
+            self._checkVariables(node["inputs"], "hashprng")
+        else:
+            raise RuntimeError(
+                f"{self.correction['name']}: node type {nodetype} can not be tabulated"
+            )
+
+    def axis(self, input_name):
+        edges = sorted(self.edges[input_name])
+        uniform_specs = set(self.uniform[input_name])
+        is_uniform = not self.non_uniform[input_name] and len(uniform_specs) == 1
+        return edges, is_uniform
+
+
+def _cellPoints(edges):
+    if not edges:
+        return [0.0]
+    points = [edges[0] - 1.0]
+    points += [0.5 * (edges[k] + edges[k + 1]) for k in range(len(edges) - 1)]
+    points.append(edges[-1] + 1.0)
+    return points
+
+
+def tabulateCorrection(json_file, correction_name, fixed_inputs=None):
+    """Returns (input names, [(edges, is_uniform)] per axis, content) of the dense table of a correction.
+
+    fixed_inputs maps the names of the inputs that are kept constant (e.g. categories) to their value; all the other
+    inputs must be real-valued and become the table axes, in the order of the correction inputs.
+    """
+    import numpy as np
+
+    fixed_inputs = fixed_inputs or {}
+    payload = loadPayload(json_file)
+    correction = next(
+        (c for c in payload["corrections"] if c["name"] == correction_name), None
+    )
+    if correction is None:
+        raise RuntimeError(f"correction {correction_name} not found in {json_file}")
+
+    grid_inputs = []
+    for variable in correction["inputs"]:
+        if variable["name"] in fixed_inputs:
+            continue
+        if variable["type"] != "real":
+            raise RuntimeError(
+                f"{correction_name}: input {variable['name']} of type {variable['type']} must be fixed"
+            )
+        grid_inputs.append(variable["name"])
+
+    collector = _EdgeCollector(correction, grid_inputs, fixed_inputs)
+    collector.visit(correction["data"])
+    axes = [collector.axis(name) for name in grid_inputs]
+
+    axis_points = [_cellPoints(edges) for edges, _ in axes]
+    mesh = np.meshgrid(*axis_points, indexing="ij") if axis_points else []
+    grid_values = {name: values.ravel() for name, values in zip(grid_inputs, mesh)}
+    n_cells = int(np.prod([len(points) for points in axis_points]))
+
+    evaluator = _loadCorrectionSet(json_file)[correction_name]
+    arguments = [
+        (
+            fixed_inputs[variable["name"]]
+            if variable["name"] in fixed_inputs
+            else grid_values[variable["name"]]
+        )
+        for variable in correction["inputs"]
+    ]
+    try:
+        content = np.asarray(evaluator.evaluate(*arguments), dtype=float)
+        content = np.broadcast_to(content, (n_cells,)).tolist()
+    except Exception:
+        # some cells are out of range with flow = error: evaluate them one by one
+        content = []
+        for cell in range(n_cells):
+            cell_arguments = [
+                arg if not isinstance(arg, np.ndarray) else float(arg[cell])
+                for arg in arguments
+            ]
+            try:
+                content.append(float(evaluator.evaluate(*cell_arguments)))
+            except Exception:
+                content.append(float("nan"))
+    return grid_inputs, axes, content
+
+
+def registerTabulatedCorrection(
+    json_file, correction_name, key=None, fixed_inputs=None
+):
+    """Tabulates a correction and registers it in TabulatedGridRegistry under key (correction name by default)."""
+    _declareHeader()
+    _, axes, content = tabulateCorrection(json_file, correction_name, fixed_inputs)
+    edges_vec = ROOT.std.vector["double"]()
+    n_edges_vec = ROOT.std.vector["size_t"]()
+    uniform_vec = ROOT.std.vector["int"]()
+    for edges, is_uniform in axes:
+        for edge in edges:
+            edges_vec.push_back(edge)
+        n_edges_vec.push_back(len(edges))
+        uniform_vec.push_back(1 if is_uniform else 0)
+    content_vec = ROOT.std.vector["double"](content)
+    ROOT.correction.TabulatedGridRegistry.Register(
+        key or correction_name, edges_vec, n_edges_vec, uniform_vec, content_vec
+    )
@@ -2,6 +2,7 @@
 
 #include "correction.h"
 #include "corrections.h"
+#include "definePlan.h"
 
 inline std::ostream& operator<<(std::ostream& os, const std::map<Channel, std::string>& ch_map) {
     for (const auto& [key, value] : ch_map)
@@ -255,7 +256,7 @@ namespace correction {
                         const wpsMapType& wps_map,
                         const std::map<Channel, std::string>& tauType_map,
                         const std::string& year)
-            : corrections_(CorrectionSet::from_file(fileName)),
+            : corrections_(loadCorrectionSet(fileName)),
               tau_es_(corrections_->at("tau_energy_scale")),
               tau_vs_e_(corrections_->at(deepTauVersion + "VSe")),
               tau_vs_mu_(corrections_->at(deepTauVersion + "VSmu")),
@@ -363,8 +364,35 @@ namespace correction {
             return 1.;
         }
 
+        // Defines the SF columns of a plan with compiled callables. Each entry has inputs
+        // {legType, p4, decayMode, gen_kind}, the VSjet working point as option and an UncSource as source.
+        ROOT::RDF::RNode DefineSF(ROOT::RDF::RNode df, const SFPlan& plan, const std::string& channel_column) const {
+            const std::string channel = define_plan::enumColumn<Channel>(df, channel_column, "Channel");
+            for (const auto& entry : plan) {
+                define_plan::checkInputs(entry, 4, "TauCorrProvider::DefineSF");
+                define_plan::checkColumnType<LorentzVectorM>(df, entry.inputs.at(1));
+                define_plan::checkColumnType<int>(df, entry.inputs.at(2));
+                define_plan::checkColumnType<int>(df, entry.inputs.at(3));
+            }
+            for (const auto& entry : plan) {
+                const std::string leg_type = define_plan::enumColumn<Leg>(df, entry.inputs.at(0), "Leg");
+                const UncSource source = static_cast<UncSource>(entry.source);
+                const UncScale scale = entry.scale;
+                const std::string wpVSjet = entry.option;
+                df = df.Define(
+                    entry.sf_column,
+                    [this, source, scale, wpVSjet](
+                        Leg leg_type, const LorentzVectorM& p4, int decayMode, int gen_kind, Channel ch) -> double {
+                        return leg_type == Leg::tau ? getSF(p4, decayMode, gen_kind, wpVSjet, ch, source, scale) : 1.;
+                    },
+                    {leg_type, entry.inputs.at(1), entry.inputs.at(2), entry.inputs.at(3), channel});
+                df = define_plan::defineFinalColumn(df, entry);
+            }
+            return df;
+        }
+
       private:
-        std::unique_ptr<CorrectionSet> corrections_;
+        std::shared_ptr<const CorrectionSet> corrections_;
         Correction::Ref tau_es_, tau_vs_e_, tau_vs_mu_, tau_vs_jet_;
         std::string deepTauVersion_;
         const wpsMapType wps_map_;
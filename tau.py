@@ -1,6 +1,6 @@
 import os
-import ROOT
 from .CorrectionsCore import *
+from .aot import callOnRNode
 
 # https://twiki.cern.ch/twiki/bin/viewauth/CMS/TauIDRecommendationForRun2
 # https://indico.cern.ch/event/1062355/contributions/4466122/attachments/2287465/3888179/Update2016ULsf.pdf
@@ -103,17 +103,21 @@ class TauCorrProducer:
         "channelId",
     ]
 
-    def __init__(self, *, period, config, columns):
-        self.deepTauVersion = f"""DeepTau{deepTauVersions[config["deepTauVersion"]]}v{config["deepTauVersion"]}"""
-        jsonFile = TauCorrProducer.jsonPath.format(
-            pog_folder_names["TAU"][period_names[period]]
-        )
+    @staticmethod
+    def payloadFiles(period):
         #     period_in_taupog_folder[period], period_in_tau_file_name[period]
         # )
+        return [
+            TauCorrProducer.jsonPath.format(
+                pog_folder_names["TAU"][period_names[period]]
+            )
+        ]
+
+    def __init__(self, *, period, config, columns):
+        self.deepTauVersion = f"""DeepTau{deepTauVersions[config["deepTauVersion"]]}v{config["deepTauVersion"]}"""
+        (jsonFile,) = TauCorrProducer.payloadFiles(period)
         if not TauCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "tau.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("tau.h")
             wp_map_cpp = createWPChannelMap(config["deepTauWPs"])
             tauType_map = createTauSFTypeMap(config["genuineTau_SFtype"])
             ROOT.gInterpreter.ProcessLine(
@@ -124,7 +128,9 @@ class TauCorrProducer:
         for col in TauCorrProducer.inputColumns:
             self.columns[col] = columns.get(col, col)
 
-    def getES(self, df, source_dict):
+    def getES(self, df, source_dict, columns=None):
+        if columns is None:
+            columns = DefinedColumns(df)
         for source in (
             [central]
             + TauCorrProducer.energyScaleSources_tau
@@ -133,24 +139,34 @@ class TauCorrProducer:
             updateSourceDict(source_dict, source, "Tau")
             for scale in getScales(source):
                 syst_name = getSystName(source, scale)
-                df = df.Define(
+                df = columns.Define(
+                    df,
                     f"Tau_p4_{syst_name}",
                     f"""::correction::TauCorrProvider::getGlobal().getES(
                                Tau_p4_{nano}, Tau_decayMode, Tau_genMatch,
                                ::correction::TauCorrProvider::UncSource::{source}, ::correction::UncScale::{scale})""",
                 )
-                df = df.Define(
-                    f"Tau_p4_{syst_name}_delta", f"Tau_p4_{syst_name} - Tau_p4_{nano}"
+                df = columns.Define(
+                    df,
+                    f"Tau_p4_{syst_name}_delta",
+                    f"Tau_p4_{syst_name} - Tau_p4_{nano}",
                 )
 
         return df, source_dict
 
-    def getSF(self, df, lepton_legs, isCentral, return_variations):
+    def getSF(self, df, lepton_legs, isCentral, return_variations, typed_define=False):
+        """Defines the tau ID SF weight columns of the lepton legs.
+
+        With typed_define, all the columns are handed to TauCorrProvider::DefineSF as a single plan and defined
+        with compiled callables instead of one jitted expression per column. If the plan cannot be defined (e.g.
+        the input columns are not of the expected types), the jitted definitions are used.
+        """
         sf_sources = (
             TauCorrProducer.SFSources_tau + TauCorrProducer.SFSources_genuineLep
         )
         sf_scales = [up, down] if return_variations else []
         SF_branches = []
+        plan = ROOT.correction.SFPlan() if typed_define else None
         for source in [central] + sf_sources:
             for scale in [central] + sf_scales:
                 if source == central and scale != central:
@@ -171,6 +187,34 @@ class TauCorrProducer:
                     decayMode = f'{leg_name}_{self.columns["decayMode"]}'
                     p4 = f'{leg_name}_{self.columns["p4"]}'
 
+                    if plan is not None:
+                        if scale != central:
+                            branch_name_Medium_final = branch_Medium_name + "_rel"
+                        elif source == central:
+                            branch_name_Medium_final = (
+                                f"""weight_{leg_name}_TauID_SF_Medium_{central}"""
+                            )
+                        else:
+                            branch_name_Medium_final = branch_Medium_name
+                        plan.push_back(
+                            ROOT.correction.SFPlanEntry(
+                                [legType, p4, decayMode, gen_kind],
+                                int(
+                                    getattr(
+                                        ROOT.correction.TauCorrProvider.UncSource,
+                                        source,
+                                    )
+                                ),
+                                getattr(ROOT.correction.UncScale, scale),
+                                "Medium",
+                                f"{branch_Medium_name}_double",
+                                branch_name_Medium_final,
+                                branch_Medium_central if scale != central else "",
+                            )
+                        )
+                        SF_branches.append(branch_name_Medium_final)
+                        continue
+
                     legType = getLegTypeString(df, legType)
                     channelId = getChannelIdString(df, self.columns["channelId"])
 
@@ -201,4 +245,18 @@ class TauCorrProducer:
                             f"static_cast<float>({branch_Medium_name}_double)",
                         )
                     SF_branches.append(branch_name_Medium_final)
+        if plan is not None and plan.size() > 0:
+            try:
+                df = callOnRNode(
+                    df,
+                    lambda rnode: ROOT.correction.TauCorrProvider.getGlobal().DefineSF(
+                        rnode, plan, self.columns["channelId"]
+                    ),
+                    "DefineSF",
+                )
+            except ROOT.correction.define_plan.ColumnTypeMismatch as e:
+                print(
+                    f"TauCorrProducer: typed SF definitions failed ({e}), using jitted ones"
+                )
+                return self.getSF(df, lepton_legs, isCentral, return_variations)
         return df, SF_branches
@@ -0,0 +1,28 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The repository is imported as a package named after its directory (Corrections in the analyses), as FLAF does.
+headers_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+package = os.path.basename(headers_dir)
+if os.path.dirname(headers_dir) not in sys.path:
+    sys.path.insert(0, os.path.dirname(headers_dir))
+
+
+def skipUnlessRequired(reason):
+    """Skips the test, or fails it in the CI job that provides ROOT, FLAF and the prebuilt library."""
+    if os.environ.get("CORRECTIONS_TESTS_REQUIRE_ALL", "0") == "1":
+        pytest.fail(reason)
+    pytest.skip(reason)
+
+
+@pytest.fixture
+def corrections():
+    """Imports a module of the package, e.g. corrections("aot"); the imports need neither FLAF nor ROOT."""
+
+    def load(module):
+        return importlib.import_module(f"{package}.{module}")
+
+    return load
@@ -0,0 +1,95 @@
+import pytest
+
+
+class FakeDataFrame:
+    """Minimal stand-in for an RDataFrame node: records the calls and the column types."""
+
+    def __init__(self, columns, calls):
+        self.columns = columns
+        self.calls = calls
+
+    def _define(self, kind, name, expression, columns):
+        self.calls.append((kind, name, expression, columns))
+        return FakeDataFrame({**self.columns, name: "double"}, self.calls)
+
+    def Define(self, name, expression, *columns):
+        return self._define("Define", name, expression, columns)
+
+    def Redefine(self, name, expression, *columns):
+        return self._define("Redefine", name, expression, columns)
+
+    def Histo2D(self, model, x, y, weight):
+        self.calls.append(("Histo2D", model, x, y, weight))
+        return "result"
+
+    def GetColumnType(self, column):
+        return self.columns[column]
+
+    def GetColumnNames(self):
+        return list(self.columns)
+
+
+class Functor:
+    """Python proxy of a C++ functor, e.g. BTagNormApplier."""
+
+    def __call__(self, weight, bin):
+        return weight
+
+
+@pytest.fixture
+def session(corrections, tmp_path, monkeypatch):
+    monkeypatch.setenv("CORRECTIONS_AOT_CACHE", str(tmp_path))
+    aot = corrections("aot")
+    return aot.AOTSession("test")
+
+
+def test_string_define_is_recorded(session):
+    df = session.wrap(FakeDataFrame({"x": "float"}, []))
+    df = df.Define("y", "x * 2")
+    assert session.valid
+    assert session.steps == [
+        {
+            "kind": "Define",
+            "name": "y",
+            "expression": "x * 2",
+            "inputs": ["x"],
+            "input_types": ["float"],
+            "type": "double",
+        }
+    ]
+
+
+@pytest.mark.parametrize("kind", ["Define", "Redefine"])
+def test_functor_define_is_forwarded(session, kind):
+    calls = []
+    functor = Functor()
+    df = session.wrap(FakeDataFrame({"x": "float", "bin": "int"}, calls))
+    df = df.Define("w", "x * 2")
+    df = getattr(df, kind)("w", functor, ["w", "bin"])
+    assert calls[-1] == (kind, "w", functor, (["w", "bin"],))
+    assert df.GetColumnType("w") == "double"
+    assert not session.valid
+    assert [step["expression"] for step in session.steps] == ["x * 2"]
+
+
+def test_configuration_key_sorts_sets(corrections):
+    aot = corrections("aot")
+    assert aot.configurationKey({"b", "a", "c"}) == aot.configurationKey(
+        ["a", "b", "c"]
+    )
+    assert aot.configurationKey({"x": {"b", "a"}}) == aot.configurationKey(
+        {"x": {"a", "b"}}
+    )
+
+
+def test_configuration_key_rejects_unknown_types(corrections):
+    aot = corrections("aot")
+    with pytest.raises(TypeError):
+        aot.configurationKey(object())
+
+
+def test_actions_keep_the_session(session):
+    df = session.wrap(FakeDataFrame({"x": "float"}, []))
+    df = df.Define("y", "x * 2")
+    assert df.Histo2D("model", "x", "y", "y") == "result"
+    assert session.valid
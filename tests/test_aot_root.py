@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from conftest import skipUnlessRequired
+
+# Record / compile / replay cycle of the AOT mode with ROOT and the prebuilt library (see prebuilt.py).
+
+try:
+    import ROOT
+except ImportError:
+    ROOT = None
+
+
+@pytest.fixture
+def aot(corrections, tmp_path, monkeypatch):
+    if ROOT is None:
+        skipUnlessRequired("ROOT is not available")
+    if not corrections("prebuilt").loadPrebuiltLibrary():
+        skipUnlessRequired("the prebuilt library is not available")
+    monkeypatch.setenv("CORRECTIONS_AOT_CACHE", str(tmp_path))
+    return corrections("aot")
+
+
+def makeProducer(aot):
+    class Producer:
+        global_params = {"corrections_aot": True}
+        period = "Run3_2022"
+        stage = "HistTuple"
+        isData = False
+        to_apply = {"test": {}}
+
+        @aot.aotCompiled
+        def define(self, df):
+            df = df.Define("y", "float(x) * 2")
+            return df.Define("z", "y + x")
+
+        @aot.aotCompiled
+        def defineTyped(self, df):
+            df = aot.callOnRNode(df, lambda rnode: rnode.Define("t", "x + 1"), "test")
+            return df.Define("u", "t * 2")
+
+    return Producer()
+
+
+def makeDataFrame():
+    return ROOT.RDataFrame(4).Define("x", "int(rdfentry_)")
+
+
+def test_record_compile_replay(aot, tmp_path, capfd):
+    producer = makeProducer(aot)
+    recorded = producer.define(makeDataFrame())
+    assert recorded.Sum("z").GetValue() == pytest.approx(18)
+    libraries = [name for name in os.listdir(tmp_path) if name.endswith(".so")]
+    assert len(libraries) == 1
+    capfd.readouterr()
+
+    replayed = producer.define(makeDataFrame())
+    assert replayed.Sum("z").GetValue() == pytest.approx(18)
+    assert "2 compiled definitions, 0 jitted" in capfd.readouterr().err
+
+
+def test_typed_definitions_invalidate_the_session(aot, tmp_path, capfd):
+    producer = makeProducer(aot)
+    df = producer.defineTyped(makeDataFrame())
+    assert df.Sum("u").GetValue() == pytest.approx(20)
+    assert "will not be cached" in capfd.readouterr().err
+    assert not any(name.endswith(".so") for name in os.listdir(tmp_path))
@@ -0,0 +1,153 @@
+import json
+
+import pytest
+
+# Run specialization of the data JEC (see specializeRunDependentJEC in jet.py), on small payloads that reproduce
+# the structure of a compound L1L2L3Res correction with a run-dependent residual.
+
+
+def makePayload(run_type, residual):
+    def correction(name, inputs, data):
+        return {
+            "name": name,
+            "version": 1,
+            "inputs": [{"name": n, "type": t} for n, t in inputs],
+            "output": {"name": "scale", "type": "real"},
+            "data": data,
+        }
+
+    scale = correction(
+        "L2",
+        [("JetEta", "real")],
+        {
+            "nodetype": "binning",
+            "input": "JetEta",
+            "edges": [-5.0, 0.0, 5.0],
+            "content": [1.01, 1.02],
+            "flow": "clamp",
+        },
+    )
+    res = correction("Res", [("JetEta", "real"), ("run", run_type)], residual)
+    return {
+        "schema_version": 2,
+        "corrections": [scale, res],
+        "compound_corrections": [
+            {
+                "name": "L1L2L3Res",
+                "inputs": [
+                    {"name": "JetEta", "type": "real"},
+                    {"name": "run", "type": run_type},
+                ],
+                "output": {"name": "scale", "type": "real"},
+                "inputs_update": [],
+                "input_op": "*",
+                "output_op": "*",
+                "stack": ["L2", "Res"],
+            }
+        ],
+    }
+
+
+binning = {
+    "nodetype": "binning",
+    "input": "run",
+    "edges": [100.0, 200.0, 300.0],
+    "content": [1.1, 1.2],
+    "flow": "clamp",
+}
+multibinning = {
+    "nodetype": "multibinning",
+    "inputs": ["JetEta", "run"],
+    "edges": [[-5.0, 0.0, 5.0], [100.0, 200.0, 300.0]],
+    "content": [1.1, 1.2, 1.3, 1.4],
+    "flow": 1.0,
+}
+category = {
+    "nodetype": "category",
+    "input": "run",
+    "content": [{"key": 367000, "value": 1.1}, {"key": 367001, "value": 1.2}],
+    "default": 1.0,
+}
+
+
+@pytest.fixture
+def jet(corrections):
+    return corrections("jet")
+
+
+def test_specialize_binning(jet):
+    specialize = lambda run: jet._specializeNode(binning, {"name": "Res"}, "run", run)
+    assert [specialize(run) for run in [50, 100, 199, 200, 350]] == [
+        1.1,
+        1.1,
+        1.1,
+        1.2,
+        1.2,
+    ]
+
+
+def test_specialize_multibinning(jet):
+    node = jet._specializeNode(multibinning, {"name": "Res"}, "run", 250)
+    assert node == {
+        "nodetype": "binning",
+        "input": "JetEta",
+        "edges": [-5.0, 0.0, 5.0],
+        "content": [1.2, 1.4],
+        "flow": 1.0,
+    }
+    assert jet._specializeNode(multibinning, {"name": "Res"}, "run", 350) == 1.0
+
+
+def test_specialize_category_with_default(jet):
+    specialize = lambda run: jet._specializeNode(category, {"name": "Res"}, "run", run)
+    assert [specialize(run) for run in [366999, 367000, 367001, 367002]] == [
+        1.0,
+        1.1,
+        1.2,
+        1.0,
+    ]
+
+
+@pytest.mark.parametrize(
+    "run_type, residual, runs",
+    [
+        ("real", binning, [50, 100, 199, 200, 299, 300, 400]),
+        ("real", multibinning, [50, 100, 199, 200, 299, 300, 400]),
+        ("int", category, [366999, 367000, 367001, 367002]),
+    ],
+)
+def test_specialized_compound_matches_original(jet, tmp_path, run_type, residual, runs):
+    correctionlib = pytest.importorskip("correctionlib")
+    json_file = str(tmp_path / f"jec_{run_type}_{residual['nodetype']}.json")
+    with open(json_file, "w") as f:
+        json.dump(makePayload(run_type, residual), f)
+    run_edges, specialized_sets = jet.specializeRunDependentJEC(json_file, "L1L2L3Res")
+    assert len(specialized_sets) == len(run_edges) + 1
+    jet.validateRunSpecialization(json_file, "L1L2L3Res", run_edges, specialized_sets)
+
+    original = correctionlib.CorrectionSet.from_file(json_file).compound["L1L2L3Res"]
+    for run in runs:
+        # interval of the run, as RunSpecializedJEC::find
+        interval = sum(1 for edge in run_edges if edge <= run)
+        specialized = correctionlib.CorrectionSet.from_string(
+            specialized_sets[interval]
+        ).compound["L1L2L3Res"]
+        run_value = float(run) if run_type == "real" else run
+        for eta in [-1.0, 1.0]:
+            assert specialized.evaluate(eta) == pytest.approx(
+                original.evaluate(eta, run_value)
+            )
+
+
+def test_validation_rejects_a_wrong_specialization(jet, tmp_path):
+    pytest.importorskip("correctionlib")
+    json_file = str(tmp_path / "jec.json")
+    with open(json_file, "w") as f:
+        json.dump(makePayload("int", category), f)
+    run_edges, specialized_sets = jet.specializeRunDependentJEC(json_file, "L1L2L3Res")
+    # the specialization of the interval of run 367000 evaluated at the default instead of the key
+    specialized_sets[run_edges.index(367000) + 1] = specialized_sets[0]
+    with pytest.raises(jet.RunSpecializationError):
+        jet.validateRunSpecialization(
+            json_file, "L1L2L3Res", run_edges, specialized_sets
+        )
@@ -86,7 +86,7 @@ namespace correction {
                          const std::string& eTauFileName,
                          const std::string& muTauFileName,
                          const std::string& metFileName)
-            : tau_corrections_(CorrectionSet::from_file(tauFileName)),
+            : tau_corrections_(loadCorrectionSet(tauFileName)),
               tau_trg_(tau_corrections_->at("tau_trigger")),
               deepTauVersion_(deepTauVersion),
               wps_map_(wps_map),
@@ -435,7 +435,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> tau_corrections_;
+        std::shared_ptr<const CorrectionSet> tau_corrections_;
         Correction::Ref tau_trg_;
         const std::string deepTauVersion_;
         const wpsMapType wps_map_;
@@ -1,5 +1,4 @@
 import os
-import ROOT
 from .CorrectionsCore import *
 from Common.Utilities import *
 import yaml
@@ -82,34 +81,26 @@ class TrigCorrProducer:
     }
 
     muon_trg_dict = {
-        "2018_UL": ROOT.std.vector("std::string")(
-            {
-                "NUM_IsoMu24_DEN_CutBasedIdTight_and_PFIsoTight",
-                "NUM_IsoMu24_or_Mu50_DEN_CutBasedIdTight_and_PFIsoTight",
-                "NUM_Mu50_or_OldMu100_or_TkMu100_DEN_CutBasedIdGlobalHighPt_and_TkIsoLoose",
-            }
-        ),
-        "2017_UL": ROOT.std.vector("std::string")(
-            {
-                "NUM_IsoMu27_DEN_CutBasedIdTight_and_PFIsoTight",
-                "NUM_IsoMu27_or_Mu50_DEN_CutBasedIdTight_and_PFIsoTight",
-                "NUM_Mu50_or_OldMu100_or_TkMu100_DEN_CutBasedIdGlobalHighPt_and_TkIsoLoose",
-            }
-        ),
-        "2016preVFP_UL": ROOT.std.vector("std::string")(
-            {
-                "NUM_IsoMu24_or_IsoTkMu24_DEN_CutBasedIdTight_and_PFIsoTight",
-                "NUM_IsoMu24_or_IsoTkMu24_or_Mu50_or_TkMu50_DEN_CutBasedIdTight_and_PFIsoTight",
-                "NUM_Mu50_or_TkMu50_DEN_CutBasedIdGlobalHighPt_and_TkIsoLoose",
-            }
-        ),
-        "2016postVFP_UL": ROOT.std.vector("std::string")(
-            {
-                "NUM_IsoMu24_or_IsoTkMu24_DEN_CutBasedIdTight_and_PFIsoTight",
-                "NUM_IsoMu24_or_IsoTkMu24_or_Mu50_or_TkMu50_DEN_CutBasedIdTight_and_PFIsoTight",
-                "NUM_Mu50_or_TkMu50_DEN_CutBasedIdGlobalHighPt_and_TkIsoLoose",
-            }
-        ),
+        "2018_UL": [
+            "NUM_IsoMu24_DEN_CutBasedIdTight_and_PFIsoTight",
+            "NUM_IsoMu24_or_Mu50_DEN_CutBasedIdTight_and_PFIsoTight",
+            "NUM_Mu50_or_OldMu100_or_TkMu100_DEN_CutBasedIdGlobalHighPt_and_TkIsoLoose",
+        ],
+        "2017_UL": [
+            "NUM_IsoMu27_DEN_CutBasedIdTight_and_PFIsoTight",
+            "NUM_IsoMu27_or_Mu50_DEN_CutBasedIdTight_and_PFIsoTight",
+            "NUM_Mu50_or_OldMu100_or_TkMu100_DEN_CutBasedIdGlobalHighPt_and_TkIsoLoose",
+        ],
+        "2016preVFP_UL": [
+            "NUM_IsoMu24_or_IsoTkMu24_DEN_CutBasedIdTight_and_PFIsoTight",
+            "NUM_IsoMu24_or_IsoTkMu24_or_Mu50_or_TkMu50_DEN_CutBasedIdTight_and_PFIsoTight",
+            "NUM_Mu50_or_TkMu50_DEN_CutBasedIdGlobalHighPt_and_TkIsoLoose",
+        ],
+        "2016postVFP_UL": [
+            "NUM_IsoMu24_or_IsoTkMu24_DEN_CutBasedIdTight_and_PFIsoTight",
+            "NUM_IsoMu24_or_IsoTkMu24_or_Mu50_or_TkMu50_DEN_CutBasedIdTight_and_PFIsoTight",
+            "NUM_Mu50_or_TkMu50_DEN_CutBasedIdGlobalHighPt_and_TkIsoLoose",
+        ],
     }
 
     muon_trgHistNames_eff_dict = {
@@ -205,9 +196,7 @@ class TrigCorrProducer:
             jsonFile_Tau_rel = f"Corrections/data/TAU/{period}/tau_DeepTau2018v2p5_{period}_101123.json"
             jsonFile_Tau = os.path.join(os.environ["ANALYSIS_PATH"], jsonFile_Tau_rel)
         if not TrigCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "triggers.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("triggers.h")
             wp_map_cpp = createWPChannelMap(config["deepTauWPs"])
             # print(wp_map_cpp)
             # "{self.muon_trg_dict[period]}",
@@ -240,7 +229,10 @@ class TrigCorrProducer:
         applyTrgBranch_name,
         SF_branches,
         fromCorrLib=False,
+        columns=None,
     ):
+        if columns is None:
+            columns = DefinedColumns(df)
         # print(f"processing {trg_name} for {leg_idx} {leg_name}")
         for source in sf_sources:
             # print(f"processing {source}")
@@ -267,49 +259,57 @@ class TrigCorrProducer:
                 )
                 # print(f"branch name will be {branch_SF_name}")
 
-                if f"{branch_SF_name}_double" in df.GetColumnNames():
+                if f"{branch_SF_name}_double" in columns:
                     # print(f"{branch_SF_name}_double in df cols" )
                     continue
                 if fromCorrLib == True:
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_SF_name}_double",
                         f"""{applyTrgBranch_name} ? ::correction::TrigCorrProvider::getGlobal().getTauSF_fromCorrLib(
                             HttCandidate.leg_p4[{leg_idx}], Tau_decayMode.at(HttCandidate.leg_index[{leg_idx}]), "{trg_name}", HttCandidate.channel(), ::correction::TrigCorrProvider::UncSource::{source}, ::correction::UncScale::{scale} ) : 1.f;""",
                     )
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_eff_data_name}",
                         f"""{applyTrgBranch_name} ? ::correction::TrigCorrProvider::getGlobal().getTauEffData_fromCorrLib(
                             HttCandidate.leg_p4[{leg_idx}], Tau_decayMode.at(HttCandidate.leg_index[{leg_idx}]), "{trg_name}", HttCandidate.channel(), ::correction::TrigCorrProvider::UncSource::{source}, ::correction::UncScale::{scale} ) : 1.f;""",
                     )
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_eff_MC_name}",
                         f"""{applyTrgBranch_name} ? ::correction::TrigCorrProvider::getGlobal().getTauEffMC_fromCorrLib(
                                     HttCandidate.leg_p4[{leg_idx}], Tau_decayMode.at(HttCandidate.leg_index[{leg_idx}]), "{trg_name}", HttCandidate.channel(), ::correction::TrigCorrProvider::UncSource::{source}, ::correction::UncScale::{scale} ): 1.f;""",
                     )
                 else:
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_SF_name}_double",
                         f"""{applyTrgBranch_name} ? ::correction::TrigCorrProvider::getGlobal().getSF_fromRootFile(
                                 HttCandidate.leg_p4[{leg_idx}],::correction::TrigCorrProvider::UncSource::{source}, ::correction::UncScale::{scale} ) : 1.f""",
                     )
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_eff_data_name}",
                         f"""{applyTrgBranch_name} ? ::correction::TrigCorrProvider::getGlobal().getEffData_fromRootFile(
                                 HttCandidate.leg_p4[{leg_idx}],::correction::TrigCorrProvider::UncSource::{source}, ::correction::UncScale::{scale}, true) : 1.f""",
                     )
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_eff_MC_name}",
                         f"""{applyTrgBranch_name} ? ::correction::TrigCorrProvider::getGlobal().getEffMC_fromRootFile(
                                 HttCandidate.leg_p4[{leg_idx}],::correction::TrigCorrProvider::UncSource::{source}, ::correction::UncScale::{scale}, true) : 1.f""",
                     )
                 if scale != central:
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_SF_name}_rel",
                         f"static_cast<float>({branch_SF_name}_double/{branch_SF_central})",
                     )
                     branch_SF_name += "_rel"
                 else:
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_SF_name}",
                         f"static_cast<float>({branch_SF_name}_double)",
                     )
@@ -328,26 +328,32 @@ class TrigCorrProducer:
         trg_name,
         applyTrgBranch_name,
         SF_branches,
+        columns=None,
     ):
+        if columns is None:
+            columns = DefinedColumns(df)
         for source in sf_sources:
             for scale in sf_scales:
                 if not isCentral and scale != central:
                     continue
                 branch_SF_central = f"weight_TrgSF_{source}Central"
                 branch_SF_name = f"weight_TrgSF_{source}{scale}"
-                df = df.Define(
+                df = columns.Define(
+                    df,
                     f"{branch_SF_name}_double",
                     f"""{applyTrgBranch_name} ? ::correction::TrigCorrProvider::getGlobal().getMETTrgSF(
                                 "{self.year}",metnomu_pt, metnomu_phi, ::correction::UncScale::{scale} ) : 1.f""",
                 )
                 if scale != central:
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_SF_name}_rel",
                         f"static_cast<float>({branch_SF_name}_double/{branch_SF_central})",
                     )
                     branch_SF_name += "_rel"
                 else:
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_SF_name}",
                         f"static_cast<float>({branch_SF_name}_double)",
                     )
@@ -364,7 +370,10 @@ class TrigCorrProducer:
         leg_idx,
         applyTrgBranch_name,
         SF_branches,
+        columns=None,
     ):
+        if columns is None:
+            columns = DefinedColumns(df)
         for source in sf_sources:
             for scale in sf_scales:
                 if not isCentral and scale != central:
@@ -375,18 +384,21 @@ class TrigCorrProducer:
                 branch_SF_name = f"{branch_SF_name_prefix}_{source}{scale}"
                 value_shifted = self.singleTau_SF_dict[self.period][scale]
 
-                df = df.Define(
+                df = columns.Define(
+                    df,
                     f"{branch_SF_name}_double",
                     f"""{applyTrgBranch_name} ? {value_shifted} : 1.f""",
                 )
                 if scale != central:
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_SF_name}_rel",
                         f"static_cast<float>({branch_SF_name}_double/{branch_SF_central})",
                     )
                     branch_SF_name += "_rel"
                 else:
-                    df = df.Define(
+                    df = columns.Define(
+                        df,
                         f"{branch_SF_name}",
                         f"static_cast<float>({branch_SF_name}_double)",
                     )
@@ -395,6 +407,7 @@ class TrigCorrProducer:
 
     def getSF(self, df, trigger_names, lepton_legs, return_variations, isCentral):
         SF_branches = []
+        columns = DefinedColumns(df)
         legs_to_be = {
             "mutau": ["mu", "tau"],
             "etau": ["e", "tau"],
@@ -416,7 +429,9 @@ class TrigCorrProducer:
                 # print(leg_to_be)
                 applyTrgBranch_name_condition = f"""HttCandidate.leg_type[{leg_idx}] == Leg::{leg_to_be} && HLT_{trg_name} && {leg_name}_HasMatching_{trg_name}"""
                 # print(applyTrgBranch_name_condition)
-                df = df.Define(applyTrgBranch_name, applyTrgBranch_name_condition)
+                df = columns.Define(
+                    df, applyTrgBranch_name, applyTrgBranch_name_condition
+                )
                 df, SF_branches = self.addSFsbranches(
                     df,
                     sf_sources,
@@ -428,6 +443,7 @@ class TrigCorrProducer:
                     applyTrgBranch_name,
                     SF_branches,
                     apply_corrlib,
+                    columns=columns,
                 )
 
         MET_trg = "MET"
@@ -436,7 +452,7 @@ class TrigCorrProducer:
             sf_scales = [central, up, down] if return_variations else [central]
             applyTrgBranch_name = f"{MET_trg}_ApplyTrgSF"
             applyTrgBranch_name_condition = f"""HLT_{MET_trg}"""
-            df = df.Define(applyTrgBranch_name, applyTrgBranch_name_condition)
+            df = columns.Define(df, applyTrgBranch_name, applyTrgBranch_name_condition)
             df, SF_branches = self.addMETBranch(
                 df,
                 sf_sources,
@@ -445,6 +461,7 @@ class TrigCorrProducer:
                 MET_trg,
                 applyTrgBranch_name,
                 SF_branches,
+                columns=columns,
             )
 
         singleTau_trg = "singleTau"
@@ -455,7 +472,9 @@ class TrigCorrProducer:
             for leg_idx, leg_name in enumerate(lepton_legs):
                 applyTrgBranch_name = f"{singleTau_trg}_{leg_name}_ApplyTrgSF"
                 applyTrgBranch_name_condition = f"""HttCandidate.leg_type[{leg_idx}] == Leg::{leg_to_be} && HLT_{trg_name} && {leg_name}_HasMatching_{trg_name}"""
-                df = df.Define(applyTrgBranch_name, applyTrgBranch_name_condition)
+                df = columns.Define(
+                    df, applyTrgBranch_name, applyTrgBranch_name_condition
+                )
                 df, SF_branches = self.addSingleTauBranch(
                     df,
                     sf_sources,
@@ -465,5 +484,6 @@ class TrigCorrProducer:
                     leg_idx,
                     applyTrgBranch_name,
                     SF_branches,
+                    columns=columns,
                 )
         return df, SF_branches
@@ -103,12 +103,12 @@ namespace correction {
                          const std::string& jet_trg_key,
                          const std::string& era)
             :  // TrigCorrProvider(const std::string& muon_trg_file, const std::string& ele_trg_file, const std::string& muon_trg_key, const std::string& ele_trg_key, const std::string& era) :
-              mutrgcorrections_(CorrectionSet::from_file(muon_trg_file)),
-              etrgcorrections_(CorrectionSet::from_file(ele_trg_file)),
-              tautrgcorrections_(CorrectionSet::from_file(tau_trg_file)),
-              ditauJet_trgcorrections_(CorrectionSet::from_file(ditauJet_trg_file)),
-              etau_trgcorrections_(CorrectionSet::from_file(etau_trg_file)),
-              mutau_trgcorrections_(CorrectionSet::from_file(mutau_trg_file)) {
+              mutrgcorrections_(loadCorrectionSet(muon_trg_file)),
+              etrgcorrections_(loadCorrectionSet(ele_trg_file)),
+              tautrgcorrections_(loadCorrectionSet(tau_trg_file)),
+              ditauJet_trgcorrections_(loadCorrectionSet(ditauJet_trg_file)),
+              etau_trgcorrections_(loadCorrectionSet(etau_trg_file)),
+              mutau_trgcorrections_(loadCorrectionSet(mutau_trg_file)) {
             if (era == "2022_Summer22" || era == "2022_Summer22EE" || era == "2023_Summer23" ||
                 era == "2023_Summer23BPix" || era == "2024_Summer24" || era == "2025_Summer24" || era == "2025_Winter25") {
                 // muTrgCorrections["Central"]=mutrgcorrections_->at(muon_trg_key);
@@ -412,7 +412,7 @@ namespace correction {
         }
 
       private:
-        std::unique_ptr<CorrectionSet> mutrgcorrections_, etrgcorrections_, tautrgcorrections_,
+        std::shared_ptr<const CorrectionSet> mutrgcorrections_, etrgcorrections_, tautrgcorrections_,
             ditauJet_trgcorrections_, etau_trgcorrections_, mutau_trgcorrections_;
         std::map<std::string, Correction::Ref> muTrgCorrections, eleTrgCorrections, eleTrgCorrections_Mc,
             eleTrgCorrections_Data, tauTrgCorrections, ditauJet_trgCorrections, etau_trgCorrections_Mc,
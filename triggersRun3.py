@@ -1,7 +1,5 @@
 import os
-import ROOT
 from .CorrectionsCore import *
-from FLAF.Common.Utilities import *
 import yaml
 import re
 
@@ -109,9 +107,7 @@ class TrigCorrProducer:
         )
 
         if not TrigCorrProducer.initialized:
-            headers_dir = os.path.dirname(os.path.abspath(__file__))
-            header_path = os.path.join(headers_dir, "triggersRun3.h")
-            ROOT.gInterpreter.Declare(f'#include "{header_path}"')
+            loadHeader("triggersRun3.h")
             TrigCorrProducer.year = period.split("_")[0]
             self.year = period.split("_")[0]
             if period.endswith("Summer22"):